@@ -0,0 +1,58 @@
+import sys
+import argparse
+
+from batch_processor import BatchProcessor, STREAM_SUFFIXES, SAVE_SUFFIXES
+from tiled_processor import DEFAULT_TILE_OVERLAP
+from disk_cache import DEFAULT_CACHE_BYTES
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run GPA strain mapping headless over a directory or glob of micrographs."
+    )
+    parser.add_argument("source", nargs="+",
+                        help="Directory, file or glob pattern (e.g. 'data/*.emd').")
+    parser.add_argument("-r", "--recipe", required=True,
+                        help="JSON recipe with g-vector centers, mask radii, reference area, sigma and threshold.")
+    parser.add_argument("-o", "--out", default="gpa_results",
+                        help="Output directory for the per-file results.")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of worker processes (default: all CPU cores).")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Process each file in overlapping tiles of this size (for very large montages).")
+    parser.add_argument("--overlap", type=int, default=DEFAULT_TILE_OVERLAP,
+                        help="Tile overlap in pixels used with --tile-size.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Treat each file as a 3D movie and write per-frame strain maps.")
+    parser.add_argument("--track-drift", action="store_true",
+                        help="With --stream, follow the g-vector peaks from frame to frame.")
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("START", "STOP"), default=None,
+                        help="With --stream, only process frames START to STOP-1.")
+    parser.add_argument("--format", choices=sorted(STREAM_SUFFIXES), default="hdf5",
+                        help="Output format of --stream.")
+    parser.add_argument("--save-format", choices=sorted(SAVE_SUFFIXES), default="npz",
+                        help="Per-file output format of regular (non-stream, non-tiled) runs.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Keep FFTs, complex images and phases in this on-disk cache across runs.")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_CACHE_BYTES / 1024**3,
+                        help="Size bound of --cache-dir in GiB; least recently used entries are evicted.")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.stream:
+        outcomes = BatchProcessor.run_stream(
+            args.source, args.recipe, args.out, track_drift=args.track_drift,
+            fmt=args.format, frame_range=args.frames
+        )
+    elif args.tile_size:
+        outcomes = BatchProcessor.run_tiled(
+            args.source, args.recipe, args.out, args.tile_size, args.overlap, workers=args.workers
+        )
+    else:
+        outcomes = BatchProcessor.run(
+            args.source, args.recipe, args.out, workers=args.workers, save_format=args.save_format,
+            cache_dir=args.cache_dir, cache_bytes=int(args.cache_size * 1024**3)
+        )
+    failed = [o for o in outcomes if o[2] is not None]
+    print(f"Done: {len(outcomes) - len(failed)} succeeded, {len(failed)} failed.")
+    sys.exit(1 if failed else 0)
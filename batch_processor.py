@@ -0,0 +1,328 @@
+import os
+import glob
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_processor import DataProcessor
+from disk_cache import DiskCache, DEFAULT_CACHE_BYTES
+from fft_backend import FFTBackend
+from gpa_pipeline import GPAPipeline
+from peak_finder import PeakFinder
+from results_exporter import ResultsExporter
+from strain_calculator import StrainCalculator
+from stream_processor import StreamProcessor
+from tiled_processor import TiledProcessor
+
+SUPPORTED_EXTENSIONS = ('.emd', '.dm3', '.dm4', '.tif', '.tiff', '.h5', '.hdf')
+TILED_EXTENSIONS = SUPPORTED_EXTENSIONS + ('.npy',)
+STREAM_EXTENSIONS = TILED_EXTENSIONS
+OUTPUT_SUFFIX = "_gpa.npz"
+STREAM_SUFFIXES = {'hdf5': "_gpa.h5", 'zarr': "_gpa.zarr"}
+SAVE_SUFFIXES = dict(STREAM_SUFFIXES, npz=OUTPUT_SUFFIX)
+
+DEFAULT_RECIPE = {
+    'center1': [0, 0],
+    'inner_radius1': 10.0,
+    'outer_radius1': 20.0,
+    'center2': [0, 0],
+    'inner_radius2': 10.0,
+    'outer_radius2': 20.0,
+    'reference_area': [0, 0, 50, 50],
+    'sigma': 0.0,
+    'threshold': 0.0,
+    'demodulation': 'full',
+    'upsample': False,
+    'engine': 'unwrap',
+    'precision': 'double',
+    'fft_shape': None,
+    'reflections': None,
+    'auto_centers': False,
+    'mask_sigma': 0.0,
+    'mask_cleanup': 0,
+    'crop_to_material': False,
+    'frame_range': None,
+    'dataset': None,
+}
+# Recipe keys a tiled run cannot honour; giving them a non-default value is an
+# error. Tiled runs only write strain and rotation maps, which do not depend
+# on ``reference_area``.
+TILED_UNSUPPORTED_KEYS = (
+    'demodulation', 'upsample', 'reflections', 'auto_centers',
+    'mask_sigma', 'mask_cleanup', 'crop_to_material',
+)
+# Recipe keys a stream run cannot honour: every frame is written at the frame
+# size with the two-reflection path and the plain material mask.
+STREAM_UNSUPPORTED_KEYS = (
+    'demodulation', 'upsample', 'reflections', 'mask_sigma', 'mask_cleanup',
+)
+
+class BatchProcessor:
+    """GUI-free GPA over many files with a shared parameter recipe."""
+
+
+    @staticmethod
+    def load_recipe(recipe):
+        if isinstance(recipe, str):
+            with open(recipe, 'r') as f:
+                recipe = json.load(f)
+
+        unknown = set(recipe) - set(DEFAULT_RECIPE)
+        if unknown:
+            raise ValueError(f"Unknown recipe keys: {', '.join(sorted(unknown))}")
+
+        merged = dict(DEFAULT_RECIPE)
+        merged.update(recipe)
+        return merged
+
+    @staticmethod
+    def check_supported(recipe, unsupported, mode):
+        """Raise ``ValueError`` if the recipe sets any of the ``unsupported`` keys."""
+        found = [key for key in unsupported if recipe[key] and recipe[key] != DEFAULT_RECIPE[key]]
+        if found:
+            raise ValueError(f"Recipe keys not supported by {mode} runs: {', '.join(found)}")
+
+    @staticmethod
+    def collect_files(source, extensions=SUPPORTED_EXTENSIONS):
+        """Expand a directory, glob pattern or list of those into sorted file paths."""
+        if isinstance(source, (list, tuple)):
+            files = []
+            for item in source:
+                files.extend(BatchProcessor.collect_files(item, extensions))
+            return sorted(set(files))
+
+        if os.path.isdir(source):
+            candidates = glob.glob(os.path.join(source, '*'))
+        else:
+            candidates = glob.glob(source)
+
+        return sorted(
+            path for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(extensions)
+        )
+
+    @staticmethod
+    def reference_area_from_corners(x0, y0, x1, y1):
+        return (
+            slice(min(y0, y1), max(y0, y1)),
+            slice(min(x0, x1), max(x0, x1))
+        )
+
+    @staticmethod
+    def process_data(data, recipe, disk_cache=None):
+        """Run the full GPA chain on an already loaded 2D image."""
+        pipeline = GPAPipeline(data, precision=recipe['precision'], disk_cache=disk_cache)
+        material_mask = pipeline.material_mask(
+            recipe['threshold'], int(recipe['mask_cleanup']), float(recipe['mask_sigma'])
+        )
+        fft_data, fft_magnitude = pipeline.fft()
+        # Centers and radii are moved from the FFT they were picked on to the padded one.
+        picked_shape = recipe['fft_shape'] or data.shape
+
+        reference_area = BatchProcessor.reference_area_from_corners(*recipe['reference_area'])
+
+        if recipe['reflections']:
+            reflections = [
+                StrainCalculator.rescale_reflection(
+                    (float(y), float(x)), float(r_inner), float(r_outer), picked_shape, fft_data.shape
+                )
+                for y, x, r_inner, r_outer in recipe['reflections']
+            ]
+            return StrainCalculator.calculate_displacements_and_strain_multi(
+                fft_data,
+                material_mask,
+                reflections,
+                reference_area,
+                float(recipe['sigma']),
+                demodulation=recipe['demodulation'],
+                upsample=bool(recipe['upsample']),
+                engine=recipe['engine'],
+                crop_to_material=bool(recipe['crop_to_material'])
+            )
+
+        c1, g1, r1 = StrainCalculator.rescale_reflection(
+            tuple(float(v) for v in recipe['center1']), float(recipe['inner_radius1']),
+            float(recipe['outer_radius1']), picked_shape, fft_data.shape
+        )
+        c2, g2, r2 = StrainCalculator.rescale_reflection(
+            tuple(float(v) for v in recipe['center2']), float(recipe['inner_radius2']),
+            float(recipe['outer_radius2']), picked_shape, fft_data.shape
+        )
+        if recipe['auto_centers']:
+            c1, c2 = PeakFinder.detect_pair(fft_magnitude)
+
+        return pipeline.run(
+            c1, g1, r1,
+            c2, g2, r2,
+            reference_area,
+            float(recipe['sigma']),
+            threshold_percent=recipe['threshold'],
+            demodulation=recipe['demodulation'],
+            upsample=bool(recipe['upsample']),
+            engine=recipe['engine'],
+            mask_cleanup=int(recipe['mask_cleanup']),
+            mask_sigma=float(recipe['mask_sigma']),
+            crop_to_material=bool(recipe['crop_to_material'])
+        )
+
+    @staticmethod
+    def output_path(file_path, out_dir, save_format='npz'):
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(out_dir, stem + SAVE_SUFFIXES[save_format])
+
+    @staticmethod
+    def process_file(file_path, recipe, out_dir, save_format='npz', disk_cache=None):
+        """Load, process and save one file. Runs inside the worker processes."""
+        start = time.perf_counter()
+        counts = disk_cache.counts() if disk_cache is not None else None
+        data = DataProcessor.load_haadf_image(
+            file_path, precision=recipe['precision'],
+            frame_range=recipe['frame_range'], dataset=recipe['dataset']
+        )
+        results = BatchProcessor.process_data(data, recipe, disk_cache)
+
+        out_path = BatchProcessor.output_path(file_path, out_dir, save_format)
+        if save_format == 'npz':
+            np.savez_compressed(out_path, **results)
+        else:
+            metadata = {'recipe': recipe, 'source': os.path.abspath(file_path)}
+            ResultsExporter.export(out_path, results, metadata, fmt=save_format, nan_aware=True)
+        if disk_cache is not None:
+            counts = {name: value - counts[name] for name, value in disk_cache.counts().items()}
+        return out_path, time.perf_counter() - start, counts
+
+    @staticmethod
+    def run(source, recipe, out_dir, workers=None, save_format='npz',
+            cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES):
+        """Process every supported file in ``source`` across a process pool."""
+        recipe = BatchProcessor.load_recipe(recipe)
+        files = BatchProcessor.collect_files(source)
+        if not files:
+            raise FileNotFoundError(f"No supported files found in: {source}")
+
+        os.makedirs(out_dir, exist_ok=True)
+        disk_cache = DiskCache(cache_dir, cache_bytes) if cache_dir else None
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(files)))
+
+        # Split the cores between processes so the threaded FFTs do not oversubscribe.
+        fft_workers = max(1, (os.cpu_count() or 1) // workers)
+
+        print(f"Processing {len(files)} file(s) with {workers} worker(s)")
+        outcomes = {}
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=FFTBackend.set_backend,
+            initargs=(FFTBackend.backend, fft_workers)
+        ) as pool:
+            futures = {
+                pool.submit(BatchProcessor.process_file, path, recipe, out_dir, save_format, disk_cache): path
+                for path in files
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    out_path, elapsed, counts = future.result()
+                    if counts is not None:
+                        disk_cache.add_counts(counts)
+                    outcomes[path] = (path, out_path, None)
+                    print(f"[{done}/{len(files)}] {path} -> {out_path} ({elapsed:.1f} s)")
+                except Exception as e:
+                    outcomes[path] = (path, None, str(e))
+                    print(f"[{done}/{len(files)}] {path} FAILED: {e}")
+
+        if disk_cache is not None:
+            stats = disk_cache.stats()
+            print(f"Disk cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+                  f"{stats['entries']} entries, {stats['bytes'] / 1024**2:.0f} MiB in {cache_dir}")
+        return [outcomes[path] for path in files]
+
+    @staticmethod
+    def run_tiled(source, recipe, out_dir, tile_size, overlap, workers=None):
+        """Process large montages one at a time, with their tiles in parallel."""
+        recipe = BatchProcessor.load_recipe(recipe)
+        BatchProcessor.check_supported(recipe, TILED_UNSUPPORTED_KEYS, 'tiled')
+        files = BatchProcessor.collect_files(source, TILED_EXTENSIONS)
+        if not files:
+            raise FileNotFoundError(f"No supported files found in: {source}")
+
+        outcomes = []
+        for path in files:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            file_out_dir = os.path.join(out_dir, stem + "_gpa")
+            try:
+                start = time.perf_counter()
+                if path.lower().endswith('.npy'):
+                    image = path
+                else:
+                    image = DataProcessor.load_haadf_image(
+                        path, precision=recipe['precision'],
+                        frame_range=recipe['frame_range'], dataset=recipe['dataset']
+                    )
+
+                TiledProcessor.run(
+                    image,
+                    recipe['center1'], float(recipe['inner_radius1']), float(recipe['outer_radius1']),
+                    recipe['center2'], float(recipe['inner_radius2']), float(recipe['outer_radius2']),
+                    float(recipe['sigma']),
+                    threshold_percent=recipe['threshold'],
+                    fft_shape=recipe['fft_shape'],
+                    out_dir=file_out_dir,
+                    tile_size=tile_size,
+                    overlap=overlap,
+                    workers=workers,
+                    engine=recipe['engine'],
+                    precision=recipe['precision']
+                )
+                outcomes.append((path, file_out_dir, None))
+                print(f"{path} -> {file_out_dir} ({time.perf_counter() - start:.1f} s)")
+            except Exception as e:
+                outcomes.append((path, None, str(e)))
+                print(f"{path} FAILED: {e}")
+        return outcomes
+
+    @staticmethod
+    def run_stream(source, recipe, out_dir, track_drift=False, fmt='hdf5', frame_range=None):
+        """Process 3D movies frame by frame instead of summing their frames."""
+        recipe = BatchProcessor.load_recipe(recipe)
+        BatchProcessor.check_supported(recipe, STREAM_UNSUPPORTED_KEYS, 'stream')
+        if frame_range is None:
+            frame_range = recipe['frame_range']
+        files = BatchProcessor.collect_files(source, STREAM_EXTENSIONS)
+        if not files:
+            raise FileNotFoundError(f"No supported files found in: {source}")
+
+        os.makedirs(out_dir, exist_ok=True)
+        reference_area = BatchProcessor.reference_area_from_corners(*recipe['reference_area'])
+
+        outcomes = []
+        for path in files:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            out_path = os.path.join(out_dir, stem + STREAM_SUFFIXES[fmt])
+            try:
+                c1, c2 = (None, None) if recipe['auto_centers'] else (recipe['center1'], recipe['center2'])
+                summary = StreamProcessor.run(
+                    path,
+                    c1, float(recipe['inner_radius1']), float(recipe['outer_radius1']),
+                    c2, float(recipe['inner_radius2']), float(recipe['outer_radius2']),
+                    reference_area,
+                    float(recipe['sigma']),
+                    out_path,
+                    threshold_percent=recipe['threshold'],
+                    track_drift=track_drift,
+                    frame_range=frame_range,
+                    fmt=fmt,
+                    engine=recipe['engine'],
+                    precision=recipe['precision'],
+                    dataset=recipe['dataset'],
+                    crop_to_material=bool(recipe['crop_to_material']),
+                    fft_shape=recipe['fft_shape']
+                )
+                outcomes.append((path, out_path, None))
+                print(f"{path} -> {out_path} ({summary['frames']} frames, {summary['fps']:.2f} frames/s)")
+            except Exception as e:
+                outcomes.append((path, None, str(e)))
+                print(f"{path} FAILED: {e}")
+        return outcomes
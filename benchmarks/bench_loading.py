@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+DEFAULT_SIZE = 2048
+DEFAULT_FRAMES = 64
+
+# Each case runs in a fresh interpreter so its peak RSS is its own.
+CASE_SCRIPT = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+import numpy as np
+from data_processor import DataProcessor
+import hyperspy.api as hs
+
+path, mode, frame_range = {path!r}, {mode!r}, {frame_range!r}
+start = time.perf_counter()
+if mode == 'eager':
+    data = hs.load(path, lazy=False).data
+    image = np.sum(data, axis=0).astype(np.float64)
+else:
+    image = DataProcessor.load_haadf_image(path, frame_range=frame_range)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'rss': DataProcessor.peak_rss_mib()}}))
+"""
+
+def write_stack(directory, size, frames):
+    import h5py
+    import hyperspy.api as hs
+
+    rng = np.random.default_rng(0)
+    stack = np.lib.format.open_memmap(
+        os.path.join(directory, 'stack.npy'), mode='w+', dtype=np.uint16, shape=(frames, size, size)
+    )
+    for index in range(frames):
+        stack[index] = rng.integers(0, 4096, (size, size), dtype=np.uint16)
+    stack.flush()
+
+    with h5py.File(os.path.join(directory, 'stack.h5'), 'w') as f:
+        f.create_dataset('stack', data=stack, chunks=(1, size, size))
+    hs.signals.Signal2D(np.asarray(stack)).save(os.path.join(directory, 'stack.hspy'), overwrite=True)
+    return stack.nbytes
+
+def run_case(path, mode, frame_range=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = CASE_SCRIPT.format(root=root, path=path, mode=mode, frame_range=frame_range)
+    output = subprocess.run(
+        [sys.executable, '-c', script], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark eager vs. lazy, chunked loading of a frame stack (time and peak RSS)."
+    )
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='gpa_bench_load_')
+    try:
+        nbytes = write_stack(directory, args.size, args.frames)
+        print(f"Stack: {args.frames} x {args.size} x {args.size} uint16 ({nbytes / 1024**2:.0f} MiB)")
+        few = (0, max(1, args.frames // 8))
+        cases = [
+            ('stack.hspy', 'eager', None),
+            ('stack.hspy', 'lazy', None),
+            ('stack.h5', 'lazy', None),
+            ('stack.npy', 'lazy', None),
+            ('stack.h5', 'lazy', few),
+            ('stack.h5', 'lazy', (0, 1)),
+        ]
+        print(f"{'file':>11} {'mode':>6} {'frames':>8} {'time (s)':>9} {'peak RSS (MiB)':>15}")
+        for name, mode, frame_range in cases:
+            result = run_case(os.path.join(directory, name), mode, frame_range)
+            frames = 'all' if frame_range is None else f"{frame_range[0]}:{frame_range[1]}"
+            print(f"{name:>11} {mode:>6} {frames:>8} {result['seconds']:>9.2f} {result['rss']:>15.0f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
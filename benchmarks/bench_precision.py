@@ -0,0 +1,65 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+from data_processor import DataProcessor
+from strain_calculator import StrainCalculator, STRAIN_ENGINES
+from benchmarks.synthetic import make_lattice, mask_radii
+
+DEFAULT_SIZES = (1024, 2048)
+STRAIN_KEYS = ('strain_xx', 'strain_yy', 'strain_xy', 'rotation_xy')
+EXX, EYY = 0.01, -0.005
+
+def run(image, c1, c2, radii, engine, precision):
+    data = image.astype(DataProcessor.real_dtype(precision))
+    smoothed_data, material_mask = DataProcessor.preprocess_data(data)
+    r_inner, r_outer = radii
+    size = image.shape[0]
+
+    start = time.perf_counter()
+    fft_data, _ = DataProcessor.compute_fft_and_contrast(smoothed_data)
+    results = StrainCalculator.calculate_displacements_and_strain(
+        fft_data, material_mask,
+        c1, r_inner, r_outer,
+        c2, r_inner, r_outer,
+        (slice(0, size // 8), slice(0, size // 8)), 2.0,
+        engine=engine
+    )
+    elapsed = time.perf_counter() - start
+    nbytes = sum(value.nbytes for value in results.values())
+    return results, elapsed, nbytes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check single-precision GPA against the double-precision path on synthetic strain."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>6} {'engine':>9} {'t64 (s)':>8} {'t32 (s)':>8} {'MB64':>8} {'MB32':>8} "
+          f"{'max |d| (%)':>12} {'rms d (%)':>10} {'err64 (%)':>10} {'err32 (%)':>10}")
+    for size in args.sizes:
+        image, c1, c2 = make_lattice(size, exx=EXX, eyy=EYY, noise=0.1)
+        radii = mask_radii(size)
+        edge = size // 8
+        core = (slice(edge, -edge), slice(edge, -edge))
+
+        for engine in STRAIN_ENGINES:
+            r64, t64, b64 = run(image, c1, c2, radii, engine, 'double')
+            r32, t32, b32 = run(image, c1, c2, radii, engine, 'single')
+
+            diff = np.concatenate([
+                (r32[key][core] - r64[key][core]).ravel() for key in STRAIN_KEYS
+            ])
+            max_diff = np.nanmax(np.abs(diff))
+            rms_diff = np.sqrt(np.nanmean(diff**2))
+            err64 = np.sqrt(np.nanmean((r64['strain_xx'][core] - 100 * EXX)**2))
+            err32 = np.sqrt(np.nanmean((r32['strain_xx'][core] - 100 * EXX)**2))
+
+            print(f"{size:>6} {engine:>9} {t64:>8.3f} {t32:>8.3f} {b64 / 2**20:>8.1f} {b32 / 2**20:>8.1f} "
+                  f"{max_diff:>12.2e} {rms_diff:>10.2e} {err64:>10.4f} {err32:>10.4f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
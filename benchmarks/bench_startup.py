@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from benchmarks.synthetic import make_lattice, mask_radii
+
+DEFAULT_SIZE = 1024
+DEFAULT_REPEATS = 3
+# Seconds before a child interpreter is given up on.
+SCRIPT_TIMEOUT = 300
+# Modules that should only be imported once they are actually used.
+HEAVY_MODULES = ('hyperspy', 'skimage', 'scipy.ndimage', 'matplotlib.pyplot', 'h5py', 'zarr', 'dask')
+
+PREAMBLE = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+"""
+
+# Time to first window: the GUI module imported and its window drawn once,
+# with the synthetic image returned in place of the file dialog and errors
+# reported without a modal message box.
+WINDOW_SCRIPT = PREAMBLE + """
+import gpa_app
+imported = time.time()
+window = None
+try:
+    from tkinter import Tk, filedialog, messagebox
+    filedialog.askopenfilename = lambda **kwargs: {path!r}
+    messagebox.showerror = lambda *args, **kwargs: None
+    root = Tk()
+    gpa_app.GPAApp(root)
+    root.update()
+    window = time.time()
+    root.destroy()
+except (Exception, SystemExit):
+    pass
+print(json.dumps({{'imported': imported, 'done': window, 'modules': sorted(sys.modules)}}))
+"""
+
+# Time to first result of a headless run: what every batch worker pays.
+RESULT_SCRIPT = PREAMBLE + """
+from batch_processor import BatchProcessor
+from data_processor import DataProcessor
+imported = time.time()
+data = DataProcessor.load_haadf_image({path!r})
+BatchProcessor.process_data(data, BatchProcessor.load_recipe({recipe!r}))
+print(json.dumps({{'imported': imported, 'done': time.time(), 'modules': sorted(sys.modules)}}))
+"""
+
+def run_script(script):
+    """Seconds from launching a fresh interpreter to its checkpoints."""
+    start = time.time()
+    output = subprocess.run(
+        [sys.executable, '-c', script], check=True, capture_output=True, text=True, timeout=SCRIPT_TIMEOUT
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    imported = result['imported'] - start
+    done = result['done'] - start if result['done'] is not None else None
+    heavy = [name for name in HEAVY_MODULES if name in result['modules']]
+    return imported, done, heavy
+
+def best_of(script, repeats):
+    runs = [run_script(script) for _ in range(repeats)]
+    imported = min(run[0] for run in runs)
+    finished = [run[1] for run in runs if run[1] is not None]
+    return imported, min(finished) if finished else None, runs[-1][2]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark time to first window (GUI) and to first result (headless) from a cold interpreter."
+    )
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args(argv)
+
+    import tifffile
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = tempfile.mkdtemp(prefix='gpa_bench_startup_')
+    try:
+        image, c1, c2 = make_lattice(args.size, noise=0.1)
+        path = os.path.join(directory, 'lattice.tif')
+        tifffile.imwrite(path, image.astype(np.float32))
+        r_inner, r_outer = mask_radii(args.size)
+        recipe = {
+            'center1': list(c1), 'inner_radius1': r_inner, 'outer_radius1': r_outer,
+            'center2': list(c2), 'inner_radius2': r_inner, 'outer_radius2': r_outer,
+            'reference_area': [0, 0, args.size // 8, args.size // 8], 'sigma': 2.0,
+        }
+
+        print(f"{'run':>14} {'imports (s)':>12} {'first window/result (s)':>24}  heavy modules loaded")
+        cases = (
+            ('GUI', WINDOW_SCRIPT.format(root=root, path=path)),
+            (f'headless {args.size}', RESULT_SCRIPT.format(root=root, path=path, recipe=recipe)),
+        )
+        for name, script in cases:
+            imported, done, heavy = best_of(script, args.repeats)
+            done = f"{done:.2f}" if done is not None else "no display"
+            print(f"{name:>14} {imported:>12.2f} {done:>24}  {', '.join(heavy) or '-'}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import sys
+import time
+import argparse
+import numpy as np
+from numpy.fft import fft2, fftshift
+
+from strain_calculator import StrainCalculator, STRAIN_ENGINES
+from benchmarks.synthetic import make_lattice, mask_radii
+
+DEFAULT_SIZES = (1024, 2048, 4096)
+EXX, EYY = 0.01, -0.005
+
+def run_engine(fft_data, material_mask, c1, c2, radii, engine, demodulation, repeats):
+    r_inner, r_outer = radii
+    size = fft_data.shape[0]
+    reference_area = (slice(0, size // 8), slice(0, size // 8))
+
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = StrainCalculator.calculate_displacements_and_strain(
+            fft_data, material_mask,
+            c1, r_inner, r_outer,
+            c2, r_inner, r_outer,
+            reference_area, 2.0,
+            demodulation=demodulation, engine=engine
+        )
+        best = min(best, time.perf_counter() - start)
+
+    exx = results['strain_xx']
+    edge = max(exx.shape[0] // 8, 1)
+    core = (slice(edge, -edge), slice(edge, -edge))
+    error = np.sqrt(np.nanmean((exx[core] - 100 * EXX)**2))
+    return best, error
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the unwrap, phase-gradient and spectral strain engines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--demodulation", default="full")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>6} {'engine':>9} {'time (s)':>10} {'rms dExx (%)':>15} {'speedup':>8}")
+    for size in args.sizes:
+        image, c1, c2 = make_lattice(size, exx=EXX, eyy=EYY, noise=0.1)
+        fft_data = fftshift(fft2(image))
+        material_mask = np.ones(image.shape, dtype=bool)
+        radii = mask_radii(size)
+
+        timings = {}
+        for engine in STRAIN_ENGINES:
+            elapsed, error = run_engine(
+                fft_data, material_mask, c1, c2, radii, engine, args.demodulation, args.repeats
+            )
+            timings[engine] = elapsed
+            speedup = timings['unwrap'] / elapsed
+            print(f"{size:>6} {engine:>9} {elapsed:>10.3f} {error:>15.4f} {speedup:>7.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+from batch_processor import SAVE_SUFFIXES
+from data_processor import DataProcessor
+from fft_backend import FFTBackend
+from results_exporter import ResultsExporter
+from strain_calculator import StrainCalculator, STRAIN_ENGINES
+from benchmarks.synthetic import FIELDS, make_field, mask_radii, evaluation_mask
+
+DEFAULT_SIZES = (512, 1024, 2048)
+DEFAULT_SIGMA = 2.0
+DEFAULT_NOISE = 0.1
+STAGES = ('fft', 'material_mask', 'mask', 'ifft', 'unwrap', 'gradient', 'smoothing', 'save')
+STRAIN_KEYS = ('strain_xx', 'strain_yy', 'strain_xy', 'rotation_xy')
+# A case regresses when a stage takes this fraction (plus TIME_FLOOR seconds)
+# longer, or a map's RMS error grows by this fraction plus ERROR_FLOOR,
+# relative to the same case in the baseline.
+TIME_TOLERANCE = 0.25
+TIME_FLOOR = 0.02
+ERROR_TOLERANCE = 0.10
+ERROR_FLOOR = 1e-3
+# Bumped whenever the stages change, so older baselines are not compared.
+SUITE_VERSION = 2
+
+def run_chain(image, c1, c2, radii, engine, precision, sigma, save_path, save_format):
+    """The stages of ``calculate_displacements_and_strain`` plus a save, one timing each."""
+    stages = {}
+
+    def timed(name, compute):
+        start = time.perf_counter()
+        value = compute()
+        stages[name] = time.perf_counter() - start
+        return value
+
+    size = image.shape[0]
+    r_inner, r_outer = radii
+    reference_area = (slice(0, size // 8), slice(0, size // 8))
+    data = image.astype(DataProcessor.real_dtype(precision))
+
+    fft_data, _ = timed('fft', lambda: DataProcessor.compute_fft_and_contrast(data))
+    material_mask = timed('material_mask', lambda: DataProcessor.compute_material_mask(data))
+    g_vecs = [StrainCalculator.g_vector(c, fft_data.shape) for c in (c1, c2)]
+    # StrainCalculator.demodulate, split into the cosine mask and the inverse FFT.
+    spectra = timed('mask', lambda: [
+        StrainCalculator.shifted_masked_spectrum(fft_data, c, r_inner, r_outer) for c in (c1, c2)
+    ])
+    complex_imgs = timed('ifft', lambda: [FFTBackend.ifft2(spectrum, overwrite_x=True) for spectrum in spectra])
+    phases = timed('unwrap', lambda: [
+        StrainCalculator.phase_images(z, g, data.shape, engine=engine, fft_shape=fft_data.shape)
+        for z, g in zip(complex_imgs, g_vecs)
+    ])
+    (complex_img1, raw_phase_1, phase_image1, carrier1), (complex_img2, raw_phase_2, phase_image2, carrier2) = phases
+
+    def gradient():
+        ux, uy = StrainCalculator.displacements_from_phases(
+            phase_image1, phase_image2, g_vecs[0], g_vecs[1], reference_area
+        )
+        return ux, uy, StrainCalculator.displacement_gradients(
+            ux, uy, complex_img1, complex_img2, carrier1, carrier2, g_vecs[0], g_vecs[1], engine=engine
+        )
+
+    ux, uy, gradients = timed('gradient', gradient)
+    maps = timed('smoothing', lambda: StrainCalculator.strain_maps(gradients, material_mask, sigma, engine=engine))
+    results = {
+        'complex_image1': complex_img1,
+        'complex_image2': complex_img2,
+        'raw_phase_image1': raw_phase_1,
+        'raw_phase_image2': raw_phase_2,
+        'phase_image1': phase_image1,
+        'phase_image2': phase_image2,
+        'u1': ux,
+        'u2': uy,
+    }
+    results.update(zip(STRAIN_KEYS, maps))
+
+    # The same writers as BatchProcessor.process_file.
+    if save_format == 'npz':
+        timed('save', lambda: np.savez_compressed(save_path, **results))
+    else:
+        timed('save', lambda: ResultsExporter.export(save_path, results, fmt=save_format, nan_aware=True))
+    return results, stages
+
+def run_case(field, size, engine, precision, sigma, noise, save_format, out_dir, repeats):
+    image, c1, c2, truth = make_field(field, size, noise=noise)
+    inside = evaluation_mask(field, size)
+    radii = mask_radii(size)
+    save_path = os.path.join(out_dir, 'results' + SAVE_SUFFIXES[save_format])
+
+    stages = {}
+    for _ in range(repeats):
+        results, timings = run_chain(image, c1, c2, radii, engine, precision, sigma, save_path, save_format)
+        for name, elapsed in timings.items():
+            stages[name] = min(elapsed, stages.get(name, np.inf))
+        if os.path.isdir(save_path):
+            shutil.rmtree(save_path)
+        else:
+            os.remove(save_path)
+
+    rms, worst = {}, {}
+    for key in STRAIN_KEYS:
+        error = results[key][inside] - truth[key][inside]
+        error = error[np.isfinite(error)]
+        rms[key] = float(np.sqrt(np.mean(error**2)))
+        worst[key] = float(np.max(np.abs(error)))
+
+    total = sum(stages.values())
+    return {
+        'field': field, 'size': size, 'engine': engine, 'precision': precision, 'sigma': sigma,
+        'save_format': save_format,
+        'stages': stages, 'total': total, 'mpix_per_s': size * size / total / 1e6,
+        'rms_error': rms, 'max_error': worst,
+    }
+
+def case_key(case):
+    return (case['field'], case['size'], case['engine'], case['precision'], case['sigma'], case['save_format'])
+
+def regressions(cases, baseline, time_tolerance=TIME_TOLERANCE, error_tolerance=ERROR_TOLERANCE):
+    """Messages for every case that is slower or less accurate than the same case in ``baseline``."""
+    reference = {case_key(case): case for case in baseline['cases']}
+    found = []
+    for case in cases:
+        old = reference.get(case_key(case))
+        if old is None:
+            continue
+        name = "{} {} {} {} sigma={} {}".format(*case_key(case))
+        # Stages are compared one by one, as the save alone can dominate the total.
+        for stage in STAGES:
+            if case['stages'][stage] > old['stages'][stage] * (1 + time_tolerance) + TIME_FLOOR:
+                found.append(f"{name}: {stage} took {case['stages'][stage]:.3f} s, "
+                             f"baseline {old['stages'][stage]:.3f} s")
+        for key in STRAIN_KEYS:
+            limit = old['rms_error'][key] * (1 + error_tolerance) + ERROR_FLOOR
+            if not case['rms_error'][key] <= limit:
+                found.append(f"{name}: RMS {key} error {case['rms_error'][key]:.4g}, "
+                             f"baseline {old['rms_error'][key]:.4g}")
+    return found
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'fft_backend': FFTBackend.backend,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time every GPA stage on synthetic lattices with known strain and check the "
+                    "error against ground truth; optionally compare with a saved baseline."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--fields", nargs="+", choices=FIELDS, default=FIELDS)
+    parser.add_argument("--engines", nargs="+", choices=STRAIN_ENGINES, default=('unwrap',))
+    parser.add_argument("--precision", choices=('double', 'single'), default='double')
+    parser.add_argument("--sigma", type=float, default=DEFAULT_SIGMA)
+    parser.add_argument("--noise", type=float, default=DEFAULT_NOISE)
+    parser.add_argument("--save-format", choices=sorted(SAVE_SUFFIXES), default='npz')
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--json", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON file of an earlier run; exit with status 1 on a regression.")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--error-tolerance", type=float, default=ERROR_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    header = " ".join(f"{name:>{max(9, len(name))}}" for name in STAGES)
+    errors = " ".join(f"{key:>11}" for key in STRAIN_KEYS)
+    print(f"{'size':>6} {'field':>11} {'engine':>9} {header} {'total':>8} {'MPix/s':>7}  RMS error: {errors}")
+
+    cases = []
+    out_dir = tempfile.mkdtemp(prefix='gpa_bench_suite_')
+    try:
+        # Modules imported on first use (scipy.ndimage, skimage, h5py) are
+        # loaded by a small untimed run, so the first case does not pay for them.
+        for engine in args.engines:
+            run_case(FIELDS[0], 64, engine, args.precision, args.sigma, args.noise, args.save_format, out_dir, 1)
+
+        for size in args.sizes:
+            for field in args.fields:
+                for engine in args.engines:
+                    case = run_case(
+                        field, size, engine, args.precision, args.sigma, args.noise,
+                        args.save_format, out_dir, args.repeats
+                    )
+                    cases.append(case)
+                    timings = " ".join(f"{case['stages'][name]:>{max(9, len(name))}.3f}" for name in STAGES)
+                    errors = " ".join(f"{case['rms_error'][key]:>11.4f}" for key in STRAIN_KEYS)
+                    print(f"{size:>6} {field:>11} {engine:>9} {timings} {case['total']:>8.3f} "
+                          f"{case['mpix_per_s']:>7.2f}             {errors}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    report = {'suite_version': SUITE_VERSION, 'environment': environment(), 'cases': cases}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('suite_version') != SUITE_VERSION:
+            print(f"{args.baseline} was recorded with other benchmark stages; record a new baseline.")
+            return 2
+        if baseline['environment'].get('cpus') != report['environment']['cpus']:
+            print("Note: the baseline was recorded on a machine with a different number of CPUs.")
+        found = regressions(cases, baseline, args.time_tolerance, args.error_tolerance)
+        for message in found:
+            print(f"REGRESSION {message}")
+        if found:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
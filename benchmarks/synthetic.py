@@ -0,0 +1,108 @@
+import numpy as np
+
+DEFAULT_PERIOD = 8.0
+
+def make_lattice(size, period=DEFAULT_PERIOD, exx=0.01, eyy=-0.005, noise=0.0, seed=0):
+    """Square HAADF-like lattice under a uniform strain."""
+    y, x = np.indices((size, size), dtype=float)
+    ux = exx * (x - size / 2)
+    uy = eyy * (y - size / 2)
+    image = 2.0 + np.cos(2*np.pi * (x - ux) / period) + np.cos(2*np.pi * (y - uy) / period)
+    if noise:
+        image += np.random.default_rng(seed).normal(0.0, noise, image.shape)
+
+    offset = int(round(size / period))
+    c1 = (size // 2, size // 2 + offset)
+    c2 = (size // 2 + offset, size // 2)
+    return image, c1, c2
+
+def mask_radii(size, period=DEFAULT_PERIOD):
+    """Inner/outer mask radii that keep a third of the g-vector length."""
+    g_len = size / period
+    return g_len / 6, g_len / 3
+
+# Known displacement fields of the accuracy suite; see ``displacement_field``.
+FIELDS = ('uniform', 'gradient', 'interface', 'dislocation')
+DEFAULT_AMPLITUDE = 0.02
+POISSON_RATIO = 0.3
+# Dislocation cores are excluded from error statistics within this many periods.
+CORE_RADIUS_PERIODS = 4
+
+def displacement_field(field, size, period=DEFAULT_PERIOD, amplitude=DEFAULT_AMPLITUDE):
+    """Displacements and their exact gradients for one of ``FIELDS``."""
+    y, x = np.ogrid[:size, :size]
+    x = x - size / 2
+    y = y - size / 2
+    shape = (size, size)
+    zero = np.zeros(shape)
+
+    if field == 'uniform':
+        exx, eyy = amplitude / 2, -amplitude / 4
+        ux, uy = np.broadcast_to(exx * x, shape), np.broadcast_to(eyy * y, shape)
+        return ux, uy, (zero, np.full(shape, exx), np.full(shape, eyy), zero)
+
+    if field == 'gradient':
+        ux = amplitude * x * y / size
+        return ux, np.zeros(shape), (
+            np.broadcast_to(amplitude * x / size, shape), np.broadcast_to(amplitude * y / size, shape), zero, zero
+        )
+
+    if field == 'interface':
+        width = period
+        step = 0.5 * (1 + np.tanh(y / width))
+        slope = 0.5 / width / np.cosh(y / width)**2
+        uy = np.broadcast_to(amplitude * y * step, shape)
+        return np.zeros(shape), uy, (zero, zero, np.broadcast_to(amplitude * (step + y * slope), shape), zero)
+
+    if field == 'dislocation':
+        # Offset by a quarter pixel so no pixel sits on the singular core.
+        x = x - 0.25
+        y = y - 0.25
+        b, nu = period, POISSON_RATIO
+        r2 = x**2 + y**2
+        scale = b / (2*np.pi)
+        ux = scale * (np.arctan2(y, x) + x * y / (2 * (1 - nu) * r2))
+        uy = -scale * ((1 - 2*nu) / (4 * (1 - nu)) * np.log(r2) + (x**2 - y**2) / (4 * (1 - nu) * r2))
+        dux_dx = scale * (-y / r2 + y * (y**2 - x**2) / (2 * (1 - nu) * r2**2))
+        dux_dy = scale * (x / r2 + x * (x**2 - y**2) / (2 * (1 - nu) * r2**2))
+        duy_dx = -scale * ((1 - 2*nu) / (2 * (1 - nu)) * x / r2 + x * y**2 / ((1 - nu) * r2**2))
+        duy_dy = -scale * ((1 - 2*nu) / (2 * (1 - nu)) * y / r2 - x**2 * y / ((1 - nu) * r2**2))
+        return ux, uy, (dux_dy, dux_dx, duy_dy, duy_dx)
+
+    raise ValueError(f"Unknown field: {field}")
+
+def make_field(field, size, period=DEFAULT_PERIOD, amplitude=DEFAULT_AMPLITUDE, noise=0.0, seed=0):
+    """Lattice displaced by one of ``FIELDS``, with its ground-truth maps."""
+    ux, uy, gradients = displacement_field(field, size, period, amplitude)
+    y, x = np.ogrid[:size, :size]
+    image = 2.0 + np.cos(2*np.pi * (x - ux) / period) + np.cos(2*np.pi * (y - uy) / period)
+    if noise:
+        image += np.random.default_rng(seed).normal(0.0, noise, image.shape)
+
+    offset = int(round(size / period))
+    c1 = (size // 2, size // 2 + offset)
+    c2 = (size // 2 + offset, size // 2)
+    return image, c1, c2, truth_maps(gradients)
+
+def truth_maps(gradients):
+    """Strain (in %) and rotation maps of exact gradients, as ``StrainCalculator.strain_maps``."""
+    from strain_calculator import ROTATION_IN_DEGREES
+
+    dux_dy, dux_dx, duy_dy, duy_dx = gradients
+    rotation = 0.5 * (duy_dx - dux_dy)
+    return {
+        'strain_xx': 100 * dux_dx,
+        'strain_yy': 100 * duy_dy,
+        'strain_xy': 50 * (dux_dy + duy_dx),
+        'rotation_xy': np.degrees(rotation) if ROTATION_IN_DEGREES else rotation,
+    }
+
+def evaluation_mask(field, size, period=DEFAULT_PERIOD, margin=None):
+    """Pixels counted in error statistics: away from the edges (and the dislocation core)."""
+    margin = size // 8 if margin is None else margin
+    mask = np.zeros((size, size), dtype=bool)
+    mask[margin:size - margin, margin:size - margin] = True
+    if field == 'dislocation':
+        y, x = np.ogrid[:size, :size]
+        mask &= (x - size / 2)**2 + (y - size / 2)**2 > (CORE_RADIUS_PERIODS * period)**2
+    return mask
@@ -1,63 +1,225 @@
-import numpy as np
-import hyperspy.api as hs
-from tkinter import filedialog
-from scipy.ndimage import gaussian_filter
-from numpy.fft import fft2, fftshift
-
-class DataProcessor:
-
-
-    @staticmethod
-    def load_haadf_image():
-        file_path = filedialog.askopenfilename(
-            title="Select Data File",
-            filetypes=[
-                ("Supported files", "*.emd *.dm3 *.dm4 *.tiff *.tif *.h5 *.hdf"),
-                ("EMD files", "*.emd"),
-                ("DM3 files", "*.dm3"),
-                ("DM4 files", "*.dm4"),
-                ("TIFF files", "*.tiff *.tif"),
-                ("HDF5 files", "*.h5 *.hdf"),
-                ("All files", "*.*")
-            ]
-        )
-
-        if not file_path:
-            raise FileNotFoundError("No file selected.")
-
-        try:
-            print(f"Loading file: {file_path}")
-            data_obj = hs.load(file_path, lazy=False)  
-
-            if hasattr(data_obj, 'data'):
-                data = data_obj.data
-            else:
-                data = np.array(data_obj)
-
-            if data.ndim == 3:
-                data = np.sum(data, axis=0)
-
-            if data.ndim > 2:
-                data = np.mean(data, axis=-1)
-
-            if data.dtype.names is not None:
-                data = data.view(np.uint8).reshape(data.shape + (-1,))
-                data = np.mean(data[:, :, :3], axis=-1)
-
-            return data.astype(float)
-
-        except Exception as e:
-            raise RuntimeError(f"Error loading file: {e}")
-
-    @staticmethod
-    def preprocess_data(data, threshold_percent=0):
-        smoothed_data = gaussian_filter(data, sigma=0)
-        threshold_value = np.percentile(smoothed_data, threshold_percent)
-        material_mask = smoothed_data > threshold_value
-        return smoothed_data, material_mask
-
-    @staticmethod
-    def compute_fft_and_contrast(smoothed_data):
-        fft_data = fftshift(fft2(smoothed_data))
-        fft_magnitude = abs(fft_data)
-        return fft_data, fft_magnitude
+import sys
+import time
+import numpy as np
+from fft_backend import FFTBackend, PAD_TO_FAST_LEN
+
+# hyperspy, h5py, tifffile, scipy.ndimage and tkinter are imported on first
+# use: hyperspy alone takes seconds to import, which every GUI start and
+# every batch worker process would otherwise pay up front.
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+# Floating-point type of every stage for each precision mode; the FFTs and
+# complex images follow as complex128/complex64.
+PRECISIONS = {'double': np.float64, 'single': np.float32}
+# Frame stacks are read and summed this many bytes at a time.
+LOAD_CHUNK_BYTES = 64 * 1024**2
+HDF5_EXTENSIONS = ('.h5', '.hdf', '.hdf5')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+
+class DataProcessor:
+
+
+    @staticmethod
+    def load_haadf_image(file_path=None, precision='double', frame_range=None, dataset=None):
+        """2D image of a micrograph file, opened lazily."""
+        if file_path is None:
+            from tkinter import filedialog
+            file_path = filedialog.askopenfilename(
+                title="Select Data File",
+                filetypes=[
+                    ("Supported files", "*.emd *.dm3 *.dm4 *.tiff *.tif *.h5 *.hdf"),
+                    ("EMD files", "*.emd"),
+                    ("DM3 files", "*.dm3"),
+                    ("DM4 files", "*.dm4"),
+                    ("TIFF files", "*.tiff *.tif"),
+                    ("HDF5 files", "*.h5 *.hdf"),
+                    ("All files", "*.*")
+                ]
+            )
+
+        if not file_path:
+            raise FileNotFoundError("No file selected.")
+
+        try:
+            print(f"Loading file: {file_path}")
+            start = time.perf_counter()
+            data = DataProcessor.open_lazy(file_path, dataset)
+            try:
+                image, bytes_read = DataProcessor.reduce_frames(
+                    data, frame_range, DataProcessor.real_dtype(precision)
+                )
+            finally:
+                DataProcessor.close_lazy(data)
+            elapsed = time.perf_counter() - start
+
+            rss = DataProcessor.peak_rss_mib()
+            print(
+                f"Loaded {image.shape[0]}x{image.shape[1]} image from {bytes_read / 1024**2:.0f} MiB "
+                f"in {elapsed:.2f} s" + (f" (peak RSS {rss:.0f} MiB)" if rss is not None else "")
+            )
+            return image
+
+        except Exception as e:
+            raise RuntimeError(f"Error loading file: {e}")
+
+    @staticmethod
+    def open_lazy(file_path, dataset=None, min_ndim=2):
+        """Array-like view of a file's data that is read only when indexed."""
+        lower = file_path.lower()
+        if lower.endswith('.npy'):
+            return np.load(file_path, mmap_mode='r')
+
+        try:
+            if lower.endswith(HDF5_EXTENSIONS):
+                return DataProcessor.open_hdf5(file_path, dataset, min_ndim)
+            if lower.endswith(TIFF_EXTENSIONS):
+                return DataProcessor.open_tiff(file_path)
+        except ImportError:
+            pass
+        return DataProcessor.open_hyperspy(file_path, dataset, min_ndim)
+
+    @staticmethod
+    def open_hdf5(file_path, dataset=None, min_ndim=2):
+        import h5py
+
+        h5 = h5py.File(file_path, 'r')
+        try:
+            if dataset is None:
+                found = []
+                h5.visititems(
+                    lambda name, obj: found.append(name)
+                    if isinstance(obj, h5py.Dataset) and obj.ndim >= min_ndim else None
+                )
+                if not found:
+                    raise ValueError(f"No {min_ndim}D dataset found in {file_path}")
+                dataset = found[0]
+            return h5[dataset]
+        except Exception:
+            h5.close()
+            raise
+
+    @staticmethod
+    def close_lazy(data):
+        """Close the file behind an ``open_lazy`` view; only HDF5 datasets hold one open."""
+        h5py = sys.modules.get('h5py')
+        if h5py is not None and isinstance(data, h5py.Dataset):
+            data.file.close()
+
+    @staticmethod
+    def open_tiff(file_path):
+        """First image series of a TIFF, memory-mapped when stored uncompressed."""
+        import tifffile
+
+        with tifffile.TiffFile(file_path) as tif:
+            axes = tif.series[0].axes
+        try:
+            data = tifffile.memmap(file_path, mode='r')
+        except ValueError:
+            data = tifffile.imread(file_path)
+        if axes.endswith('S'):
+            data = np.mean(data[..., :3], axis=-1)
+        return data
+
+    @staticmethod
+    def open_hyperspy(file_path, dataset=None, min_ndim=2):
+        import hyperspy.api as hs
+
+        signals = hs.load(file_path, lazy=True)
+        if isinstance(signals, list):
+            if dataset is None:
+                signals = next((sig for sig in signals if sig.data.ndim >= min_ndim), signals[0])
+            elif isinstance(dataset, int):
+                signals = signals[dataset]
+            else:
+                matches = [sig for sig in signals if sig.metadata.General.title == dataset]
+                if not matches:
+                    raise ValueError(f"No signal titled {dataset!r} in {file_path}")
+                signals = matches[0]
+        return signals.data
+
+    @staticmethod
+    def reduce_frames(data, frame_range=None, dtype=np.float64):
+        """2D image of lazily loaded ``data``; returns ``(image, bytes_read)``."""
+        if data.ndim == 3:
+            n_frames = data.shape[0]
+            start, stop = frame_range if frame_range is not None else (0, n_frames)
+            if not 0 <= start < stop <= n_frames:
+                raise ValueError(f"Frame range {start}:{stop} outside a stack of {n_frames} frames")
+            frame_bytes = data.shape[1] * data.shape[2] * np.dtype(data.dtype).itemsize
+            step = max(1, LOAD_CHUNK_BYTES // frame_bytes)
+
+            image = np.zeros(data.shape[1:], dtype=dtype)
+            for first in range(start, stop, step):
+                chunk = np.asarray(data[first:min(first + step, stop)])
+                image += chunk.sum(axis=0, dtype=dtype)
+            return image, (stop - start) * frame_bytes
+
+        if frame_range is not None:
+            raise ValueError(f"A frame range needs a 3D stack, got shape {data.shape}")
+
+        data = np.asarray(data)
+        bytes_read = data.nbytes
+        if data.ndim > 2:
+            data = np.mean(data, axis=-1)
+
+        if data.dtype.names is not None:
+            data = data.view(np.uint8).reshape(data.shape + (-1,))
+            data = np.mean(data[:, :, :3], axis=-1)
+
+        return data.astype(dtype), bytes_read
+
+    @staticmethod
+    def peak_rss_mib():
+        """High-water mark of this process's resident memory, or ``None`` if unknown."""
+        # VmHWM belongs to this process image; ru_maxrss also counts the parent's
+        # peak across fork and exec.
+        try:
+            with open('/proc/self/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        if not HAS_RESOURCE:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere.
+        return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+    @staticmethod
+    def real_dtype(precision):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        return PRECISIONS[precision]
+
+    @staticmethod
+    def preprocess_data(data, threshold_percent=0):
+        smoothed_data = DataProcessor.smooth_data(data)
+        material_mask = DataProcessor.compute_material_mask(smoothed_data, threshold_percent)
+        return smoothed_data, material_mask
+
+    @staticmethod
+    def smooth_data(data, sigma=0):
+        # gaussian_filter with sigma 0 is an exact copy; skip it.
+        if sigma == 0:
+            return data
+        from scipy.ndimage import gaussian_filter
+        return gaussian_filter(data, sigma=sigma)
+
+    @staticmethod
+    def compute_material_mask(smoothed_data, threshold_percent=0):
+        threshold_value = np.percentile(smoothed_data, threshold_percent)
+        return smoothed_data > threshold_value
+
+    @staticmethod
+    def compute_fft_and_contrast(smoothed_data, pad_to_fast=PAD_TO_FAST_LEN):
+        if pad_to_fast:
+            smoothed_data = FFTBackend.pad_to_fast_shape(smoothed_data)
+        fft_data = FFTBackend.fftshift(FFTBackend.fft2_real(smoothed_data))
+        fft_magnitude = abs(fft_data)
+        return fft_data, fft_magnitude
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gpa_strain')
+DEFAULT_CACHE_BYTES = 2 * 1024**3
+META_NAME = 'meta.json'
+COUNTERS = ('hits', 'misses', 'writes', 'evictions')
+
+class DiskCache:
+    """Size-bounded store of stage results as memory-mappable ``.npy`` files."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def array_hash(array):
+        """Hex digest of an array's shape, dtype and bytes."""
+        array = np.ascontiguousarray(array)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{array.shape}{array.dtype.str}".encode())
+        digest.update(array.data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(*parts):
+        """Hex digest of the ``repr`` of small, deterministic parameters."""
+        return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """The value stored under ``key``, or ``None``."""
+        meta_path = os.path.join(self._entry(key), META_NAME)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            items = []
+            for item in meta['items']:
+                if 'array' in item:
+                    path = os.path.join(self._entry(key), item['array'])
+                    items.append(np.load(path, mmap_mode='c').view(np.ndarray))
+                else:
+                    value = item['value']
+                    items.append(tuple(value) if isinstance(value, list) else value)
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            # Missing, half-evicted or unreadable entries count as misses.
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(items) if meta['tuple'] else items[0]
+
+    def put(self, key, value):
+        """Store an array, or a tuple of arrays and small values, under ``key``."""
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        stored_tuple = isinstance(value, tuple)
+        values = value if stored_tuple else (value,)
+        # An entry larger than the whole cache would be evicted straight away.
+        if sum(item.nbytes for item in values if isinstance(item, np.ndarray)) > self.max_bytes:
+            return
+        staging = f"{entry}.tmp-{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        items = []
+        size = 0
+        for index, item in enumerate(values):
+            if isinstance(item, np.ndarray):
+                name = f"{index}.npy"
+                np.save(os.path.join(staging, name), item)
+                size += item.nbytes
+                items.append({'array': name})
+            else:
+                if isinstance(item, tuple):
+                    item = [float(v) for v in item]
+                elif isinstance(item, np.generic):
+                    item = item.item()
+                items.append({'value': item})
+        with open(os.path.join(staging, META_NAME), 'w') as f:
+            json.dump({
+                'items': items, 'tuple': stored_tuple,
+                'bytes': size, 'created': time.time()
+            }, f)
+
+        try:
+            os.rename(staging, entry)
+            self.writes += 1
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """``(last_used, bytes, key)`` of every complete entry."""
+        found = []
+        for key in os.listdir(self.root):
+            meta_path = os.path.join(self._entry(key), META_NAME)
+            if '.tmp-' in key or not os.path.isfile(meta_path):
+                continue
+            try:
+                with open(meta_path, 'r') as f:
+                    size = json.load(f)['bytes']
+                found.append((os.path.getmtime(meta_path), size, key))
+            except (OSError, ValueError, KeyError):
+                continue
+        return found
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, key in self.entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def counts(self):
+        """Hits, misses, writes and evictions recorded by this object."""
+        return {name: getattr(self, name) for name in COUNTERS}
+
+    def add_counts(self, counts):
+        """Add the ``counts`` of a copy of this cache, e.g. one used by a worker process."""
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + counts[name])
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            **self.counts(),
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
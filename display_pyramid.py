@@ -0,0 +1,88 @@
+import warnings
+import numpy as np
+
+# Extra coarse pixels kept around the visible region when cropping, so small
+# pans do not show empty borders before the next refresh.
+VIEW_MARGIN = 2
+
+class DisplayPyramid:
+    """Block-averaged copies of a 2D map for drawing at screen resolution."""
+
+    def __init__(self, image, source=None, step=1, shape=None):
+        self.image = image
+        # The array the display image was derived from (e.g. a complex image
+        # for its magnitude), used by callers to tell whether it is stale.
+        self.source = image if source is None else source
+        self.step = step
+        self.shape = tuple(shape) if shape is not None else (image.shape[0] * step, image.shape[1] * step)
+        self.levels = {1: image}
+        self._limits = None
+
+    @staticmethod
+    def block_mean(image, factor):
+        ny, nx = image.shape
+        pad_y, pad_x = -ny % factor, -nx % factor
+        image = np.asarray(image, dtype=np.result_type(image.dtype, np.float32))
+        if pad_y or pad_x:
+            image = np.pad(image, ((0, pad_y), (0, pad_x)), constant_values=np.nan)
+        hy, hx = image.shape[0] // factor, image.shape[1] // factor
+
+        # Rows are summed first over contiguous memory, then the columns of
+        # the much smaller intermediate. NaNs propagate to their blocks.
+        rows = image.reshape(hy, factor, image.shape[1]).sum(axis=1)
+        level = rows.reshape(hy, hx, factor).sum(axis=2) / (factor * factor)
+
+        # Only blocks that contain a NaN are averaged again without them.
+        block_rows, block_cols = np.nonzero(np.isnan(level))
+        if block_rows.size:
+            offsets = np.arange(factor)
+            blocks = image[
+                (block_rows * factor)[:, None, None] + offsets[None, :, None],
+                (block_cols * factor)[:, None, None] + offsets[None, None, :]
+            ]
+            valid = ~np.isnan(blocks)
+            counts = valid.sum(axis=(1, 2))
+            sums = np.where(valid, blocks, 0).sum(axis=(1, 2))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                level[block_rows, block_cols] = sums / counts
+        return level
+
+    def limits(self):
+        """(min, max) of the finite full-resolution values, for colour scaling."""
+        if self._limits is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                low, high = np.nanmin(self.image), np.nanmax(self.image)
+            self._limits = (0.0, 1.0) if np.isnan(low) else (float(low), float(high))
+        return self._limits
+
+    def level(self, factor):
+        if factor not in self.levels:
+            self.levels[factor] = DisplayPyramid.block_mean(self.image, factor)
+        return self.levels[factor]
+
+    @staticmethod
+    def factor_for(visible, screen):
+        """Largest power of two that keeps ``visible`` map pixels >= ``screen`` pixels."""
+        ratio = max(visible[0] / max(screen[0], 1), visible[1] / max(screen[1], 1))
+        return 1 if ratio < 2 else 2 ** int(np.floor(np.log2(ratio)))
+
+    def view(self, xlim=None, ylim=None, screen=(400, 400)):
+        """``(array, extent, factor)`` to draw for the given axis limits."""
+        ny, nx = self.shape
+        x0, x1 = sorted(xlim) if xlim is not None else (-0.5, nx - 0.5)
+        y0, y1 = sorted(ylim) if ylim is not None else (-0.5, ny - 0.5)
+        x0, x1 = max(x0, -0.5), min(x1, nx - 0.5)
+        y0, y1 = max(y0, -0.5), min(y1, ny - 0.5)
+
+        level_factor = max(DisplayPyramid.factor_for((y1 - y0, x1 - x0), screen) // self.step, 1)
+        factor = level_factor * self.step
+        level = self.level(level_factor)
+        ly, lx = level.shape
+        r0 = max(int((y0 + 0.5) // factor) - VIEW_MARGIN, 0)
+        r1 = min(int(np.ceil((y1 + 0.5) / factor)) + VIEW_MARGIN, ly)
+        c0 = max(int((x0 + 0.5) // factor) - VIEW_MARGIN, 0)
+        c1 = min(int(np.ceil((x1 + 0.5) / factor)) + VIEW_MARGIN, lx)
+
+        extent = (c0*factor - 0.5, c1*factor - 0.5, r1*factor - 0.5, r0*factor - 0.5)
+        return level[r0:r1, c0:c1], extent, factor
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import scipy.fft
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft as pyfftw_fft
+    pyfftw.interfaces.cache.enable()
+    pyfftw.interfaces.cache.set_keepalive_time(300)
+    HAS_PYFFTW = True
+except ImportError:
+    HAS_PYFFTW = False
+
+FFT_BACKENDS = ('scipy', 'pyfftw')
+DEFAULT_FFT_BACKEND = 'pyfftw' if HAS_PYFFTW else 'scipy'
+DEFAULT_FFT_WORKERS = os.cpu_count() or 1
+
+# Pad frames whose size has large prime factors (e.g. 2047, 4093) up to the
+# next size the FFT handles efficiently.
+PAD_TO_FAST_LEN = True
+
+class FFTBackend:
+    """Single entry point for every FFT in the GPA chain."""
+
+    backend = DEFAULT_FFT_BACKEND
+    workers = DEFAULT_FFT_WORKERS
+
+
+    @staticmethod
+    def set_backend(name=None, workers=None):
+        if name is not None:
+            if name not in FFT_BACKENDS:
+                raise ValueError(f"Unknown FFT backend: {name}")
+            if name == 'pyfftw' and not HAS_PYFFTW:
+                raise RuntimeError("pyFFTW is not installed.")
+            FFTBackend.backend = name
+        if workers is not None:
+            FFTBackend.workers = max(1, int(workers))
+
+    @staticmethod
+    def _module():
+        return pyfftw_fft if FFTBackend.backend == 'pyfftw' else scipy.fft
+
+    @staticmethod
+    def fft2(x):
+        return FFTBackend._module().fft2(x, workers=FFTBackend.workers)
+
+    @staticmethod
+    def ifft2(x, overwrite_x=False):
+        """Inverse 2D FFT over the last two axes, so stacks are transformed in one call."""
+        return FFTBackend._module().ifft2(x, workers=FFTBackend.workers, overwrite_x=overwrite_x)
+
+    @staticmethod
+    def rfft2(x):
+        return FFTBackend._module().rfft2(x, workers=FFTBackend.workers)
+
+    @staticmethod
+    def dctn(x):
+        """2D DCT-II (unnormalised); always ``scipy.fft``."""
+        return scipy.fft.dctn(x, type=2, workers=FFTBackend.workers)
+
+    @staticmethod
+    def idst_idct(x, axis):
+        """Inverse DST-II along ``axis`` and inverse DCT-II along the other axis."""
+        x = scipy.fft.idst(x, type=2, axis=axis, workers=FFTBackend.workers)
+        return scipy.fft.idct(x, type=2, axis=1 - axis, workers=FFTBackend.workers, overwrite_x=True)
+
+    @staticmethod
+    def fft2_real(x):
+        """Full 2D spectrum of a real image."""
+        if FFTBackend.backend == 'scipy':
+            return FFTBackend.fft2(x)
+
+        ny, nx = x.shape
+        half = FFTBackend.rfft2(x)
+        full = np.empty((ny, nx), dtype=half.dtype)
+        full[:, :nx // 2 + 1] = half
+        if nx > 2:
+            rows = (-np.arange(ny)) % ny
+            cols = nx - np.arange(nx // 2 + 1, nx)
+            full[:, nx // 2 + 1:] = np.conj(half[np.ix_(rows, cols)])
+        return full
+
+    @staticmethod
+    def fftshift(x, axes=None):
+        return scipy.fft.fftshift(x, axes=axes)
+
+    @staticmethod
+    def ifftshift(x, axes=None):
+        return scipy.fft.ifftshift(x, axes=axes)
+
+    @staticmethod
+    def fast_shape(shape):
+        return tuple(scipy.fft.next_fast_len(int(n), real=True) for n in shape)
+
+    @staticmethod
+    def pad_to_fast_shape(data):
+        """Pad ``data`` at the bottom/right edges to the next fast FFT size."""
+        target = FFTBackend.fast_shape(data.shape)
+        if target == data.shape:
+            return data
+        pad = [(0, t - n) for t, n in zip(target, data.shape)]
+        return np.pad(data, pad, mode='constant', constant_values=data.mean())
@@ -0,0 +1,84 @@
+import os
+import shutil
+import numpy as np
+
+from worker_pool import WorkerPool
+
+DEFAULT_DPI = 600
+DEFAULT_FORMAT = 'tif'
+SAVE_FORMATS = ('tif', 'png', 'pdf', 'svg')
+FIGURE_SIZE = (5, 4)
+
+class FigureRenderer:
+    """Writes result panels to image files from a pool of Agg processes."""
+
+
+    @staticmethod
+    def display_data(data, log=False):
+        if log and np.all(data >= 0):
+            return np.log(data + 1)
+        return data
+
+    @staticmethod
+    def render_panel(array_path, panel, out_path, dpi, fmt, axes):
+        """Draw one panel. Runs inside the worker processes."""
+        import matplotlib
+        import matplotlib.image
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        data = FigureRenderer.display_data(np.load(array_path, mmap_mode='r'), panel.get('log', False))
+        if not axes:
+            matplotlib.image.imsave(
+                out_path, data, cmap=panel['cmap'], vmin=panel.get('vmin'), vmax=panel.get('vmax'),
+                format='tiff' if fmt == 'tif' else fmt, dpi=dpi
+            )
+            return out_path
+
+        fig = Figure(figsize=FIGURE_SIZE, dpi=100)
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        im = ax.imshow(data, cmap=panel['cmap'], vmin=panel.get('vmin'), vmax=panel.get('vmax'))
+        ax.set_xticks([])
+        ax.set_yticks([])
+        if panel.get('title'):
+            ax.set_title(panel['title'])
+        fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+
+        # bbox_inches='tight' would render the whole figure twice at the output
+        # DPI; the tight box is the same in inches when measured at screen DPI.
+        fig.canvas.draw()
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+        fig.savefig(
+            out_path, dpi=dpi, format=fmt,
+            bbox_inches=bbox.padded(matplotlib.rcParams['savefig.pad_inches'])
+        )
+        return out_path
+
+    @staticmethod
+    def render(panels, out_dir, dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, axes=True, workers=None):
+        """Render every panel into ``out_dir``; returns the written paths in order."""
+        if fmt not in SAVE_FORMATS:
+            raise ValueError(f"Unknown image format: {fmt}")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(panels)))
+
+        shared_dir = WorkerPool.shared_dir('gpa_render_')
+        try:
+            jobs = []
+            for index, panel in enumerate(panels):
+                array_path = os.path.join(shared_dir, f"{index}.npy")
+                np.save(array_path, np.asarray(panel['data'], dtype=np.float32))
+                stem = os.path.splitext(panel['filename'])[0]
+                meta = {key: value for key, value in panel.items() if key != 'data'}
+                jobs.append((array_path, meta, os.path.join(out_dir, f"{stem}.{fmt}")))
+
+            if workers == 1:
+                return [FigureRenderer.render_panel(*job, dpi, fmt, axes) for job in jobs]
+
+            with WorkerPool.spawn(workers) as pool:
+                futures = [pool.submit(FigureRenderer.render_panel, *job, dpi, fmt, axes) for job in jobs]
+                return [future.result() for future in futures]
+        finally:
+            shutil.rmtree(shared_dir, ignore_errors=True)
@@ -1,612 +1,1006 @@
-import os
-import sys
-import numpy as np
-import matplotlib
-matplotlib.use("TkAgg")
-import matplotlib.pyplot as plt
-
-from tkinter import (
-    Tk, Label, Entry, Button as TkButton, StringVar, messagebox, filedialog,
-    Scale, HORIZONTAL, Frame, simpledialog
-)
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.figure import Figure
-from matplotlib.patches import Rectangle, Circle
-from skimage.measure import profile_line
-
-from data_processor import DataProcessor
-from strain_calculator import StrainCalculator
-
-COLORMAP = 'jet'
-DEFAULT_THRESHOLD_PERCENTILE = 0
-DEFAULT_SIGMA_STRAIN_SMOOTH = 0
-
-class GPAApp:
-    def __init__(self, master):
-        self.master = master
-        self.master.title("Strain Mapping GUI (in %)")
-
-        self.master.rowconfigure(0, weight=0)
-        self.master.columnconfigure(0, weight=1)
-
-        self.center1_x = StringVar(value="0")
-        self.center1_y = StringVar(value="0")
-        self.gaussian_width1 = StringVar(value="10")
-        self.circle_radius1 = StringVar(value="20")
-
-        self.center2_x = StringVar(value="0")
-        self.center2_y = StringVar(value="0")
-        self.gaussian_width2 = StringVar(value="10")
-        self.circle_radius2 = StringVar(value="20")
-
-        self.ref_x0 = StringVar(value="0")
-        self.ref_y0 = StringVar(value="0")
-        self.ref_x1 = StringVar(value="50")
-        self.ref_y1 = StringVar(value="50")
-
-        self.sigma_smooth_var = StringVar(value=str(DEFAULT_SIGMA_STRAIN_SMOOTH))
-
-        self.exx_min_var = StringVar(value="-5")
-        self.exx_max_var = StringVar(value="5")
-        self.eyy_min_var = StringVar(value="-5")
-        self.eyy_max_var = StringVar(value="5")
-
-        self.selected_points = []
-        self.data = None
-        self.smoothed_data = None
-        self.material_mask = None
-        self.fft_data = None
-        self.fft_magnitude = None
-        self.colorbars = []
-        self.last_results = None
-        self.out_dir = None  
-
-        self.build_gui()
-        self.load_data_initial()
-        self.init_matplotlib_canvas()
-
-    def build_gui(self):
-        self.control_frame = Frame(self.master)
-        self.control_frame.grid(row=0, column=0, sticky="nsew")
-
-        TkButton(
-            self.control_frame, 
-            text="Load New Image", 
-            command=self.load_new_image
-        ).grid(row=0, columnspan=2, pady=5)
-
-        Label(self.control_frame, text="FFT Plot: Select Circle Centers").grid(row=1, columnspan=2)
-        TkButton(
-            self.control_frame, 
-            text="Select Points", 
-            command=self.select_centers
-        ).grid(row=2, columnspan=2, pady=5)
-
-        Label(self.control_frame, text="Center 1 X:").grid(row=3, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.center1_x).grid(row=3, column=1)
-        Label(self.control_frame, text="Center 1 Y:").grid(row=4, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.center1_y).grid(row=4, column=1)
-        Label(self.control_frame, text="Inner Radius 1:").grid(row=5, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.gaussian_width1).grid(row=5, column=1)
-        Label(self.control_frame, text="Outer Radius 1:").grid(row=6, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.circle_radius1).grid(row=6, column=1)
-
-        Label(self.control_frame, text="Center 2 X:").grid(row=7, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.center2_x).grid(row=7, column=1)
-        Label(self.control_frame, text="Center 2 Y:").grid(row=8, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.center2_y).grid(row=8, column=1)
-        Label(self.control_frame, text="Inner Radius 2:").grid(row=9, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.gaussian_width2).grid(row=9, column=1)
-        Label(self.control_frame, text="Outer Radius 2:").grid(row=10, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.circle_radius2).grid(row=10, column=1)
-
-        Label(self.control_frame, text="Ref Area Top-Left X:").grid(row=11, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.ref_x0).grid(row=11, column=1)
-        Label(self.control_frame, text="Ref Area Top-Left Y:").grid(row=12, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.ref_y0).grid(row=12, column=1)
-        Label(self.control_frame, text="Ref Area Bottom-Right X:").grid(row=13, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.ref_x1).grid(row=13, column=1)
-        Label(self.control_frame, text="Ref Area Bottom-Right Y:").grid(row=14, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.ref_y1).grid(row=14, column=1)
-
-        Label(self.control_frame, text="Sigma").grid(row=15, column=0, sticky="e")
-        self.sigma_scale = Scale(self.control_frame, from_=0, to=50, resolution=0.1, orient=HORIZONTAL)
-        self.sigma_scale.set(float(self.sigma_smooth_var.get()))
-        self.sigma_scale.grid(row=15, column=1, sticky="ew")
-
-        Label(self.control_frame, text="Mask Threshold (%)").grid(row=16, column=0, sticky="e")
-        self.threshold_scale = Scale(self.control_frame, from_=0, to=100, resolution=0.1, orient=HORIZONTAL)
-        self.threshold_scale.set(DEFAULT_THRESHOLD_PERCENTILE)
-        self.threshold_scale.grid(row=16, column=1, sticky="ew")
-
-        # Strain scale (in %)
-        Label(self.control_frame, text="Exx min (%):").grid(row=17, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.exx_min_var).grid(row=17, column=1)
-
-        Label(self.control_frame, text="Exx max (%):").grid(row=18, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.exx_max_var).grid(row=18, column=1)
-
-        Label(self.control_frame, text="Eyy min (%):").grid(row=19, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.eyy_min_var).grid(row=19, column=1)
-
-        Label(self.control_frame, text="Eyy max (%):").grid(row=20, column=0, sticky="e")
-        Entry(self.control_frame, textvariable=self.eyy_max_var).grid(row=20, column=1)
-
-        TkButton(self.control_frame, text="Apply", command=self.process_selection).grid(row=21, columnspan=2, pady=10)
-        TkButton(self.control_frame, text="Save", command=self.save_images).grid(row=22, columnspan=2, pady=10)
-        TkButton(self.control_frame, text="Line Scan", command=self.line_scan_dialog).grid(row=23, columnspan=2, pady=10)
-
-        for i in range(24):
-            self.control_frame.rowconfigure(i, weight=0)
-        self.control_frame.columnconfigure(0, weight=1)
-        self.control_frame.columnconfigure(1, weight=1)
-
-    def load_data_initial(self):
-        """Attempt to load data once the app starts."""
-        try:
-            self.data = DataProcessor.load_haadf_image()
-            threshold_val = self.threshold_scale.get()
-            self.smoothed_data, self.material_mask = DataProcessor.preprocess_data(
-                self.data, threshold_percent=threshold_val
-            )
-            self.fft_data, self.fft_magnitude = DataProcessor.compute_fft_and_contrast(
-                self.smoothed_data
-            )
-        except FileNotFoundError:
-            messagebox.showerror("File Selection Error", "No file selected. Exiting.")
-            self.master.destroy()
-            sys.exit(1)
-        except Exception as e:
-            messagebox.showerror("Initialization Error", str(e))
-            self.master.destroy()
-            sys.exit(1)
-
-    def load_new_image(self):
-        try:
-            data_new = DataProcessor.load_haadf_image()
-        except FileNotFoundError:
-            return
-        except Exception as e:
-            messagebox.showerror("Loading Error", str(e))
-            return
-
-        self.data = data_new
-        threshold_val = self.threshold_scale.get()
-        self.smoothed_data, self.material_mask = DataProcessor.preprocess_data(
-            self.data, threshold_percent=threshold_val
-        )
-        self.fft_data, self.fft_magnitude = DataProcessor.compute_fft_and_contrast(
-            self.smoothed_data
-        )
-        self.last_results = None
-
-        # Clear colorbars and axes
-        for cbar in self.colorbars:
-            cbar.remove()
-        self.colorbars.clear()
-
-        for ax in self.axs.flatten():
-            ax.clear()
-
-        self.canvas.draw()
-        messagebox.showinfo("New Image Loaded",
-                            "Successfully loaded a new image.\nSet parameters and click 'Apply' to process.")
-
-    def select_centers(self):
-        if self.fft_magnitude is None:
-            return
-        self.selected_points.clear()
-
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 5))
-        fig.suptitle("Double-click on left to pick dot1, on right to pick dot2")
-
-        im1 = ax1.imshow(np.log(self.fft_magnitude + 1), cmap='gray')
-        ax1.set_title("Left (dot1)")
-        plt.colorbar(im1, ax=ax1)
-
-        im2 = ax2.imshow(np.log(self.fft_magnitude + 1), cmap='gray')
-        ax2.set_title("Right (dot2)")
-        plt.colorbar(im2, ax=ax2)
-
-        def on_click(event):
-            if event.dblclick:
-                ix, iy = int(event.xdata), int(event.ydata)
-                if event.inaxes == ax1:
-                    self.selected_points.append((iy, ix))
-                elif event.inaxes == ax2:
-                    self.selected_points.append((iy, ix))
-
-                if len(self.selected_points) == 2:
-                    fig.canvas.mpl_disconnect(cid)
-                    plt.close(fig)
-                    self.center1_y.set(str(self.selected_points[0][0]))
-                    self.center1_x.set(str(self.selected_points[0][1]))
-                    self.center2_y.set(str(self.selected_points[1][0]))
-                    self.center2_x.set(str(self.selected_points[1][1]))
-
-        cid = fig.canvas.mpl_connect('button_press_event', on_click)
-        plt.show()
-
-    def process_selection(self):
-        try:
-            if self.data is None:
-                messagebox.showerror("No Data", "Please load an image first.")
-                return
-
-            threshold_val = self.threshold_scale.get()
-            self.smoothed_data, self.material_mask = DataProcessor.preprocess_data(
-                self.data, threshold_percent=threshold_val
-            )
-            self.fft_data, self.fft_magnitude = DataProcessor.compute_fft_and_contrast(self.smoothed_data)
-
-            c1 = (int(self.center1_y.get()), int(self.center1_x.get()))
-            g1 = float(self.gaussian_width1.get())
-            r1 = float(self.circle_radius1.get())
-
-            c2 = (int(self.center2_y.get()), int(self.center2_x.get()))
-            g2 = float(self.gaussian_width2.get())
-            r2 = float(self.circle_radius2.get())
-
-            x0 = int(self.ref_x0.get())
-            y0 = int(self.ref_y0.get())
-            x1 = int(self.ref_x1.get())
-            y1 = int(self.ref_y1.get())
-            reference_area = (
-                slice(min(y0, y1), max(y0, y1)),
-                slice(min(x0, x1), max(x0, x1))
-            )
-
-            sigma_smooth = float(self.sigma_scale.get())
-
-            results = StrainCalculator.calculate_displacements_and_strain(
-                self.fft_data,
-                self.material_mask,
-                c1, g1, r1,
-                c2, g2, r2,
-                reference_area, 
-                sigma_smooth
-            )
-
-            self.last_results = results
-            self.update_plots(results, c1, g1, r1, c2, g2, r2, reference_area)
-
-            messagebox.showinfo("Process Done", "Processing completed.")
-
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Please enter valid numeric values.")
-        except Exception as e:
-            messagebox.showerror("Processing Error", str(e))
-
-    def init_matplotlib_canvas(self):
-        self.canvas_frame = Frame(self.master)
-        self.canvas_frame.grid(row=0, column=1, sticky="nsew", padx=0.1, pady=0.1)
-
-        self.master.rowconfigure(0, weight=1)
-        self.master.columnconfigure(1, weight=1)
-
-        self.canvas_frame.rowconfigure(0, weight=1)
-        self.canvas_frame.columnconfigure(0, weight=1)
-
-        self.fig = Figure(figsize=(15, 12), dpi=100)
-        self.axs = self.fig.subplots(3, 4)
-        self.fig.subplots_adjust(wspace=0.3, hspace=0.3)
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.grid(row=0, column=0, sticky="nsew")
-
-        self.toolbar_frame = Frame(self.master)
-        self.toolbar_frame.grid(row=1, column=1, sticky="ew")
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.toolbar_frame)
-        self.toolbar.update()
-
-    def update_plots(self, results, c1, g1, r1, c2, g2, r2, reference_area):
-        raw_phase_image1 = results['raw_phase_image1']
-        raw_phase_image2 = results['raw_phase_image2']
-        phase_image1 = results['phase_image1']
-        phase_image2 = results['phase_image2']
-        strain_xx = results['strain_xx']  # in %
-        strain_yy = results['strain_yy']  # in %
-        strain_xy = results['strain_xy']  # in %
-        rotation_xy = results['rotation_xy']
-        comp1_mag = np.abs(results['complex_image1'])
-        comp2_mag = np.abs(results['complex_image2'])
-
-        exx_min = float(self.exx_min_var.get())
-        exx_max = float(self.exx_max_var.get())
-        eyy_min = float(self.eyy_min_var.get())
-        eyy_max = float(self.eyy_max_var.get())
-
-        exy_min, exy_max = -5, 5  
-        rot_min, rot_max = -5, 5
-
-        for cbar in self.colorbars:
-            cbar.remove()
-        self.colorbars.clear()
-
-        for ax in self.axs.flatten():
-            ax.clear()
-
-        ax0 = self.axs[0, 0]
-        im0 = ax0.imshow(self.data, cmap='gray')
-        ax0.set_title("Original HAADF")
-        cbar0 = self.fig.colorbar(im0, ax=ax0, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar0)
-
-        rect = Rectangle(
-            (reference_area[1].start, reference_area[0].start),
-            reference_area[1].stop - reference_area[1].start,
-            reference_area[0].stop - reference_area[0].start,
-            linewidth=2, edgecolor='yellow', facecolor='none'
-        )
-        ax0.add_patch(rect)
-
-        ax1 = self.axs[0, 1]
-        im1 = ax1.imshow(np.log(self.fft_magnitude + 1), cmap='gray')
-        ax1.set_title("FFT Magnitude")
-        cbar1 = self.fig.colorbar(im1, ax=ax1, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar1)
-
-        circle1_in = Circle((c1[1], c1[0]), g1, color='red', fill=False, linewidth=1)
-        circle1_out = Circle((c1[1], c1[0]), r1, color='magenta', fill=False, linewidth=1)
-        ax1.add_patch(circle1_in)
-        ax1.add_patch(circle1_out)
-
-        circle2_in = Circle((c2[1], c2[0]), g2, color='blue', fill=False, linewidth=1)
-        circle2_out = Circle((c2[1], c2[0]), r2, color='green', fill=False, linewidth=1)
-        ax1.add_patch(circle2_in)
-        ax1.add_patch(circle2_out)
-
-        ax2 = self.axs[0, 2]
-        im2 = ax2.imshow(phase_image1, cmap=COLORMAP)
-        ax2.set_title("Phase Image 1")
-        cbar2 = self.fig.colorbar(im2, ax=ax2, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar2)
-
-        ax3 = self.axs[0, 3]
-        im3 = ax3.imshow(phase_image2, cmap=COLORMAP)
-        ax3.set_title("Phase Image 2")
-        cbar3 = self.fig.colorbar(im3, ax=ax3, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar3)
-
-        ax4 = self.axs[1, 0]
-        im4 = ax4.imshow(strain_xx, cmap=COLORMAP, vmin=exx_min, vmax=exx_max)
-        ax4.set_title("Exx (%)")
-        cbar4 = self.fig.colorbar(im4, ax=ax4, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar4)
-
-        ax5 = self.axs[1, 1]
-        im5 = ax5.imshow(strain_yy, cmap=COLORMAP, vmin=eyy_min, vmax=eyy_max)
-        ax5.set_title("Eyy (%)")
-        cbar5 = self.fig.colorbar(im5, ax=ax5, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar5)
-
-        ax6 = self.axs[1, 2]
-        im6 = ax6.imshow(strain_xy, cmap=COLORMAP, vmin=exy_min, vmax=exy_max)
-        ax6.set_title("Exy (%)")
-        cbar6 = self.fig.colorbar(im6, ax=ax6, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar6)
-
-        ax7 = self.axs[1, 3]
-        rot_label = "Rotation (deg)"
-        im7 = ax7.imshow(rotation_xy, cmap=COLORMAP, vmin=rot_min, vmax=rot_max)
-        ax7.set_title(rot_label)
-        cbar7 = self.fig.colorbar(im7, ax=ax7, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar7)
-
-        ax8 = self.axs[2, 0]
-        im8 = ax8.imshow(raw_phase_image1, cmap='gray')
-        ax8.set_title("Raw Phase Image 1")
-        cbar8 = self.fig.colorbar(im8, ax=ax8, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar8)
-
-        ax9 = self.axs[2, 1]
-        im9 = ax9.imshow(raw_phase_image2, cmap='gray')
-        ax9.set_title("Raw Phase Image 2")
-        cbar9 = self.fig.colorbar(im9, ax=ax9, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar9)
-
-        ax10 = self.axs[2, 2]
-        im10 = ax10.imshow(comp1_mag, cmap='gray')
-        ax10.set_title("Complex Image 1 Mag")
-        cbar10 = self.fig.colorbar(im10, ax=ax10, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar10)
-
-        ax11 = self.axs[2, 3]
-        im11 = ax11.imshow(comp2_mag, cmap='gray')
-        ax11.set_title("Complex Image 2 Mag")
-        cbar11 = self.fig.colorbar(im11, ax=ax11, fraction=0.046, pad=0.04)
-        self.colorbars.append(cbar11)
-
-        self.canvas.draw()
-
-    def save_figure_with_colorbar(self, img_data, cmap, filename,
-                                  title=None, do_log=False,
-                                  vmin=None, vmax=None):
-        """Helper to save a figure with consistent colorbar and scale."""
-        fig, ax = plt.subplots(figsize=(5,4), dpi=100)
-        if do_log and np.all(img_data >= 0):
-            plot_data = np.log(img_data + 1)
-        else:
-            plot_data = img_data
-
-        im = ax.imshow(plot_data, cmap=cmap, vmin=vmin, vmax=vmax)
-        ax.set_xticks([])
-        ax.set_yticks([])
-        if title:
-            ax.set_title(title)
-        cbar = fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-
-        out_path = os.path.join(self.out_dir, filename)
-        fig.savefig(out_path, dpi=600, format='tif', bbox_inches='tight')
-        plt.close(fig)
-
-    def save_images(self):
-        """Main save function triggered by the Save button."""
-        if self.last_results is None:
-            messagebox.showerror("No Results", "Please click 'Apply' first to generate results.")
-            return
-
-        self.out_dir = filedialog.askdirectory(title="Select folder to save .tif images")
-        if not self.out_dir:
-            return
-
-        exx_min = float(self.exx_min_var.get())
-        exx_max = float(self.exx_max_var.get())
-        eyy_min = float(self.eyy_min_var.get())
-        eyy_max = float(self.eyy_max_var.get())
-        exy_min, exy_max = -5, 5
-        rot_min, rot_max = -5, 5
-
-        r = self.last_results
-        raw_phase_image1 = r['raw_phase_image1']
-        raw_phase_image2 = r['raw_phase_image2']
-        phase_image1 = r['phase_image1']
-        phase_image2 = r['phase_image2']
-        strain_xx = r['strain_xx']
-        strain_yy = r['strain_yy']
-        strain_xy = r['strain_xy']
-        rotation_xy = r['rotation_xy']
-        comp1_mag = np.abs(r['complex_image1'])
-        comp2_mag = np.abs(r['complex_image2'])
-
-        self.save_figure_with_colorbar(self.data, 'gray',
-                                       "01_Original_HAADF.tif",
-                                       title="Original HAADF",
-                                       do_log=False)
-
-        self.save_figure_with_colorbar(self.fft_magnitude, 'gray',
-                                       "02_FFT_Magnitude.tif",
-                                       title="FFT Magnitude",
-                                       do_log=True)
-
-        self.save_figure_with_colorbar(raw_phase_image1, 'gray',
-                                       "03_Raw_Phase_Image_1.tif",
-                                       title="Raw Phase Image 1")
-        self.save_figure_with_colorbar(raw_phase_image2, 'gray',
-                                       "04_Raw_Phase_Image_2.tif",
-                                       title="Raw Phase Image 2")
-
-        self.save_figure_with_colorbar(phase_image1, COLORMAP,
-                                       "05_Phase_Image_1.tif",
-                                       title="Phase Image 1")
-        self.save_figure_with_colorbar(phase_image2, COLORMAP,
-                                       "06_Phase_Image_2.tif",
-                                       title="Phase Image 2")
-
-        self.save_figure_with_colorbar(strain_xx, COLORMAP,
-                                       "07_Strain_xx_percent.tif",
-                                       title="Strain XX (%)",
-                                       vmin=exx_min, vmax=exx_max)
-        self.save_figure_with_colorbar(strain_yy, COLORMAP,
-                                       "08_Strain_yy_percent.tif",
-                                       title="Strain YY (%)",
-                                       vmin=eyy_min, vmax=eyy_max)
-        self.save_figure_with_colorbar(strain_xy, COLORMAP,
-                                       "09_Strain_xy_percent.tif",
-                                       title="Strain XY (%)",
-                                       vmin=exy_min, vmax=exy_max)
-        self.save_figure_with_colorbar(rotation_xy, COLORMAP,
-                                       "10_Rotation_xy.tif",
-                                       title="Rotation XY",
-                                       vmin=rot_min, vmax=rot_max)
-
-        self.save_figure_with_colorbar(comp1_mag, 'gray',
-                                       "11_Complex_Image_1_Mag.tif",
-                                       title="Complex Image 1 Mag")
-        self.save_figure_with_colorbar(comp2_mag, 'gray',
-                                       "12_Complex_Image_2_Mag.tif",
-                                       title="Complex Image 2 Mag")
-
-        messagebox.showinfo("Save Complete", f"Images saved in:\n{self.out_dir}")
-
-    def line_scan_dialog(self):
-        """Dialog to pick which strain map to line-scan."""
-        if self.last_results is None:
-            messagebox.showerror("No Results", "Please click 'Apply' first to generate strain maps.")
-            return
-
-        strain_map_choices = ["strain_xx", "strain_yy", "strain_xy", "rotation_xy"]
-        choice = simpledialog.askstring(
-            "Line Scan Choice",
-            f"Which map do you want to line-scan?\nOptions: {', '.join(strain_map_choices)}",
-            initialvalue="strain_xx"
-        )
-        if not choice:
-            return
-        if choice not in strain_map_choices:
-            messagebox.showerror("Invalid Choice", "Please choose a valid map name.")
-            return
-
-        thickness = simpledialog.askinteger(
-            "Line Thickness",
-            "Enter line-scan thickness (integer pixels):",
-            minvalue=1,
-            maxvalue=100,
-            initialvalue=1
-        )
-        if thickness is None:
-            return
-
-        self.line_scan(map_name=choice, thickness=thickness)
-
-    def line_scan(self, map_name="strain_xx", thickness=1):
-        """Perform a line scan on the chosen strain map."""
-        data = self.last_results.get(map_name, None)
-        if data is None:
-            messagebox.showerror("Data Error", f"No data found for '{map_name}'.")
-            return
-
-        exx_min = float(self.exx_min_var.get())
-        exx_max = float(self.exx_max_var.get())
-        eyy_min = float(self.eyy_min_var.get())
-        eyy_max = float(self.eyy_max_var.get())
-        exy_min, exy_max = -5, 5
-        rot_min, rot_max = -5, 5
-
-        if map_name == 'strain_xx':
-            this_vmin, this_vmax = exx_min, exx_max
-        elif map_name == 'strain_yy':
-            this_vmin, this_vmax = eyy_min, eyy_max
-        elif map_name == 'strain_xy':
-            this_vmin, this_vmax = exy_min, exy_max
-        else:
-            this_vmin, this_vmax = rot_min, rot_max
-
-        fig, ax = plt.subplots()
-        ax.set_title(f"Click two points to define line on {map_name}")
-
-        im = ax.imshow(data, cmap=COLORMAP, vmin=this_vmin, vmax=this_vmax)
-        plt.colorbar(im, ax=ax)
-
-        points = []
-
-        def on_click(event):
-            if event.inaxes == ax and event.button == 1:
-                points.append((int(event.ydata), int(event.xdata)))
-                if len(points) == 2:
-                    fig.canvas.mpl_disconnect(cid)
-                    p0, p1 = points
-                    profile = profile_line(
-                        data,
-                        p0,
-                        p1,
-                        linewidth=thickness,
-                        order=1,
-                        reduce_func=np.mean
-                    )
-                    fig2, ax2 = plt.subplots()
-                    ax2.plot(profile, 'o-', lw=1.5)
-                    ax2.set_title(f"Line Scan of {map_name} (thickness={thickness})")
-                    ax2.set_xlabel("Distance (pixels along line)")
-                    if map_name.startswith('strain_'):
-                        ax2.set_ylabel(f"{map_name} (%)")
-                    else:
-                        ax2.set_ylabel(map_name)
-                    ax2.set_ylim([this_vmin, this_vmax])
-
-                    fig2.tight_layout()
-                    plt.show()
-
-        cid = fig.canvas.mpl_connect('button_press_event', on_click)
-        plt.show()
+import os
+import sys
+import time
+import queue
+import threading
+import numpy as np
+import matplotlib
+matplotlib.use("TkAgg")
+
+from tkinter import (
+    Tk, Label, Entry, Button as TkButton, StringVar, messagebox, filedialog,
+    Scale, HORIZONTAL, Frame, simpledialog, OptionMenu, Checkbutton, BooleanVar, Toplevel
+)
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle, Circle
+
+from data_processor import DataProcessor
+from data_processor import PRECISIONS
+from strain_calculator import StrainCalculator, STRAIN_ENGINES
+from gpa_pipeline import GPAPipeline, PipelineCancelled
+from disk_cache import DiskCache, DEFAULT_CACHE_DIR
+from peak_finder import PeakFinder
+from display_pyramid import DisplayPyramid
+from results_exporter import ResultsExporter
+from figure_renderer import FigureRenderer, DEFAULT_DPI, DEFAULT_FORMAT, SAVE_FORMATS
+from parameter_sweep import ParameterSweep, SWEEP_OUTPUTS
+
+COLORMAP = 'jet'
+DEFAULT_THRESHOLD_PERCENTILE = 0
+DEFAULT_SIGMA_STRAIN_SMOOTH = 0
+DEFAULT_STRAIN_ENGINE = 'unwrap'
+DEFAULT_PRECISION = 'double'
+POLL_INTERVAL_MS = 100
+# Live preview: decimated recompute shortly after a slider moves, full pass once it rests.
+PREVIEW_DELAY_MS = 50
+FULL_PASS_DELAY_MS = 700
+
+# Panels of the 3x4 result grid, row by row: (map key, title, colormap).
+PANELS = (
+    ('data', "Original HAADF", 'gray'),
+    ('fft', "FFT Magnitude", 'gray'),
+    ('phase_image1', "Phase Image 1", COLORMAP),
+    ('phase_image2', "Phase Image 2", COLORMAP),
+    ('strain_xx', "Exx (%)", COLORMAP),
+    ('strain_yy', "Eyy (%)", COLORMAP),
+    ('strain_xy', "Exy (%)", COLORMAP),
+    ('rotation_xy', "Rotation (deg)", COLORMAP),
+    ('raw_phase_image1', "Raw Phase Image 1", 'gray'),
+    ('raw_phase_image2', "Raw Phase Image 2", 'gray'),
+    ('complex_image1', "Complex Image 1 Mag", 'gray'),
+    ('complex_image2', "Complex Image 2 Mag", 'gray'),
+)
+
+class GPAApp:
+    def __init__(self, master):
+        self.master = master
+        self.master.title("Strain Mapping GUI (in %)")
+
+        self.master.rowconfigure(0, weight=0)
+        self.master.columnconfigure(0, weight=1)
+
+        self.center1_x = StringVar(value="0")
+        self.center1_y = StringVar(value="0")
+        self.gaussian_width1 = StringVar(value="10")
+        self.circle_radius1 = StringVar(value="20")
+
+        self.center2_x = StringVar(value="0")
+        self.center2_y = StringVar(value="0")
+        self.gaussian_width2 = StringVar(value="10")
+        self.circle_radius2 = StringVar(value="20")
+
+        self.ref_x0 = StringVar(value="0")
+        self.ref_y0 = StringVar(value="0")
+        self.ref_x1 = StringVar(value="50")
+        self.ref_y1 = StringVar(value="50")
+
+        self.sigma_smooth_var = StringVar(value=str(DEFAULT_SIGMA_STRAIN_SMOOTH))
+        self.engine_var = StringVar(value=DEFAULT_STRAIN_ENGINE)
+        self.precision_var = StringVar(value=DEFAULT_PRECISION)
+        self.crop_to_material_var = BooleanVar(value=False)
+        self.disk_cache_var = BooleanVar(value=False)
+
+        self.exx_min_var = StringVar(value="-5")
+        self.exx_max_var = StringVar(value="5")
+        self.eyy_min_var = StringVar(value="-5")
+        self.eyy_max_var = StringVar(value="5")
+
+        self.selected_points = []
+        self.data = None
+        self.smoothed_data = None
+        self.material_mask = None
+        self.fft_data = None
+        self.fft_magnitude = None
+        self.colorbars = []
+        self.images = {}
+        self.pyramids = {}
+        self.panel_views = {}
+        self.panel_shapes = {}
+        self.last_results = None
+        self.last_job = None
+        self.out_dir = None  
+        self.pipeline = GPAPipeline()
+        self.cache_counts = (0, 0)
+        self.job_queue = queue.Queue()
+        self.worker = None
+        self.generation = 0
+        self.cancel_event = None
+        self.pending_job = None
+        self.job_started = None
+        self.status_var = StringVar(value="Ready")
+        self.live_preview_var = BooleanVar(value=True)
+        self.preview_after_id = None
+        self.full_pass_after_id = None
+        self.save_dpi_var = StringVar(value=str(DEFAULT_DPI))
+        self.save_format_var = StringVar(value=DEFAULT_FORMAT)
+        self.save_axes_var = BooleanVar(value=True)
+        self.save_thread = None
+        self.save_outcome = None
+        self.save_started = None
+        self.sweep_thread = None
+        self.sweep_outcome = None
+        self.sweep_cancel = None
+        self.sweep_started = None
+
+        self.build_gui()
+        self.load_data_initial()
+        self.init_matplotlib_canvas()
+
+    def build_gui(self):
+        self.control_frame = Frame(self.master)
+        self.control_frame.grid(row=0, column=0, sticky="nsew")
+
+        TkButton(
+            self.control_frame, 
+            text="Load New Image", 
+            command=self.load_new_image
+        ).grid(row=0, columnspan=2, pady=5)
+
+        Label(self.control_frame, text="FFT Plot: Select Circle Centers").grid(row=1, columnspan=2)
+        TkButton(
+            self.control_frame, 
+            text="Select Points", 
+            command=self.select_centers
+        ).grid(row=2, column=0, pady=5)
+        TkButton(
+            self.control_frame,
+            text="Auto Detect",
+            command=self.auto_detect_centers
+        ).grid(row=2, column=1, pady=5)
+
+        Label(self.control_frame, text="Center 1 X:").grid(row=3, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.center1_x).grid(row=3, column=1)
+        Label(self.control_frame, text="Center 1 Y:").grid(row=4, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.center1_y).grid(row=4, column=1)
+        Label(self.control_frame, text="Inner Radius 1:").grid(row=5, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.gaussian_width1).grid(row=5, column=1)
+        Label(self.control_frame, text="Outer Radius 1:").grid(row=6, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.circle_radius1).grid(row=6, column=1)
+
+        Label(self.control_frame, text="Center 2 X:").grid(row=7, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.center2_x).grid(row=7, column=1)
+        Label(self.control_frame, text="Center 2 Y:").grid(row=8, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.center2_y).grid(row=8, column=1)
+        Label(self.control_frame, text="Inner Radius 2:").grid(row=9, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.gaussian_width2).grid(row=9, column=1)
+        Label(self.control_frame, text="Outer Radius 2:").grid(row=10, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.circle_radius2).grid(row=10, column=1)
+
+        Label(self.control_frame, text="Ref Area Top-Left X:").grid(row=11, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.ref_x0).grid(row=11, column=1)
+        Label(self.control_frame, text="Ref Area Top-Left Y:").grid(row=12, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.ref_y0).grid(row=12, column=1)
+        Label(self.control_frame, text="Ref Area Bottom-Right X:").grid(row=13, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.ref_x1).grid(row=13, column=1)
+        Label(self.control_frame, text="Ref Area Bottom-Right Y:").grid(row=14, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.ref_y1).grid(row=14, column=1)
+
+        Label(self.control_frame, text="Sigma").grid(row=15, column=0, sticky="e")
+        self.sigma_scale = Scale(
+            self.control_frame, from_=0, to=50, resolution=0.1, orient=HORIZONTAL,
+            command=self.on_slider_changed
+        )
+        self.sigma_scale.set(float(self.sigma_smooth_var.get()))
+        self.sigma_scale.grid(row=15, column=1, sticky="ew")
+
+        Label(self.control_frame, text="Mask Threshold (%)").grid(row=16, column=0, sticky="e")
+        self.threshold_scale = Scale(
+            self.control_frame, from_=0, to=100, resolution=0.1, orient=HORIZONTAL,
+            command=self.on_slider_changed
+        )
+        self.threshold_scale.set(DEFAULT_THRESHOLD_PERCENTILE)
+        self.threshold_scale.grid(row=16, column=1, sticky="ew")
+
+        # Strain scale (in %)
+        Label(self.control_frame, text="Exx min (%):").grid(row=17, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.exx_min_var).grid(row=17, column=1)
+
+        Label(self.control_frame, text="Exx max (%):").grid(row=18, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.exx_max_var).grid(row=18, column=1)
+
+        Label(self.control_frame, text="Eyy min (%):").grid(row=19, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.eyy_min_var).grid(row=19, column=1)
+
+        Label(self.control_frame, text="Eyy max (%):").grid(row=20, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.eyy_max_var).grid(row=20, column=1)
+
+        Label(self.control_frame, text="Strain Engine:").grid(row=21, column=0, sticky="e")
+        OptionMenu(self.control_frame, self.engine_var, *STRAIN_ENGINES).grid(row=21, column=1, sticky="ew")
+
+        Label(self.control_frame, text="Precision:").grid(row=22, column=0, sticky="e")
+        OptionMenu(self.control_frame, self.precision_var, *PRECISIONS).grid(row=22, column=1, sticky="ew")
+
+        Checkbutton(
+            self.control_frame, text="Unwrap Material Only", variable=self.crop_to_material_var
+        ).grid(row=23, columnspan=2)
+
+        TkButton(self.control_frame, text="Apply", command=self.process_selection).grid(row=24, column=0, pady=10)
+        TkButton(self.control_frame, text="Cancel", command=self.cancel_processing).grid(row=24, column=1, pady=10)
+        TkButton(self.control_frame, text="Save", command=self.save_images).grid(row=25, column=0, pady=10)
+        TkButton(self.control_frame, text="Export Data", command=self.export_data).grid(row=25, column=1, pady=10)
+        TkButton(self.control_frame, text="Line Scan", command=self.line_scan_dialog).grid(row=26, column=0, pady=10)
+        TkButton(self.control_frame, text="Parameter Sweep", command=self.sweep_dialog).grid(row=26, column=1, pady=10)
+
+        Label(self.control_frame, textvariable=self.status_var).grid(row=27, columnspan=2)
+        Checkbutton(
+            self.control_frame, text="Live Preview", variable=self.live_preview_var
+        ).grid(row=28, column=0)
+        Checkbutton(
+            self.control_frame, text="Disk Cache", variable=self.disk_cache_var, command=self.toggle_disk_cache
+        ).grid(row=28, column=1)
+
+        Label(self.control_frame, text="Save DPI:").grid(row=29, column=0, sticky="e")
+        Entry(self.control_frame, textvariable=self.save_dpi_var).grid(row=29, column=1)
+
+        Label(self.control_frame, text="Save Format:").grid(row=30, column=0, sticky="e")
+        OptionMenu(self.control_frame, self.save_format_var, *SAVE_FORMATS).grid(row=30, column=1, sticky="ew")
+        Checkbutton(
+            self.control_frame, text="Axes and Colorbars", variable=self.save_axes_var
+        ).grid(row=31, columnspan=2)
+
+        for i in range(32):
+            self.control_frame.rowconfigure(i, weight=0)
+        self.control_frame.columnconfigure(0, weight=1)
+        self.control_frame.columnconfigure(1, weight=1)
+
+    def load_data_initial(self):
+        """Attempt to load data once the app starts."""
+        try:
+            self.data = DataProcessor.load_haadf_image(precision=self.precision_var.get())
+            self.pipeline.precision = self.precision_var.get()
+            self.pipeline.set_data(self.data)
+            threshold_val = self.threshold_scale.get()
+            self.smoothed_data, self.material_mask = self.pipeline.preprocess(
+                threshold_percent=threshold_val
+            )
+            self.fft_data, self.fft_magnitude = self.pipeline.fft()
+        except FileNotFoundError:
+            messagebox.showerror("File Selection Error", "No file selected. Exiting.")
+            self.master.destroy()
+            sys.exit(1)
+        except Exception as e:
+            messagebox.showerror("Initialization Error", str(e))
+            self.master.destroy()
+            sys.exit(1)
+
+    def load_new_image(self):
+        try:
+            data_new = DataProcessor.load_haadf_image(precision=self.precision_var.get())
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            messagebox.showerror("Loading Error", str(e))
+            return
+
+        # The worker shares the pipeline; stop it before swapping the image.
+        self.cancel_processing()
+        if self.worker is not None:
+            self.worker.join()
+        self.generation += 1
+
+        self.data = data_new
+        self.pipeline.precision = self.precision_var.get()
+        self.pipeline.set_data(self.data)
+        # Masks of the previous image's FFT size are unlikely to be reused.
+        StrainCalculator.clear_mask_cache()
+        threshold_val = self.threshold_scale.get()
+        self.smoothed_data, self.material_mask = self.pipeline.preprocess(
+            threshold_percent=threshold_val
+        )
+        self.fft_data, self.fft_magnitude = self.pipeline.fft()
+        self.last_results = None
+        self.last_job = None
+
+        self.clear_plots()
+        self.canvas.draw()
+        messagebox.showinfo("New Image Loaded",
+                            "Successfully loaded a new image.\nSet parameters and click 'Apply' to process.")
+
+    def select_centers(self):
+        if self.fft_magnitude is None:
+            return
+        self.selected_points.clear()
+
+        # pyplot is only needed by the pop-up windows; importing it on first
+        # use keeps it off the start-up path.
+        import matplotlib.pyplot as plt
+
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 5))
+        fig.suptitle("Double-click on left to pick dot1, on right to pick dot2")
+
+        im1 = ax1.imshow(np.log(self.fft_magnitude + 1), cmap='gray')
+        ax1.set_title("Left (dot1)")
+        plt.colorbar(im1, ax=ax1)
+
+        im2 = ax2.imshow(np.log(self.fft_magnitude + 1), cmap='gray')
+        ax2.set_title("Right (dot2)")
+        plt.colorbar(im2, ax=ax2)
+
+        def on_click(event):
+            if event.dblclick and event.inaxes in (ax1, ax2):
+                # Snap the click to the sub-pixel position of the nearby peak.
+                self.selected_points.append(
+                    PeakFinder.refine_peak(self.fft_magnitude, (event.ydata, event.xdata))
+                )
+
+                if len(self.selected_points) == 2:
+                    fig.canvas.mpl_disconnect(cid)
+                    plt.close(fig)
+                    self.set_centers(*self.selected_points)
+
+        cid = fig.canvas.mpl_connect('button_press_event', on_click)
+        plt.show()
+
+    def set_centers(self, c1, c2):
+        self.center1_y.set(f"{c1[0]:.2f}")
+        self.center1_x.set(f"{c1[1]:.2f}")
+        self.center2_y.set(f"{c2[0]:.2f}")
+        self.center2_x.set(f"{c2[1]:.2f}")
+
+    def auto_detect_centers(self):
+        if self.fft_magnitude is None:
+            return
+        try:
+            self.set_centers(*PeakFinder.detect_pair(self.fft_magnitude))
+        except ValueError as e:
+            messagebox.showerror("Auto Detect", str(e))
+
+    def process_selection(self):
+        try:
+            if self.data is None:
+                messagebox.showerror("No Data", "Please load an image first.")
+                return
+
+            c1 = (float(self.center1_y.get()), float(self.center1_x.get()))
+            g1 = float(self.gaussian_width1.get())
+            r1 = float(self.circle_radius1.get())
+
+            c2 = (float(self.center2_y.get()), float(self.center2_x.get()))
+            g2 = float(self.gaussian_width2.get())
+            r2 = float(self.circle_radius2.get())
+
+            x0 = int(self.ref_x0.get())
+            y0 = int(self.ref_y0.get())
+            x1 = int(self.ref_x1.get())
+            y1 = int(self.ref_y1.get())
+            reference_area = (
+                slice(min(y0, y1), max(y0, y1)),
+                slice(min(x0, x1), max(x0, x1))
+            )
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter valid numeric values.")
+            return
+
+        # Tk variables are read here on the main thread; the worker only gets plain values.
+        job = {
+            'reflections': (c1, g1, r1, c2, g2, r2),
+            'reference_area': reference_area,
+            'sigma_smooth': float(self.sigma_scale.get()),
+            'threshold_percent': self.threshold_scale.get(),
+            'engine': self.engine_var.get(),
+            'crop_to_material': self.crop_to_material_var.get(),
+            'precision': self.precision_var.get(),
+            'screen': self.panel_screen(),
+        }
+
+        if self.worker is not None and self.worker.is_alive():
+            # Supersede the running job; only the newest pending request is kept.
+            self.pending_job = job
+            self.cancel_event.set()
+            self.status_var.set("Cancelling previous run...")
+            return
+        self.start_job(job)
+
+    @staticmethod
+    def open_disk_cache():
+        """The shared on-disk stage cache, or ``None`` if it cannot be created."""
+        try:
+            return DiskCache()
+        except OSError:
+            return None
+
+    def toggle_disk_cache(self):
+        """Attach the on-disk stage cache to the pipeline while "Disk Cache" is ticked."""
+        cache = self.open_disk_cache() if self.disk_cache_var.get() else None
+        if self.disk_cache_var.get() and cache is None:
+            messagebox.showerror("Disk Cache", f"Cannot create the disk cache in {DEFAULT_CACHE_DIR}.")
+            self.disk_cache_var.set(False)
+        self.pipeline.disk_cache = cache
+        self.cache_counts = (0, 0)
+
+    def cache_summary(self):
+        """Disk cache hits and misses since the last ``start_job``."""
+        cache = self.pipeline.disk_cache
+        if cache is None:
+            return ""
+        hits, misses = cache.hits - self.cache_counts[0], cache.misses - self.cache_counts[1]
+        return f" (disk cache: {hits} hit(s), {misses} miss(es), {cache.stats()['bytes'] / 1024**2:.0f} MiB)"
+
+    def start_job(self, job):
+        self.generation += 1
+        cache = self.pipeline.disk_cache
+        if cache is not None:
+            self.cache_counts = (cache.hits, cache.misses)
+        self.cancel_event = threading.Event()
+        self.job_started = time.perf_counter()
+        self.status_var.set("Running...")
+        self.worker = threading.Thread(
+            target=self.run_job, args=(self.generation, job, self.cancel_event), daemon=True
+        )
+        self.worker.start()
+        self.master.after(POLL_INTERVAL_MS, self.poll_worker)
+
+    def run_job(self, generation, job, cancel_event):
+        """Worker thread: runs the pipeline and reports back through ``self.job_queue``."""
+        self.pipeline.cancel_event = cancel_event
+        self.pipeline.progress = lambda stage: self.job_queue.put(('progress', generation, stage))
+        try:
+            self.pipeline.precision = job['precision']
+            smoothed_data, material_mask = self.pipeline.preprocess(
+                threshold_percent=job['threshold_percent']
+            )
+            fft_data, fft_magnitude = self.pipeline.fft()
+            results = self.pipeline.run(
+                *job['reflections'],
+                job['reference_area'],
+                job['sigma_smooth'],
+                threshold_percent=job['threshold_percent'],
+                engine=job['engine'],
+                crop_to_material=job['crop_to_material']
+            )
+            # Screen-resolution copies are built here too, off the Tk thread.
+            pyramids = self.build_pyramids(results, self.data, fft_magnitude, job['screen'])
+            message = ('done', generation, (job, results, smoothed_data, material_mask, fft_data, fft_magnitude, pyramids))
+        except PipelineCancelled:
+            message = ('cancelled', generation, None)
+        except Exception as e:
+            message = ('error', generation, str(e))
+        # Detach the hooks before reporting, so a follow-up job can install its own.
+        self.pipeline.cancel_event = None
+        self.pipeline.progress = None
+        self.job_queue.put(message)
+
+    def poll_worker(self):
+        # Checked before draining: once the worker has exited, all its messages are queued.
+        running = self.worker is not None and self.worker.is_alive()
+        while True:
+            try:
+                kind, generation, payload = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+
+            if kind == 'progress':
+                self.status_var.set(f"Running: {payload}...")
+            elif kind == 'done':
+                job, results, self.smoothed_data, self.material_mask, self.fft_data, self.fft_magnitude, self.pyramids = payload
+                self.last_results = results
+                self.last_job = job
+                self.update_plots(results, *job['reflections'], job['reference_area'])
+                self.status_var.set(
+                    f"Done in {time.perf_counter() - self.job_started:.1f} s{self.cache_summary()}"
+                )
+            elif kind == 'cancelled':
+                self.status_var.set("Cancelled")
+            elif kind == 'error':
+                self.status_var.set("Failed")
+                messagebox.showerror("Processing Error", payload)
+
+        if running:
+            self.master.after(POLL_INTERVAL_MS, self.poll_worker)
+        elif self.pending_job is not None:
+            job, self.pending_job = self.pending_job, None
+            self.start_job(job)
+
+    def on_slider_changed(self, _value=None):
+        """Debounce slider moves into a quick preview and a later full-resolution pass."""
+        if not self.live_preview_var.get() or self.last_results is None:
+            return
+        for after_id in (self.preview_after_id, self.full_pass_after_id):
+            if after_id is not None:
+                self.master.after_cancel(after_id)
+        self.preview_after_id = self.master.after(PREVIEW_DELAY_MS, self.run_preview)
+        self.full_pass_after_id = self.master.after(FULL_PASS_DELAY_MS, self.run_full_pass)
+
+    def run_preview(self):
+        self.preview_after_id = None
+        # The pipeline is not locked: while a run is updating it on the worker
+        # thread its gradients and strain region may not match. The full pass
+        # queued with the preview redraws the maps once that run is done.
+        if self.worker is not None and self.worker.is_alive():
+            return
+        try:
+            maps, step = self.pipeline.preview_strain(
+                float(self.sigma_scale.get()), self.threshold_scale.get()
+            )
+        except (RuntimeError, ValueError):
+            return
+
+        for key, values in maps.items():
+            full = self.pyramids.get(key)
+            self.pyramids[key] = DisplayPyramid(
+                values, step=step, shape=None if full is None else full.shape
+            )
+            self.refresh_panel(key)
+        self.status_var.set("Preview")
+        self.canvas.draw_idle()
+
+    def run_full_pass(self):
+        self.full_pass_after_id = None
+        self.process_selection()
+
+    def cancel_processing(self):
+        self.pending_job = None
+        for after_id in (self.preview_after_id, self.full_pass_after_id):
+            if after_id is not None:
+                self.master.after_cancel(after_id)
+        self.preview_after_id = self.full_pass_after_id = None
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.status_var.set("Cancelling...")
+        if self.sweep_thread is not None and self.sweep_thread.is_alive():
+            self.sweep_cancel.set()
+            self.status_var.set("Cancelling...")
+
+    def init_matplotlib_canvas(self):
+        self.canvas_frame = Frame(self.master)
+        self.canvas_frame.grid(row=0, column=1, sticky="nsew", padx=0.1, pady=0.1)
+
+        self.master.rowconfigure(0, weight=1)
+        self.master.columnconfigure(1, weight=1)
+
+        self.canvas_frame.rowconfigure(0, weight=1)
+        self.canvas_frame.columnconfigure(0, weight=1)
+
+        self.fig = Figure(figsize=(15, 12), dpi=100)
+        self.axs = self.fig.subplots(3, 4)
+        self.fig.subplots_adjust(wspace=0.3, hspace=0.3)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
+        self.canvas_widget = self.canvas.get_tk_widget()
+        self.canvas_widget.grid(row=0, column=0, sticky="nsew")
+
+        self.toolbar_frame = Frame(self.master)
+        self.toolbar_frame.grid(row=1, column=1, sticky="ew")
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.toolbar_frame)
+        self.toolbar.update()
+
+        self.build_plot_artists()
+
+    def build_plot_artists(self):
+        """Create the panel images, colorbars and overlays once; updates only change their data."""
+        for ax, (key, title, cmap) in zip(self.axs.flatten(), PANELS):
+            image = ax.imshow(np.full((1, 1), np.nan), cmap=cmap)
+            image.set_visible(False)
+            ax.set_title(title)
+            ax.set_autoscale_on(False)
+            self.colorbars.append(self.fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04))
+            ax.callbacks.connect('xlim_changed', lambda ax, key=key: self.refresh_panel(key))
+            ax.callbacks.connect('ylim_changed', lambda ax, key=key: self.refresh_panel(key))
+            self.images[key] = image
+
+        self.ref_rect = Rectangle((0, 0), 0, 0, linewidth=2, edgecolor='yellow', facecolor='none')
+        self.axs[0, 0].add_patch(self.ref_rect)
+        self.mask_circles = [
+            Circle((0, 0), 1, color=color, fill=False, linewidth=1)
+            for color in ('red', 'magenta', 'blue', 'green')
+        ]
+        for circle in self.mask_circles:
+            self.axs[0, 1].add_patch(circle)
+        self.clear_plots()
+
+    def clear_plots(self):
+        for artist in [*self.images.values(), self.ref_rect, *self.mask_circles]:
+            artist.set_visible(False)
+        self.pyramids = {}
+        self.panel_views = {}
+        self.panel_shapes = {}
+
+    def panel_screen(self, ax=None):
+        """(height, width) of a panel in screen pixels."""
+        bbox = (self.axs[0, 0] if ax is None else ax).get_window_extent()
+        return bbox.height, bbox.width
+
+    def build_pyramids(self, results, data, fft_magnitude, screen):
+        """Display pyramids of every panel, reusing those whose source map is unchanged."""
+        sources = {'data': data, 'fft': fft_magnitude}
+        sources.update((key, results[key]) for key, _, _ in PANELS if key in results)
+
+        pyramids = {}
+        for key, source in sources.items():
+            pyramid = self.pyramids.get(key)
+            if pyramid is None or pyramid.source is not source:
+                if key == 'fft':
+                    image = np.log(source + 1)
+                elif np.iscomplexobj(source):
+                    image = np.abs(source)
+                else:
+                    image = source
+                pyramid = DisplayPyramid(image, source)
+            pyramid.view(screen=screen)
+            pyramid.limits()
+            pyramids[key] = pyramid
+        return pyramids
+
+    def refresh_panel(self, key):
+        """Show the pyramid level and crop that match the panel's current zoom."""
+        pyramid = self.pyramids.get(key)
+        if pyramid is None:
+            return
+        image = self.images[key]
+        ax = image.axes
+        array, extent, factor = pyramid.view(ax.get_xlim(), ax.get_ylim(), self.panel_screen(ax))
+        view = (id(pyramid), extent, factor)
+        if self.panel_views.get(key) != view:
+            self.panel_views[key] = view
+            image.set_data(array)
+            image.set_extent(extent)
+
+    def update_plots(self, results, c1, g1, r1, c2, g2, r2, reference_area):
+        exx_min = float(self.exx_min_var.get())
+        exx_max = float(self.exx_max_var.get())
+        eyy_min = float(self.eyy_min_var.get())
+        eyy_max = float(self.eyy_max_var.get())
+
+        exy_min, exy_max = -5, 5  
+        rot_min, rot_max = -5, 5
+        limits = {
+            'strain_xx': (exx_min, exx_max),
+            'strain_yy': (eyy_min, eyy_max),
+            'strain_xy': (exy_min, exy_max),
+            'rotation_xy': (rot_min, rot_max),
+        }
+
+        screen = self.panel_screen()
+        self.pyramids = self.build_pyramids(results, self.data, self.fft_magnitude, screen)
+
+        for ax, (key, _, _) in zip(self.axs.flatten(), PANELS):
+            pyramid = self.pyramids[key]
+            image = self.images[key]
+            if self.panel_shapes.get(key) != pyramid.shape:
+                self.panel_shapes[key] = pyramid.shape
+                ny, nx = pyramid.shape
+                ax.set_xlim(-0.5, nx - 0.5)
+                ax.set_ylim(ny - 0.5, -0.5)
+            self.refresh_panel(key)
+
+            if key in limits:
+                image.set_clim(*limits[key])
+            else:
+                image.set_clim(*pyramid.limits())
+            image.set_visible(True)
+
+        self.ref_rect.set_xy((reference_area[1].start, reference_area[0].start))
+        self.ref_rect.set_width(reference_area[1].stop - reference_area[1].start)
+        self.ref_rect.set_height(reference_area[0].stop - reference_area[0].start)
+        self.ref_rect.set_visible(True)
+
+        for circle, center, radius in zip(self.mask_circles, (c1, c1, c2, c2), (g1, r1, g2, r2)):
+            circle.set_center((center[1], center[0]))
+            circle.set_radius(radius)
+            circle.set_visible(True)
+
+        self.canvas.draw_idle()
+
+    def save_panels(self):
+        """The 12 saved figures as ``FigureRenderer`` panel specs."""
+        exx_min = float(self.exx_min_var.get())
+        exx_max = float(self.exx_max_var.get())
+        eyy_min = float(self.eyy_min_var.get())
+        eyy_max = float(self.eyy_max_var.get())
+        exy_min, exy_max = -5, 5
+        rot_min, rot_max = -5, 5
+
+        r = self.last_results
+        return [
+            {'data': self.data, 'cmap': 'gray', 'filename': "01_Original_HAADF.tif",
+             'title': "Original HAADF"},
+            {'data': self.fft_magnitude, 'cmap': 'gray', 'filename': "02_FFT_Magnitude.tif",
+             'title': "FFT Magnitude", 'log': True},
+            {'data': r['raw_phase_image1'], 'cmap': 'gray', 'filename': "03_Raw_Phase_Image_1.tif",
+             'title': "Raw Phase Image 1"},
+            {'data': r['raw_phase_image2'], 'cmap': 'gray', 'filename': "04_Raw_Phase_Image_2.tif",
+             'title': "Raw Phase Image 2"},
+            {'data': r['phase_image1'], 'cmap': COLORMAP, 'filename': "05_Phase_Image_1.tif",
+             'title': "Phase Image 1"},
+            {'data': r['phase_image2'], 'cmap': COLORMAP, 'filename': "06_Phase_Image_2.tif",
+             'title': "Phase Image 2"},
+            {'data': r['strain_xx'], 'cmap': COLORMAP, 'filename': "07_Strain_xx_percent.tif",
+             'title': "Strain XX (%)", 'vmin': exx_min, 'vmax': exx_max},
+            {'data': r['strain_yy'], 'cmap': COLORMAP, 'filename': "08_Strain_yy_percent.tif",
+             'title': "Strain YY (%)", 'vmin': eyy_min, 'vmax': eyy_max},
+            {'data': r['strain_xy'], 'cmap': COLORMAP, 'filename': "09_Strain_xy_percent.tif",
+             'title': "Strain XY (%)", 'vmin': exy_min, 'vmax': exy_max},
+            {'data': r['rotation_xy'], 'cmap': COLORMAP, 'filename': "10_Rotation_xy.tif",
+             'title': "Rotation XY", 'vmin': rot_min, 'vmax': rot_max},
+            {'data': np.abs(r['complex_image1']), 'cmap': 'gray', 'filename': "11_Complex_Image_1_Mag.tif",
+             'title': "Complex Image 1 Mag"},
+            {'data': np.abs(r['complex_image2']), 'cmap': 'gray', 'filename': "12_Complex_Image_2_Mag.tif",
+             'title': "Complex Image 2 Mag"},
+        ]
+
+    def save_images(self):
+        """Main save function triggered by the Save button."""
+        if self.last_results is None:
+            messagebox.showerror("No Results", "Please click 'Apply' first to generate results.")
+            return
+        if self.save_thread is not None and self.save_thread.is_alive():
+            messagebox.showinfo("Saving", "The previous save is still running.")
+            return
+
+        try:
+            dpi = int(self.save_dpi_var.get())
+            panels = self.save_panels()
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter valid numeric values.")
+            return
+
+        self.out_dir = filedialog.askdirectory(title="Select folder to save images")
+        if not self.out_dir:
+            return
+
+        # Rendering runs in worker processes; this thread only waits for them.
+        fmt = self.save_format_var.get()
+        axes = self.save_axes_var.get()
+        outcome = {}
+
+        def render():
+            try:
+                FigureRenderer.render(panels, self.out_dir, dpi=dpi, fmt=fmt, axes=axes)
+            except Exception as e:
+                outcome['error'] = str(e)
+
+        self.save_started = time.perf_counter()
+        self.save_outcome = outcome
+        self.save_thread = threading.Thread(target=render, daemon=True)
+        self.save_thread.start()
+        self.status_var.set("Saving images...")
+        self.master.after(POLL_INTERVAL_MS, self.poll_save)
+
+    def poll_save(self):
+        if self.save_thread.is_alive():
+            self.master.after(POLL_INTERVAL_MS, self.poll_save)
+            return
+        if 'error' in self.save_outcome:
+            self.status_var.set("Save failed")
+            messagebox.showerror("Save Error", self.save_outcome['error'])
+            return
+        self.status_var.set(f"Saved in {time.perf_counter() - self.save_started:.1f} s")
+        messagebox.showinfo("Save Complete", f"Images saved in:\n{self.out_dir}")
+
+    def job_recipe(self, job):
+        """The job's parameters as a ``BatchProcessor`` recipe."""
+        c1, g1, r1, c2, g2, r2 = job['reflections']
+        rows, cols = job['reference_area']
+        return {
+            'center1': list(c1), 'inner_radius1': g1, 'outer_radius1': r1,
+            'center2': list(c2), 'inner_radius2': g2, 'outer_radius2': r2,
+            'reference_area': [cols.start, rows.start, cols.stop, rows.stop],
+            'sigma': job['sigma_smooth'],
+            'threshold': job['threshold_percent'],
+            'engine': job['engine'],
+            'crop_to_material': job['crop_to_material'],
+            'precision': job['precision'],
+            'fft_shape': list(self.fft_data.shape),
+        }
+
+    def export_data(self):
+        """Write the numeric results and their recipe to HDF5 or Zarr."""
+        if self.last_results is None:
+            messagebox.showerror("No Results", "Please click 'Apply' first to generate results.")
+            return
+
+        out_path = filedialog.asksaveasfilename(
+            title="Export results",
+            defaultextension=".h5",
+            filetypes=[("HDF5", "*.h5"), ("Zarr", "*.zarr")]
+        )
+        if not out_path:
+            return
+
+        maps = dict(self.last_results)
+        maps['data'] = self.data
+        try:
+            ResultsExporter.export(
+                out_path, maps, {'recipe': self.job_recipe(self.last_job)}, nan_aware=True
+            )
+        except (RuntimeError, ValueError, OSError) as e:
+            messagebox.showerror("Export Error", str(e))
+            return
+        messagebox.showinfo("Export Complete", f"Results exported to:\n{out_path}")
+
+    def line_scan_dialog(self):
+        """Dialog to pick which strain map to line-scan."""
+        if self.last_results is None:
+            messagebox.showerror("No Results", "Please click 'Apply' first to generate strain maps.")
+            return
+
+        strain_map_choices = ["strain_xx", "strain_yy", "strain_xy", "rotation_xy"]
+        choice = simpledialog.askstring(
+            "Line Scan Choice",
+            f"Which map do you want to line-scan?\nOptions: {', '.join(strain_map_choices)}",
+            initialvalue="strain_xx"
+        )
+        if not choice:
+            return
+        if choice not in strain_map_choices:
+            messagebox.showerror("Invalid Choice", "Please choose a valid map name.")
+            return
+
+        thickness = simpledialog.askinteger(
+            "Line Thickness",
+            "Enter line-scan thickness (integer pixels):",
+            minvalue=1,
+            maxvalue=100,
+            initialvalue=1
+        )
+        if thickness is None:
+            return
+
+        self.line_scan(map_name=choice, thickness=thickness)
+
+    def line_scan(self, map_name="strain_xx", thickness=1):
+        """Perform a line scan on the chosen strain map."""
+        import matplotlib.pyplot as plt
+        from skimage.measure import profile_line
+
+        data = self.last_results.get(map_name, None)
+        if data is None:
+            messagebox.showerror("Data Error", f"No data found for '{map_name}'.")
+            return
+
+        exx_min = float(self.exx_min_var.get())
+        exx_max = float(self.exx_max_var.get())
+        eyy_min = float(self.eyy_min_var.get())
+        eyy_max = float(self.eyy_max_var.get())
+        exy_min, exy_max = -5, 5
+        rot_min, rot_max = -5, 5
+
+        if map_name == 'strain_xx':
+            this_vmin, this_vmax = exx_min, exx_max
+        elif map_name == 'strain_yy':
+            this_vmin, this_vmax = eyy_min, eyy_max
+        elif map_name == 'strain_xy':
+            this_vmin, this_vmax = exy_min, exy_max
+        else:
+            this_vmin, this_vmax = rot_min, rot_max
+
+        fig, ax = plt.subplots()
+        ax.set_title(f"Click two points to define line on {map_name}")
+
+        im = ax.imshow(data, cmap=COLORMAP, vmin=this_vmin, vmax=this_vmax)
+        plt.colorbar(im, ax=ax)
+
+        points = []
+
+        def on_click(event):
+            if event.inaxes == ax and event.button == 1:
+                points.append((int(event.ydata), int(event.xdata)))
+                if len(points) == 2:
+                    fig.canvas.mpl_disconnect(cid)
+                    p0, p1 = points
+                    profile = profile_line(
+                        data,
+                        p0,
+                        p1,
+                        linewidth=thickness,
+                        order=1,
+                        reduce_func=np.mean
+                    )
+                    fig2, ax2 = plt.subplots()
+                    ax2.plot(profile, 'o-', lw=1.5)
+                    ax2.set_title(f"Line Scan of {map_name} (thickness={thickness})")
+                    ax2.set_xlabel("Distance (pixels along line)")
+                    if map_name.startswith('strain_'):
+                        ax2.set_ylabel(f"{map_name} (%)")
+                    else:
+                        ax2.set_ylabel(map_name)
+                    ax2.set_ylim([this_vmin, this_vmax])
+
+                    fig2.tight_layout()
+                    plt.show()
+
+        cid = fig.canvas.mpl_connect('button_press_event', on_click)
+        plt.show()
+
+    def sweep_dialog(self):
+        """Ask for mask radii and sigmas and sweep them with the last run's settings."""
+        if self.last_results is None:
+            messagebox.showerror("No Results", "Please click 'Apply' first to set the reflections and reference area.")
+            return
+        if self.sweep_thread is not None and self.sweep_thread.is_alive():
+            messagebox.showinfo("Parameter Sweep", "The previous sweep is still running.")
+            return
+
+        job = self.last_job
+        c1, g1, r1, c2, _, _ = job['reflections']
+        fields = (
+            ("Inner radii (pixels, comma-separated):", ", ".join(f"{g1 * f:g}" for f in (0.5, 1, 1.5))),
+            ("Outer radii (pixels, comma-separated):", ", ".join(f"{r1 * f:g}" for f in (0.75, 1, 1.25))),
+            ("Sigmas (pixels, comma-separated):", "0, 2, 4, 8"),
+        )
+        values = []
+        for prompt, initial in fields:
+            text = simpledialog.askstring("Parameter Sweep", prompt, initialvalue=initial)
+            if not text:
+                return
+            try:
+                values.append([float(v) for v in text.replace(',', ' ').split()])
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Please enter valid numeric values.")
+                return
+        r_inners, r_outers, sigmas = values
+
+        # The sweep reuses the FFT and material mask of the last run.
+        fft_data, material_mask = self.fft_data, self.material_mask
+        cancel_event = threading.Event()
+        outcome = {'done': (0, 0)}
+
+        def sweep():
+            try:
+                outcome['rows'] = ParameterSweep.run(
+                    fft_data, material_mask, c1, c2, r_inners, r_outers, sigmas, job['reference_area'],
+                    engine=job['engine'], precision=job['precision'], crop_to_material=job['crop_to_material'],
+                    progress=lambda done, total: outcome.update(done=(done, total)),
+                    cancel_event=cancel_event
+                )
+            except PipelineCancelled:
+                outcome['cancelled'] = True
+            except Exception as e:
+                outcome['error'] = str(e)
+
+        self.sweep_started = time.perf_counter()
+        self.sweep_outcome = outcome
+        self.sweep_cancel = cancel_event
+        self.sweep_thread = threading.Thread(target=sweep, daemon=True)
+        self.sweep_thread.start()
+        self.status_var.set("Sweeping...")
+        self.master.after(POLL_INTERVAL_MS, self.poll_sweep)
+
+    def poll_sweep(self):
+        outcome = self.sweep_outcome
+        if self.sweep_thread.is_alive():
+            done, total = outcome['done']
+            if total:
+                self.status_var.set(f"Sweeping: {done}/{total} settings...")
+            self.master.after(POLL_INTERVAL_MS, self.poll_sweep)
+            return
+        if 'cancelled' in outcome:
+            self.status_var.set("Sweep cancelled")
+            return
+        if 'error' in outcome:
+            self.status_var.set("Sweep failed")
+            messagebox.showerror("Sweep Error", outcome['error'])
+            return
+        self.status_var.set(f"Sweep done in {time.perf_counter() - self.sweep_started:.1f} s")
+        self.show_sweep(outcome['rows'])
+
+    def show_sweep(self, rows, key=SWEEP_OUTPUTS[0]):
+        """Thumbnails of ``key`` for every setting (radius pairs by row, sigmas by column) and the summary table."""
+        pairs = sorted({(row['r_inner'], row['r_outer']) for row in rows})
+        sigmas = sorted({row['sigma'] for row in rows})
+        table = ParameterSweep.table(rows, key)
+
+        window = Toplevel(self.master)
+        window.title(f"Parameter Sweep: {key} noise in the reference area")
+        fig = Figure(figsize=(2 * len(sigmas), 2 * len(pairs) + 0.5))
+        axes = fig.subplots(len(pairs), len(sigmas), squeeze=False)
+        for row in rows:
+            ax = axes[pairs.index((row['r_inner'], row['r_outer'])), sigmas.index(row['sigma'])]
+            ax.imshow(
+                row['thumbnails'][key], cmap=COLORMAP,
+                vmin=float(self.exx_min_var.get()), vmax=float(self.exx_max_var.get())
+            )
+            ax.set_title(
+                f"r {row['r_inner']:g}-{row['r_outer']:g}, \u03c3 {row['sigma']:g}\n"
+                f"noise {row['noise'][key]:.3g}", fontsize=8
+            )
+            ax.set_xticks([])
+            ax.set_yticks([])
+        fig.tight_layout()
+        canvas = FigureCanvasTkAgg(fig, master=window)
+        canvas.draw()
+        canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
+        Label(window, text=table, font=("Courier", 9), justify="left").grid(row=0, column=1, sticky="n", padx=10)
@@ -0,0 +1,265 @@
+import numpy as np
+
+from data_processor import DataProcessor
+from disk_cache import DiskCache
+from material_masker import MaterialMasker
+from strain_calculator import StrainCalculator
+
+PREVIEW_SIZE = 512
+
+class PipelineCancelled(RuntimeError):
+    """Raised between stages when ``GPAPipeline.cancel_event`` is set."""
+
+class GPAPipeline:
+    """Cached GPA stages that only rerun when their own inputs change."""
+
+
+    def __init__(self, data=None, precision='double', disk_cache=None):
+        self.precision = precision
+        self.disk_cache = disk_cache
+        self._cache = {}
+        self._versions = {}
+        self._recipes = {}
+        self._fingerprints = {}
+        self._counter = 0
+        self.last_recomputed = []
+        self.progress = None
+        self.cancel_event = None
+        self.grid_spacing = (1.0, 1.0)
+        self.grid_shape = None
+        self.strain_region = None
+        self.engine = None
+        if data is not None:
+            self.set_data(data)
+
+    def set_data(self, data):
+        """Start over with a new image; every cached stage is dropped."""
+        self._cache.clear()
+        self._versions.clear()
+        self._recipes.clear()
+        self._fingerprints.clear()
+        self._store('data', None, data)
+
+    @property
+    def data(self):
+        entry = self._cache.get('data')
+        return None if entry is None else entry[1]
+
+    def _store(self, name, key, value):
+        self._counter += 1
+        self._cache[name] = (key, value)
+        self._versions[name] = self._counter
+        self.last_recomputed.append(name)
+        return value
+
+    def _fingerprint(self, name):
+        """Content hash of a stored stage: the image bytes plus all parameters up to it."""
+        version = self._versions[name]
+        cached = self._fingerprints.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if name == 'data':
+            fingerprint = DiskCache.array_hash(self.data)
+        else:
+            inputs, params = self._recipes[name]
+            fingerprint = DiskCache.key(name, tuple(self._fingerprint(i) for i in inputs), params)
+        self._fingerprints[name] = (version, fingerprint)
+        return fingerprint
+
+    def _stage(self, name, inputs, params, compute, persist=False):
+        key = (tuple(self._versions[i] for i in inputs), params)
+        entry = self._cache.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise PipelineCancelled(f"Cancelled before stage '{name}'.")
+        if self.progress is not None:
+            self.progress(name)
+
+        self._recipes[name] = (inputs, params)
+        if not persist or self.disk_cache is None:
+            return self._store(name, key, compute())
+
+        disk_key = DiskCache.key(name, tuple(self._fingerprint(i) for i in inputs), params)
+        value = self.disk_cache.get(disk_key)
+        if value is None:
+            value = compute()
+            self.disk_cache.put(disk_key, value)
+        return self._store(name, key, value)
+
+    def smoothed(self):
+        if 'data' not in self._cache:
+            raise RuntimeError("No image loaded in the pipeline.")
+        dtype = DataProcessor.real_dtype(self.precision)
+        return self._stage(
+            'smoothed', ('data',), (self.precision,),
+            lambda: DataProcessor.smooth_data(self.data.astype(dtype, copy=False))
+        )
+
+    def masker(self, mask_sigma=0):
+        """``MaterialMasker`` of the smoothed image; its sorted index is built once."""
+        smoothed_data = self.smoothed()
+        return self._stage(
+            'masker', ('smoothed',), (float(mask_sigma),),
+            lambda: MaterialMasker(smoothed_data, mask_sigma)
+        )
+
+    def material_mask(self, threshold_percent=0, cleanup=0, mask_sigma=0):
+        masker = self.masker(mask_sigma)
+        return self._stage(
+            'material_mask', ('masker',), (float(threshold_percent), int(cleanup)),
+            lambda: masker.mask(threshold_percent, cleanup)
+        )
+
+    def preprocess(self, threshold_percent=0, cleanup=0, mask_sigma=0):
+        """Same outputs as ``DataProcessor.preprocess_data``, cached."""
+        return self.smoothed(), self.material_mask(threshold_percent, cleanup, mask_sigma)
+
+    def fft(self):
+        """Same outputs as ``DataProcessor.compute_fft_and_contrast``, cached."""
+        smoothed_data = self.smoothed()
+        return self._stage(
+            'fft', ('smoothed',), (),
+            lambda: DataProcessor.compute_fft_and_contrast(smoothed_data),
+            persist=True
+        )
+
+    def run(self, c1, g1, r1, c2, g2, r2, reference_area, sigma_smooth,
+            threshold_percent=0, demodulation='full', upsample=False, engine='unwrap',
+            mask_cleanup=0, mask_sigma=0, crop_to_material=False):
+        """Cached equivalent of ``StrainCalculator.calculate_displacements_and_strain``."""
+        StrainCalculator.check_modes(demodulation, engine)
+        self.last_recomputed = []
+
+        material_mask = self.material_mask(threshold_percent, mask_cleanup, mask_sigma)
+        fft_data, _ = self.fft()
+        shape = fft_data.shape
+        window_shape = StrainCalculator.crop_window_shape(shape, (r1, r2))
+        if demodulation == 'full':
+            window_shape = None
+
+        unwrap_mask = None
+        phase_inputs = ()
+        if crop_to_material:
+            unwrap_mask = StrainCalculator.unwrap_mask(material_mask, demodulation, window_shape, shape)
+            phase_inputs = ('material_mask',)
+
+        g_vecs = []
+        for index, (center, r_inner, r_outer) in enumerate(((c1, g1, r1), (c2, g2, r2)), start=1):
+            center = (float(center[0]), float(center[1]))
+            g_vecs.append(StrainCalculator.g_vector(center, shape))
+
+            reflection = f'reflection{index}'
+            self._stage(
+                reflection, ('fft',),
+                (center, float(r_inner), float(r_outer), demodulation, window_shape),
+                lambda center=center, r_inner=r_inner, r_outer=r_outer: StrainCalculator.demodulate(
+                    fft_data, center, r_inner, r_outer, demodulation, window_shape
+                ),
+                persist=True
+            )
+            self._stage(
+                f'phase{index}', (reflection,) + phase_inputs, (upsample, engine, crop_to_material),
+                lambda reflection=reflection, g_vec=g_vecs[-1]: StrainCalculator.phase_images(
+                    self._cache[reflection][1], g_vec, material_mask.shape,
+                    demodulation, upsample, engine, shape, unwrap_mask
+                ),
+                persist=True
+            )
+
+        complex_img1, raw_phase_1, phase_image1, carrier1 = self._cache['phase1'][1]
+        complex_img2, raw_phase_2, phase_image2, carrier2 = self._cache['phase2'][1]
+        g1_vec, g2_vec = g_vecs
+
+        mask_on_grid, area_on_grid, spacing, region = StrainCalculator.strain_grid(
+            material_mask, reference_area, demodulation, upsample, window_shape, shape, crop_to_material
+        )
+        self.grid_spacing = spacing
+        self.engine = engine
+        self.grid_shape = mask_on_grid.shape
+        self.strain_region = region
+        region_key = None if region is None else tuple((sl.start, sl.stop) for sl in region)
+        area = tuple((sl.start, sl.stop) for sl in reference_area)
+
+        ux, uy = self._stage(
+            'displacement', ('phase1', 'phase2'), area,
+            lambda: StrainCalculator.displacements_from_phases(
+                phase_image1, phase_image2, g1_vec, g2_vec, area_on_grid
+            )
+        )
+
+        gradients = self._stage(
+            'gradients', ('displacement',), (region_key,),
+            lambda: StrainCalculator.displacement_gradients(
+                ux, uy, complex_img1, complex_img2, carrier1, carrier2,
+                g1_vec, g2_vec, spacing, engine, region
+            )
+        )
+
+        exx_smooth, eyy_smooth, exy_smooth, rotation_smooth = self._stage(
+            'strain', ('gradients', 'material_mask'), (float(sigma_smooth),),
+            lambda: StrainCalculator.strain_maps(
+                gradients, mask_on_grid, sigma_smooth, spacing, engine, region
+            )
+        )
+
+        return {
+            'complex_image1': complex_img1,
+            'complex_image2': complex_img2,
+            'raw_phase_image1': raw_phase_1,
+            'raw_phase_image2': raw_phase_2,
+            'phase_image1': phase_image1,
+            'phase_image2': phase_image2,
+            'u1': ux,
+            'u2': uy,
+            'strain_xx': exx_smooth,
+            'strain_yy': eyy_smooth,
+            'strain_xy': exy_smooth,
+            'rotation_xy': rotation_smooth
+        }
+
+    def preview_strain(self, sigma_smooth, threshold_percent=0, max_size=PREVIEW_SIZE, mask_sigma=0):
+        """Quick strain maps from the cached displacement gradients."""
+        if 'gradients' not in self._cache:
+            raise RuntimeError("Run the pipeline before previewing.")
+
+        gradients = self._cache['gradients'][1]
+        masker = self.masker(mask_sigma)
+        spectral = self.engine == 'spectral'
+        ny, nx = self.grid_shape
+        step = max(1, int(np.ceil(max(ny, nx) / max_size)))
+        h, w = -(-ny // step), -(-nx // step)
+
+        # With crop_to_material the gradients only cover the material box; its
+        # every step-th pixel lands at the nearest pixel of the (h, w) preview.
+        region = self.strain_region
+        if region is None:
+            region = (slice(0, ny), slice(0, nx))
+        origin = (region[0].start, region[1].start)
+        size = tuple(-(-(sl.stop - sl.start) // step) for sl in region)
+        place = []
+        for o, n, m in zip(origin, size, (h, w)):
+            start = min(int(round(o / step)), m - n)
+            place.append(slice(start, start + n))
+        place = tuple(place)
+
+        spacing = (self.grid_spacing[0] * step, self.grid_spacing[1] * step)
+        rows = np.round(origin[0] * self.grid_spacing[0] + np.arange(size[0]) * spacing[0]).astype(int)
+        cols = np.round(origin[1] * self.grid_spacing[1] + np.arange(size[1]) * spacing[1]).astype(int)
+        rows = np.minimum(rows, masker.shape[0] - 1)
+        cols = np.minimum(cols, masker.shape[1] - 1)
+        material_mask = masker.image[np.ix_(rows, cols)] > masker.cutoff(threshold_percent)
+
+        if spectral:
+            exx, eyy, exy, rotation = StrainCalculator.strain_from_spectrum(
+                gradients, material_mask, sigma_smooth, self.grid_spacing, step
+            )
+        else:
+            decimated = [g[::step, ::step] for g in gradients]
+            exx, eyy, exy, rotation = StrainCalculator.strain_from_gradients(
+                *decimated, material_mask, sigma_smooth, spacing
+            )
+        maps = {'strain_xx': exx, 'strain_yy': eyy, 'strain_xy': exy, 'rotation_xy': rotation}
+        if self.strain_region is not None:
+            maps = {name: StrainCalculator.uncrop(values, place, (h, w)) for name, values in maps.items()}
+        return maps, step
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+import numpy as np
+
+PACKED_MASK_CACHE_SIZE = 16
+
+class MaterialMasker:
+    """Material masks of one image for any threshold percentile."""
+
+    def __init__(self, image, sigma=0):
+        from scipy.ndimage import gaussian_filter
+
+        self.image = gaussian_filter(image, sigma=sigma) if sigma > 0 else image
+        self.shape = self.image.shape
+        self._sorted = None
+        self._packed = OrderedDict()
+
+    @property
+    def sorted_values(self):
+        if self._sorted is None:
+            self._sorted = np.sort(self.image, axis=None)
+        return self._sorted
+
+    def cutoff(self, threshold_percent):
+        """Value of the ``threshold_percent`` percentile of the image."""
+        values = self.sorted_values
+        position = (threshold_percent / 100) * (values.size - 1)
+        below = min(int(np.floor(position)), values.size - 1)
+        above = min(below + 1, values.size - 1)
+        t = position - below
+        a, b = values[below], values[above]
+        # Same rounding as numpy's percentile interpolation.
+        return a + (b - a) * t if t < 0.5 else b - (b - a) * (1 - t)
+
+    @staticmethod
+    def clean(mask, radius):
+        """Remove specks and fill pinholes smaller than ``radius`` pixels."""
+        if radius <= 0:
+            return mask
+        from scipy.ndimage import binary_opening, binary_closing
+
+        # The mask is continued past the image edges first, so neither
+        # operation strips a band of material along the border.
+        pad = 2 * radius
+        mask = np.pad(mask, pad, mode='edge')
+        mask = binary_opening(mask, iterations=radius)
+        mask = binary_closing(mask, iterations=radius)
+        return mask[pad:-pad, pad:-pad]
+
+    def packed_mask(self, threshold_percent=0, cleanup=0):
+        """Bit-packed mask (``np.packbits`` of the flattened boolean mask)."""
+        key = (float(threshold_percent), int(cleanup))
+        if key in self._packed:
+            self._packed.move_to_end(key)
+            return self._packed[key]
+
+        mask = MaterialMasker.clean(self.image > self.cutoff(threshold_percent), cleanup)
+        packed = np.packbits(mask, axis=None)
+        self._packed[key] = packed
+        if len(self._packed) > PACKED_MASK_CACHE_SIZE:
+            self._packed.popitem(last=False)
+        return packed
+
+    def mask(self, threshold_percent=0, cleanup=0):
+        """Boolean material mask: pixels above the threshold percentile."""
+        packed = self.packed_mask(threshold_percent, cleanup)
+        return np.unpackbits(packed, count=self.image.size).view(bool).reshape(self.shape)
@@ -0,0 +1,218 @@
+import os
+import shutil
+import itertools
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from display_pyramid import DisplayPyramid
+from fft_backend import FFTBackend
+from gpa_pipeline import PipelineCancelled
+from strain_calculator import StrainCalculator, COMPLEX_PRECISIONS
+from worker_pool import WorkerPool
+
+SWEEP_OUTPUTS = ('strain_xx', 'strain_yy', 'strain_xy', 'rotation_xy')
+THUMBNAIL_SIZE = 128
+# Bound on one batch of demodulated complex images; at most two batches
+# are held in shared memory while the workers consume them.
+SWEEP_BATCH_BYTES = 512 * 1024**2
+
+class ParameterSweep:
+    """GPA over a grid of mask radii and smoothing widths for one image."""
+
+
+    @staticmethod
+    def settings(r_inners, r_outers, sigmas):
+        """``(r_inner, r_outer, sigma)`` grid, skipping pairs with ``r_inner >= r_outer``."""
+        grid = [
+            (float(r_inner), float(r_outer), float(sigma))
+            for r_inner, r_outer, sigma in itertools.product(r_inners, r_outers, sigmas)
+            if r_inner < r_outer
+        ]
+        if not grid:
+            raise ValueError("The sweep needs at least one inner radius smaller than an outer radius.")
+        return grid
+
+    @staticmethod
+    def thumbnail(values, size=THUMBNAIL_SIZE):
+        """Block mean of ``values`` at most ``size`` pixels wide, ignoring NaNs."""
+        factor = max(1, int(np.ceil(max(values.shape) / size)))
+        return DisplayPyramid.block_mean(values, factor).astype(np.float32, copy=False)
+
+    @staticmethod
+    def summarize(maps, reference_area, thumbnail_size=THUMBNAIL_SIZE):
+        """``noise``/``mean`` per map inside ``reference_area``, ``nan_fraction`` and ``thumbnails``."""
+        summary = {'noise': {}, 'mean': {}, 'thumbnails': {}}
+        for key, values in maps.items():
+            area = values[reference_area]
+            area = area[np.isfinite(area)]
+            summary['noise'][key] = float(np.std(area)) if area.size else np.nan
+            summary['mean'][key] = float(np.mean(area)) if area.size else np.nan
+            summary['thumbnails'][key] = ParameterSweep.thumbnail(values, thumbnail_size)
+        summary['nan_fraction'] = float(np.mean(np.isnan(maps[SWEEP_OUTPUTS[0]])))
+        return summary
+
+    @staticmethod
+    def evaluate(complex_img1, complex_img2, material_mask, params):
+        """Summaries of one radius pair for every sigma in ``params['sigmas']``."""
+        _, gradients, (material_mask, reference_area, spacing, region) = StrainCalculator.gradient_stage(
+            complex_img1, complex_img2, params['g1_vec'], params['g2_vec'], material_mask,
+            params['reference_area'], params['demodulation'], params['upsample'], params['engine'],
+            params['fft_shape'], params['crop_to_material']
+        )
+        summaries = []
+        for sigma in params['sigmas']:
+            maps = StrainCalculator.strain_maps(
+                gradients, material_mask, sigma, spacing, params['engine'], region
+            )
+            summaries.append(ParameterSweep.summarize(
+                dict(zip(SWEEP_OUTPUTS, maps)), reference_area, params['thumbnail_size']
+            ))
+        return summaries
+
+    @staticmethod
+    def _evaluate_from_files(stack_path, layer, mask_path, params):
+        """``evaluate`` on two layers of a memory-mapped stack. Runs inside the workers."""
+        stack = np.load(stack_path, mmap_mode='c')
+        material_mask = np.load(mask_path, mmap_mode='r')
+        return ParameterSweep.evaluate(stack[layer], stack[layer + 1], material_mask, params)
+
+    @staticmethod
+    def batches(pairs, fft_shape, demodulation, itemsize):
+        """Radius pairs grouped by demodulation window, at most ``SWEEP_BATCH_BYTES`` per group."""
+        groups = {}
+        for r_inner, r_outer in pairs:
+            window_shape = None
+            if demodulation != 'full':
+                window_shape = StrainCalculator.crop_window_shape(fft_shape, (r_outer,))
+            groups.setdefault(window_shape, []).append((r_inner, r_outer))
+
+        batches = []
+        for window_shape, members in groups.items():
+            layer_shape = fft_shape if window_shape is None else window_shape
+            pair_bytes = 2 * int(np.prod(layer_shape)) * itemsize
+            size = max(1, SWEEP_BATCH_BYTES // pair_bytes)
+            for start in range(0, len(members), size):
+                batches.append((window_shape, members[start:start + size]))
+        return batches
+
+    @staticmethod
+    def run(fft_data, material_mask, c1, c2, r_inners, r_outers, sigmas, reference_area,
+            demodulation='full', upsample=False, engine='unwrap', precision=None, crop_to_material=False,
+            workers=None, thumbnail_size=THUMBNAIL_SIZE, progress=None, cancel_event=None):
+        """Sweep the ``settings`` grid; returns one dict per setting, in grid order."""
+        StrainCalculator.check_modes(demodulation, engine)
+        if precision is not None:
+            fft_data = fft_data.astype(COMPLEX_PRECISIONS[precision], copy=False)
+        grid = ParameterSweep.settings(r_inners, r_outers, sigmas)
+        sigmas = sorted({sigma for _, _, sigma in grid})
+        pairs = sorted({(r_inner, r_outer) for r_inner, r_outer, _ in grid})
+
+        fft_shape = fft_data.shape
+        c1 = (float(c1[0]), float(c1[1]))
+        c2 = (float(c2[0]), float(c2[1]))
+        params = {
+            'g1_vec': StrainCalculator.g_vector(c1, fft_shape),
+            'g2_vec': StrainCalculator.g_vector(c2, fft_shape),
+            'fft_shape': tuple(fft_shape),
+            'reference_area': reference_area,
+            'demodulation': demodulation,
+            'upsample': upsample,
+            'engine': engine,
+            'crop_to_material': crop_to_material,
+            'sigmas': sigmas,
+            'thumbnail_size': thumbnail_size,
+        }
+        batches = ParameterSweep.batches(pairs, fft_shape, demodulation, fft_data.itemsize)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(pairs)))
+        fft_workers = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Sweeping {len(grid)} setting(s): {len(pairs)} radius pair(s) in "
+              f"{len(batches)} batch(es) on {workers} worker(s)")
+
+        results = {}
+        total = len(pairs) * len(sigmas)
+
+        def check_cancel():
+            if cancel_event is not None and cancel_event.is_set():
+                raise PipelineCancelled("Parameter sweep cancelled.")
+
+        def collect(pair, summaries):
+            for sigma, summary in zip(sigmas, summaries):
+                results[pair + (sigma,)] = summary
+            if progress is not None:
+                progress(len(results), total)
+
+        def demodulate(window_shape, members):
+            reflections = []
+            for r_inner, r_outer in members:
+                reflections += [(c1, r_inner, r_outer), (c2, r_inner, r_outer)]
+            return StrainCalculator.demodulate_stack(fft_data, reflections, demodulation, window_shape)
+
+        if workers == 1:
+            for window_shape, members in batches:
+                check_cancel()
+                stack = demodulate(window_shape, members)
+                for index, pair in enumerate(members):
+                    check_cancel()
+                    collect(pair, ParameterSweep.evaluate(stack[2 * index], stack[2 * index + 1], material_mask, params))
+        else:
+            shared_dir = WorkerPool.shared_dir('gpa_sweep_')
+            mask_path = os.path.join(shared_dir, 'material_mask.npy')
+            np.save(mask_path, material_mask)
+            pool = WorkerPool.spawn(workers, FFTBackend.set_backend, (FFTBackend.backend, fft_workers))
+            pending = {}
+            remaining = {}
+
+            def finish(finished):
+                for future in finished:
+                    stack_path, pair = pending.pop(future)
+                    collect(pair, future.result())
+                    remaining[stack_path] -= 1
+                    if remaining[stack_path] == 0:
+                        del remaining[stack_path]
+                        os.remove(stack_path)
+
+            try:
+                for index, (window_shape, members) in enumerate(batches):
+                    # The next batch is demodulated while the workers finish the previous one.
+                    while len(remaining) >= 2:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        finish(finished)
+                        check_cancel()
+                    check_cancel()
+                    stack_path = os.path.join(shared_dir, f"batch{index}.npy")
+                    np.save(stack_path, demodulate(window_shape, members))
+                    remaining[stack_path] = len(members)
+                    for layer, pair in enumerate(members):
+                        future = pool.submit(
+                            ParameterSweep._evaluate_from_files, stack_path, 2 * layer, mask_path, params
+                        )
+                        pending[future] = (stack_path, pair)
+
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    finish(finished)
+                    check_cancel()
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+                shutil.rmtree(shared_dir, ignore_errors=True)
+
+        rows = []
+        for r_inner, r_outer, sigma in grid:
+            row = {'r_inner': r_inner, 'r_outer': r_outer, 'sigma': sigma}
+            row.update(results[(r_inner, r_outer, sigma)])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def table(rows, key='strain_xx'):
+        """Plain-text summary of ``run``'s rows, quietest ``key`` first."""
+        lines = [f"{'r_inner':>8} {'r_outer':>8} {'sigma':>6} {'noise':>9} {'mean':>9} {'NaN %':>6}"]
+        for row in sorted(rows, key=lambda row: np.nan_to_num(row['noise'][key], nan=np.inf)):
+            lines.append(
+                f"{row['r_inner']:>8.1f} {row['r_outer']:>8.1f} {row['sigma']:>6.1f} "
+                f"{row['noise'][key]:>9.4f} {row['mean'][key]:>9.4f} {100 * row['nan_fraction']:>6.1f}"
+            )
+        return "\n".join(lines)
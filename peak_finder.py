@@ -0,0 +1,149 @@
+import numpy as np
+
+DEFAULT_MAX_PEAKS = 8
+PEAK_BLOCK = 4
+CANDIDATES_PER_PEAK = 16
+DC_EXCLUSION_FRACTION = 0.01
+MIN_DC_EXCLUSION = 3
+MIN_PEAK_DISTANCE = 3
+BACKGROUND_HALF_WIDTH = 8
+MIN_PAIR_ANGLE = 30.0
+
+class PeakFinder:
+    """Bragg-peak detection and sub-pixel refinement on a centred FFT magnitude."""
+
+
+    @staticmethod
+    def interpolate_offset(before, peak, after):
+        """Sub-pixel offset of a spectral peak from its two neighbour magnitudes."""
+        if peak <= 0:
+            return 0.0
+        if after >= before:
+            ratio = after / peak
+            return float(min(ratio / (1 + ratio), 0.5))
+        ratio = before / peak
+        return float(max(-ratio / (1 + ratio), -0.5))
+
+    @staticmethod
+    def subpixel_offset(patch):
+        """Offset (dy, dx) of the maximum at the centre of a 3x3 magnitude patch."""
+        dy = PeakFinder.interpolate_offset(patch[0, 1], patch[1, 1], patch[2, 1])
+        dx = PeakFinder.interpolate_offset(patch[1, 0], patch[1, 1], patch[1, 2])
+        return dy, dx
+
+    @staticmethod
+    def refine_peak(fft_magnitude, center, search_radius=3):
+        """Sub-pixel position (y, x) of the strongest peak near ``center``."""
+        ny, nx = fft_magnitude.shape
+        cy, cx = int(round(center[0])), int(round(center[1]))
+        y0, y1 = max(cy - search_radius, 1), min(cy + search_radius + 1, ny - 1)
+        x0, x1 = max(cx - search_radius, 1), min(cx + search_radius + 1, nx - 1)
+        if y0 >= y1 or x0 >= x1:
+            return float(center[0]), float(center[1])
+
+        window = fft_magnitude[y0:y1, x0:x1]
+        iy, ix = np.unravel_index(np.argmax(window), window.shape)
+        py, px = y0 + iy, x0 + ix
+        dy, dx = PeakFinder.subpixel_offset(fft_magnitude[py - 1:py + 2, px - 1:px + 2])
+        return py + dy, px + dx
+
+    @staticmethod
+    def block_maxima(magnitude, block=PEAK_BLOCK):
+        """Maximum of every ``block`` x ``block`` tile (shape must be a multiple of ``block``)."""
+        rows = np.maximum(magnitude[0::block], magnitude[1::block])
+        for i in range(2, block):
+            np.maximum(rows, magnitude[i::block], out=rows)
+        blocks = np.maximum(rows[:, 0::block], rows[:, 1::block])
+        for i in range(2, block):
+            np.maximum(blocks, rows[:, i::block], out=blocks)
+        return blocks
+
+    @staticmethod
+    def find_peaks(fft_magnitude, max_peaks=DEFAULT_MAX_PEAKS, dc_radius=None,
+                   min_distance=MIN_PEAK_DISTANCE):
+        """Strongest Bragg reflections of a centred FFT magnitude."""
+        ny, nx = fft_magnitude.shape
+        cy, cx = ny // 2, nx // 2
+        if dc_radius is None:
+            dc_radius = max(MIN_DC_EXCLUSION, DC_EXCLUSION_FRACTION * min(ny, nx))
+
+        block = PEAK_BLOCK
+        y0 = (cy + 1) % block
+        half = fft_magnitude[y0:cy + 1, :nx - nx % block]
+        blocks = PeakFinder.block_maxima(half, block)
+
+        reach = int(np.ceil(dc_radius / block)) + 1
+        dc_row, dc_col = (cy - y0) // block, cx // block
+        blocks[max(dc_row - reach, 0):, max(dc_col - reach, 0):dc_col + reach + 1] = 0
+
+        n_candidates = min(blocks.size, CANDIDATES_PER_PEAK * max_peaks)
+        flat = np.argpartition(blocks.ravel(), -n_candidates)[-n_candidates:]
+        block_rows, block_cols = np.unravel_index(flat, blocks.shape)
+
+        offsets = np.arange(block)
+        tiles = half[
+            (block_rows * block)[:, None, None] + offsets[None, :, None],
+            (block_cols * block)[:, None, None] + offsets[None, None, :]
+        ].reshape(n_candidates, -1)
+        best = tiles.argmax(axis=1)
+        ys = y0 + block_rows * block + best // block
+        xs = block_cols * block + best % block
+
+        keep = (
+            (ys >= 1) & (ys < ny - 1) & (xs >= 1) & (xs < nx - 1)
+            & (np.hypot(ys - cy, xs - cx) > dc_radius)
+        )
+        ys, xs = ys[keep], xs[keep]
+        peaks = fft_magnitude[ys, xs]
+
+        dy, dx = np.mgrid[-1:2, -1:2]
+        neighbours = fft_magnitude[ys[:, None] + dy.ravel(), xs[:, None] + dx.ravel()]
+        local_max = peaks >= neighbours.max(axis=1)
+        ys, xs, peaks = ys[local_max], xs[local_max], peaks[local_max]
+
+        w = BACKGROUND_HALF_WIDTH
+        by, bx = np.mgrid[-w:w + 1, -w:w + 1]
+        border = (np.abs(by) == w) | (np.abs(bx) == w)
+        ring = fft_magnitude[
+            np.clip(ys[:, None] + by[border], 0, ny - 1),
+            np.clip(xs[:, None] + bx[border], 0, nx - 1)
+        ]
+        scores = peaks / np.maximum(ring.mean(axis=1), np.finfo(float).tiny)
+
+        centers, ranked_scores = [], []
+        for i in np.argsort(-scores):
+            y, x = ys[i], xs[i]
+            # Friedel mates of accepted peaks are the same reflection.
+            if any(
+                min(abs(y - ay) + abs(x - ax), abs(2*cy - y - ay) + abs(2*cx - x - ax)) < min_distance
+                for ay, ax in centers
+            ):
+                continue
+            centers.append((y, x))
+            ranked_scores.append(scores[i])
+            if len(centers) == max_peaks:
+                break
+
+        refined = np.array([
+            np.add((y, x), PeakFinder.subpixel_offset(fft_magnitude[y - 1:y + 2, x - 1:x + 2]))
+            for y, x in centers
+        ]).reshape(-1, 2)
+        return refined, np.array(ranked_scores)
+
+    @staticmethod
+    def suggest_pair(centers, shape, min_angle=MIN_PAIR_ANGLE):
+        """Best-ranked pair of reflections at least ``min_angle`` degrees from collinear."""
+        vectors = np.asarray(centers, dtype=float) - (shape[0] // 2, shape[1] // 2)
+        max_cos = np.cos(np.radians(min_angle))
+        for i in range(len(vectors)):
+            for j in range(i + 1, len(vectors)):
+                cos = abs(vectors[i] @ vectors[j]) / (np.linalg.norm(vectors[i]) * np.linalg.norm(vectors[j]))
+                if cos <= max_cos:
+                    return tuple(centers[i]), tuple(centers[j])
+        raise ValueError("No non-collinear pair of reflections found.")
+
+    @staticmethod
+    def detect_pair(fft_magnitude, max_peaks=DEFAULT_MAX_PEAKS, dc_radius=None):
+        """Sub-pixel centers ``(c1, c2)`` of the suggested g-vector pair."""
+        centers, _ = PeakFinder.find_peaks(fft_magnitude, max_peaks, dc_radius)
+        return PeakFinder.suggest_pair(centers, fft_magnitude.shape)
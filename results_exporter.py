@@ -0,0 +1,148 @@
+import json
+import importlib.util
+import numpy as np
+
+from display_pyramid import DisplayPyramid
+
+# h5py and zarr are only imported once a store is opened.
+HAS_H5PY = importlib.util.find_spec('h5py') is not None
+HAS_ZARR = importlib.util.find_spec('zarr') is not None
+
+EXPORT_FORMATS = ('hdf5', 'zarr')
+EXPORT_CHUNK = 512
+# Fast gzip: level 1 is a few times quicker than the default and barely larger.
+EXPORT_GZIP_LEVEL = 1
+# Multiscale levels stop once the longer side would drop below this size.
+MIN_LEVEL_SIZE = 256
+
+class ResultsExporter:
+    """Writes GPA results as numbers to one chunked HDF5 file or Zarr store."""
+
+
+    @staticmethod
+    def open_store(path, fmt=None, mode='w'):
+        """``(store, fmt)`` of an HDF5 file or Zarr group; ``fmt`` defaults from the extension."""
+        if fmt is None:
+            fmt = 'zarr' if path.rstrip('/').endswith('.zarr') else 'hdf5'
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if fmt == 'hdf5':
+            if not HAS_H5PY:
+                raise RuntimeError("Writing HDF5 requires h5py.")
+            import h5py
+            return h5py.File(path, mode), fmt
+        if not HAS_ZARR:
+            raise RuntimeError("Writing Zarr requires zarr.")
+        import zarr
+        return zarr.open_group(path, mode=mode), fmt
+
+    @staticmethod
+    def close_store(store, fmt):
+        # Zarr groups need no closing.
+        if fmt == 'hdf5':
+            store.close()
+
+    @staticmethod
+    def level_factors(shape):
+        factors = [1]
+        while max(shape) // (factors[-1] * 2) >= MIN_LEVEL_SIZE:
+            factors.append(factors[-1] * 2)
+        return factors
+
+    @staticmethod
+    def create_dataset(store, fmt, name, shape, dtype, chunks, compression, data=None):
+        """Chunked, optionally compressed dataset in a store from ``open_store``."""
+        if fmt == 'hdf5':
+            # Uncompressed HDF5 stays contiguous, so it can be memory-mapped.
+            return store.create_dataset(
+                name, shape=shape, dtype=dtype, data=data,
+                chunks=chunks if compression else None,
+                compression='gzip' if compression else None,
+                compression_opts=EXPORT_GZIP_LEVEL if compression else None,
+                shuffle=compression
+            )
+        return store.create_dataset(
+            name, shape=shape, dtype=dtype, data=data, chunks=chunks,
+            **({} if compression else {'compressor': None})
+        )
+
+    @staticmethod
+    def write_array(store, fmt, name, array, chunk, compression):
+        chunks = tuple(min(chunk, n) for n in array.shape)
+        return ResultsExporter.create_dataset(
+            store, fmt, name, array.shape, array.dtype, chunks, compression, data=array
+        )
+
+    @staticmethod
+    def export(path, results, metadata=None, fmt=None, chunk=EXPORT_CHUNK,
+               compression=True, nan_aware=False, multiscale=True):
+        """Write every 2D array of ``results`` plus ``metadata`` to ``path``."""
+        store, fmt = ResultsExporter.open_store(path, fmt)
+        try:
+            store.attrs['metadata'] = json.dumps(metadata or {})
+            masks = []
+            exported = []
+            for name, value in results.items():
+                value = np.asarray(value)
+                if value.ndim != 2:
+                    continue
+                complex_map = np.iscomplexobj(value)
+                full = value.astype(np.complex64 if complex_map else np.float32, copy=False)
+                magnitude = np.abs(full) if complex_map else full
+
+                group = f"maps/{name}"
+                if nan_aware and not complex_map:
+                    invalid = np.isnan(full)
+                    if invalid.any():
+                        packed = np.packbits(invalid, axis=None)
+                        index = next(
+                            (i for i, mask in enumerate(masks) if np.array_equal(mask, packed)), None
+                        )
+                        if index is None:
+                            index = len(masks)
+                            masks.append(packed)
+                            ResultsExporter.write_array(
+                                store, fmt, f"masks/{index}", packed, chunk * chunk, compression
+                            )
+                        full = np.where(invalid, np.float32(0), full)
+                        store.require_group(group).attrs['nan_mask'] = f"masks/{index}"
+
+                ResultsExporter.write_array(store, fmt, f"{group}/0", full, chunk, compression)
+                factors = ResultsExporter.level_factors(full.shape) if multiscale else [1]
+                for level, factor in enumerate(factors[1:], start=1):
+                    ResultsExporter.write_array(
+                        store, fmt, f"{group}/{level}",
+                        DisplayPyramid.block_mean(magnitude, factor).astype(np.float32),
+                        chunk, compression
+                    )
+                attrs = store[group].attrs
+                attrs['factors'] = factors
+                attrs['shape'] = list(full.shape)
+                exported.append(name)
+        finally:
+            ResultsExporter.close_store(store, fmt)
+        return exported
+
+    @staticmethod
+    def load(path, name, level=0, fmt=None):
+        """Read one map level back as a NumPy array, restoring NaNs."""
+        store, fmt = ResultsExporter.open_store(path, fmt, mode='r')
+        try:
+            group = store[f"maps/{name}"]
+            array = np.asarray(group[str(level)][...])
+            mask_name = group.attrs.get('nan_mask')
+            if mask_name is not None and level == 0:
+                packed = np.asarray(store[mask_name][...])
+                invalid = np.unpackbits(packed, count=array.size).view(bool).reshape(array.shape)
+                array[invalid] = np.nan
+            return array
+        finally:
+            ResultsExporter.close_store(store, fmt)
+
+    @staticmethod
+    def metadata(path, fmt=None):
+        store, fmt = ResultsExporter.open_store(path, fmt, mode='r')
+        try:
+            return json.loads(store.attrs['metadata'])
+        finally:
+            ResultsExporter.close_store(store, fmt)
@@ -1,118 +1,758 @@
-
-import numpy as np
-from numpy.fft import ifft2, ifftshift
-from scipy.ndimage import gaussian_filter
-from skimage.restoration import unwrap_phase
-
-ROTATION_IN_DEGREES = True  
-
-class StrainCalculator:
-
-
-    @staticmethod
-    def create_cosine_mask(shape, center, r_inner, r_outer):
-
-        ny, nx = shape
-        cy, cx = center
-        y, x = np.indices((ny, nx))
-        R = np.sqrt((x - cx)**2 + (y - cy)**2)
-        mask = np.zeros(shape, dtype=float)
-        inside_inner = (R <= r_inner)
-        mask[inside_inner] = 1.0
-        transition_region = (R > r_inner) & (R < r_outer)
-        R_tr = R[transition_region]
-        mask[transition_region] = 0.5 * (
-            1.0 + np.cos(np.pi * (R_tr - r_inner) / (r_outer - r_inner))
-        )
-        outside_outer = (R >= r_outer)
-        mask[outside_outer] = 0.0
-        return mask
-
-    @staticmethod
-    def calculate_displacements_and_strain(
-        fft_data, material_mask,
-        c1, g1, r1,
-        c2, g2, r2,
-        reference_area, sigma_smooth
-    ):
-
-        mask1 = StrainCalculator.create_cosine_mask(fft_data.shape, c1, g1, r1)
-        mask2 = StrainCalculator.create_cosine_mask(fft_data.shape, c2, g2, r2)
-
-        filtered_fft1 = fft_data * mask1
-        filtered_fft2 = fft_data * mask2
-
-        complex_img1 = ifft2(ifftshift(filtered_fft1))
-        complex_img2 = ifft2(ifftshift(filtered_fft2))
-
-        raw_phase_1 = np.angle(complex_img1)
-        raw_phase_2 = np.angle(complex_img2)
-
-        Ny, Nx = fft_data.shape
-        cy, cx = Ny // 2, Nx // 2
-
-        g1x = (c1[1] - cx) / Nx
-        g1y = (c1[0] - cy) / Ny
-        g2x = (c2[1] - cx) / Nx
-        g2y = (c2[0] - cy) / Ny
-
-        Y, X = np.indices((Ny, Nx))
-        phase_image1 = raw_phase_1 - 2*np.pi * (g1x*X + g1y*Y)
-        phase_image2 = raw_phase_2 - 2*np.pi * (g2x*X + g2y*Y)
-
-        phase_image1 = unwrap_phase(phase_image1)
-        phase_image2 = unwrap_phase(phase_image2)
-
-        G = np.array([[g1x, g1y], [g2x, g2y]], dtype=float)
-        G_inv = np.linalg.pinv(G)
-
-        Pg1 = phase_image1
-        Pg2 = phase_image2
-
-        ux = (-1/(2*np.pi)) * (G_inv[0,0]*Pg1 + G_inv[0,1]*Pg2)
-        uy = (-1/(2*np.pi)) * (G_inv[1,0]*Pg1 + G_inv[1,1]*Pg2)
-
-        ux_ref_mean = np.mean(ux[reference_area])
-        uy_ref_mean = np.mean(uy[reference_area])
-        ux = ux - ux_ref_mean
-        uy = uy - uy_ref_mean
-
-        dux_dy, dux_dx = np.gradient(ux)
-        duy_dy, duy_dx = np.gradient(uy)
-
-        exx = dux_dx
-        eyy = duy_dy
-        exy = 0.5*(dux_dy + duy_dx)
-
-        rotation_xy = 0.5*(duy_dx - dux_dy)
-        if ROTATION_IN_DEGREES:
-            rotation_xy = np.degrees(rotation_xy)
-
-        exx_smooth = gaussian_filter(exx, sigma=sigma_smooth)
-        eyy_smooth = gaussian_filter(eyy, sigma=sigma_smooth)
-        exy_smooth = gaussian_filter(exy, sigma=sigma_smooth)
-        rotation_smooth = gaussian_filter(rotation_xy, sigma=sigma_smooth)
-
-        exx_smooth[~material_mask] = np.nan
-        eyy_smooth[~material_mask] = np.nan
-        exy_smooth[~material_mask] = np.nan
-        rotation_smooth[~material_mask] = np.nan
-
-        exx_smooth *= 100
-        eyy_smooth *= 100
-        exy_smooth *= 100
-
-        return {
-            'complex_image1': complex_img1,
-            'complex_image2': complex_img2,
-            'raw_phase_image1': raw_phase_1,
-            'raw_phase_image2': raw_phase_2,
-            'phase_image1': phase_image1,
-            'phase_image2': phase_image2,
-            'u1': ux,
-            'u2': uy,
-            'strain_xx': exx_smooth,    
-            'strain_yy': eyy_smooth,    
-            'strain_xy': exy_smooth,    
-            'rotation_xy': rotation_smooth
-        }
+
+import numpy as np
+from functools import lru_cache
+
+from fft_backend import FFTBackend
+
+# scipy.ndimage and skimage are imported inside the methods that use them,
+# so importing this module (and starting the GUI or a batch worker) stays fast.
+
+ROTATION_IN_DEGREES = True  
+DEMODULATION_MODES = ('full', 'cropped')
+STRAIN_ENGINES = ('unwrap', 'gradient', 'spectral')
+MASK_CACHE_SIZE = 64
+COMPLEX_PRECISIONS = {'double': np.complex128, 'single': np.complex64}
+AMPLITUDE_WEIGHT_FLOOR = 1e-3
+# Rows per block of the fused phase and displacement kernels; a block of a
+# 4096-wide double map is 8 MB, so the scratch buffers stay cache-friendly.
+KERNEL_BLOCK_ROWS = 256
+
+class StrainCalculator:
+
+
+    @staticmethod
+    def create_cosine_mask(shape, center, r_inner, r_outer):
+        """Full-frame cosine mask, pasted from the cached window."""
+        window_slices, window = StrainCalculator.cosine_mask_window(shape, center, r_inner, r_outer)
+        mask = np.zeros(shape, dtype=float)
+        mask[window_slices] = window
+        return mask
+
+    @staticmethod
+    def cosine_mask_window(shape, center, r_inner, r_outer):
+        """Cosine mask restricted to the bounding box of its ``r_outer`` disk."""
+        return StrainCalculator._cosine_mask_window(
+            tuple(int(n) for n in shape),
+            (float(center[0]), float(center[1])),
+            float(r_inner), float(r_outer)
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=MASK_CACHE_SIZE)
+    def _cosine_mask_window(shape, center, r_inner, r_outer):
+        ny, nx = shape
+        cy, cx = center
+        y0 = min(max(int(np.ceil(cy - r_outer)), 0), ny)
+        y1 = max(min(int(np.floor(cy + r_outer)) + 1, ny), y0)
+        x0 = min(max(int(np.ceil(cx - r_outer)), 0), nx)
+        x1 = max(min(int(np.floor(cx + r_outer)) + 1, nx), x0)
+
+        y = np.arange(y0, y1)[:, None]
+        x = np.arange(x0, x1)[None, :]
+        R = np.sqrt((x - cx)**2 + (y - cy)**2)
+        window = np.zeros(R.shape, dtype=float)
+        inside_inner = (R <= r_inner)
+        window[inside_inner] = 1.0
+        transition_region = (R > r_inner) & (R < r_outer)
+        R_tr = R[transition_region]
+        window[transition_region] = 0.5 * (
+            1.0 + np.cos(np.pi * (R_tr - r_inner) / (r_outer - r_inner))
+        )
+        outside_outer = (R >= r_outer)
+        window[outside_outer] = 0.0
+        window.setflags(write=False)
+        return (slice(y0, y1), slice(x0, x1)), window
+
+    @staticmethod
+    def clear_mask_cache():
+        StrainCalculator._cosine_mask_window.cache_clear()
+
+    @staticmethod
+    def shifted_masked_spectrum(fft_data, center, r_inner, r_outer, out=None):
+        """``ifftshift`` of the masked spectrum without intermediate full-frame copies."""
+        window_slices, window = StrainCalculator.cosine_mask_window(
+            fft_data.shape, center, r_inner, r_outer
+        )
+        if out is None:
+            out = np.zeros_like(fft_data)
+        else:
+            out[...] = 0
+        Ny, Nx = fft_data.shape
+        rows = (np.arange(window_slices[0].start, window_slices[0].stop) - Ny // 2) % Ny
+        cols = (np.arange(window_slices[1].start, window_slices[1].stop) - Nx // 2) % Nx
+        out[np.ix_(rows, cols)] = fft_data[window_slices] * window
+        return out
+
+    @staticmethod
+    def g_vector(center, shape):
+        """Reciprocal vector (gx, gy) in cycles/pixel of an FFT position (y, x)."""
+        Ny, Nx = shape
+        return (center[1] - Nx // 2) / Nx, (center[0] - Ny // 2) / Ny
+
+    @staticmethod
+    def rescale_reflection(center, r_inner, r_outer, picked_shape, fft_shape):
+        """A reflection picked on an FFT of ``picked_shape``, moved to an FFT of ``fft_shape``."""
+        if tuple(picked_shape) == tuple(fft_shape):
+            return center, r_inner, r_outer
+        gx, gy = StrainCalculator.g_vector(center, picked_shape)
+        Ny, Nx = fft_shape
+        # Radii are scaled so that the mask keeps the same real-space resolution.
+        scale = np.sqrt(Ny * Nx / (picked_shape[0] * picked_shape[1]))
+        return (gy * Ny + Ny // 2, gx * Nx + Nx // 2), r_inner * scale, r_outer * scale
+
+    @staticmethod
+    def crop_window_shape(shape, r_outers):
+        """Smallest even window that holds every mask disk, capped at the frame size."""
+        size = 2 * int(np.ceil(max(r_outers))) + 2
+        return min(size, shape[0]), min(size, shape[1])
+
+    @staticmethod
+    def masked_window(fft_data, center, r_inner, r_outer, window_shape, out=None):
+        """Masked spectrum in a ``window_shape`` crop centred on the reflection."""
+        hy, hx = window_shape
+        cy, cx = center
+        y0, x0 = int(round(cy)) - hy // 2, int(round(cx)) - hx // 2
+
+        (mask_y, mask_x), mask = StrainCalculator.cosine_mask_window(
+            fft_data.shape, center, r_inner, r_outer
+        )
+        sy0, sy1 = max(mask_y.start, y0), min(mask_y.stop, y0 + hy)
+        sx0, sx1 = max(mask_x.start, x0), min(mask_x.stop, x0 + hx)
+
+        window = np.zeros((hy, hx), dtype=fft_data.dtype) if out is None else out
+        window[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = (
+            fft_data[sy0:sy1, sx0:sx1]
+            * mask[sy0 - mask_y.start:sy1 - mask_y.start, sx0 - mask_x.start:sx1 - mask_x.start]
+        )
+        return window
+
+    @staticmethod
+    def residual_carrier(center, fft_shape, window_shape):
+        """Phase factor that removes the sub-pixel carrier left by the crop."""
+        Ny, Nx = fft_shape
+        hy, hx = window_shape
+        cy, cx = center
+        dgx, dgy = (cx - int(round(cx))) / Nx, (cy - int(round(cy))) / Ny
+        if not (dgx or dgy):
+            return None
+        y = np.arange(hy) * (Ny / hy)
+        x = np.arange(hx) * (Nx / hx)
+        return np.exp(-2j*np.pi * (dgy*y[:, None] + dgx*x[None, :]))
+
+    @staticmethod
+    def demodulate_window(fft_data, center, r_inner, r_outer, window_shape):
+        """Inverse-transform only the mask support around ``center``."""
+        Ny, Nx = fft_data.shape
+        hy, hx = window_shape
+        window = StrainCalculator.masked_window(fft_data, center, r_inner, r_outer, window_shape)
+        complex_img = FFTBackend.ifft2(FFTBackend.ifftshift(window)) * (hy * hx / (Ny * Nx))
+
+        carrier = StrainCalculator.residual_carrier(center, fft_data.shape, window_shape)
+        if carrier is not None:
+            complex_img *= carrier
+        return complex_img
+
+    @staticmethod
+    def upsample_complex(complex_img, shape, spacing):
+        """Periodic cubic interpolation of a coarse demodulated image to ``shape``."""
+        from scipy.ndimage import affine_transform
+        return affine_transform(
+            complex_img, [1 / spacing[0], 1 / spacing[1]],
+            output_shape=shape, order=3, mode='grid-wrap'
+        )
+
+    @staticmethod
+    def upsample_phase(phase_image, shape, spacing):
+        """Cubic interpolation of a coarse unwrapped phase image to ``shape``."""
+        from scipy.ndimage import affine_transform
+        return affine_transform(
+            phase_image, [1 / spacing[0], 1 / spacing[1]],
+            output_shape=shape, order=3, mode='nearest'
+        )
+
+    @staticmethod
+    def resample_mask(mask, coarse_shape, spacing):
+        """Nearest-neighbour pick of a full-size boolean mask on the coarse grid."""
+        Ny, Nx = mask.shape
+        hy, hx = coarse_shape
+        rows = np.round(np.arange(hy) * spacing[0]).astype(int)
+        cols = np.round(np.arange(hx) * spacing[1]).astype(int)
+        resampled = mask[np.ix_(np.minimum(rows, Ny - 1), np.minimum(cols, Nx - 1))]
+        resampled &= (rows < Ny)[:, None] & (cols < Nx)[None, :]
+        return resampled
+
+    @staticmethod
+    def resample_area(area, spacing):
+        """Map a (slice_y, slice_x) area in full pixels onto a grid with ``spacing``."""
+        scaled = []
+        for sl, step in zip(area, spacing):
+            start = int(np.floor((sl.start or 0) / step))
+            stop = max(int(np.ceil(sl.stop / step)), start + 1)
+            scaled.append(slice(start, stop))
+        return tuple(scaled)
+
+    @staticmethod
+    def solve_displacements(phases, g_vecs, weights=None):
+        """Least-squares (ux, uy) from N phase (or phase-gradient) maps."""
+        dtype = phases[0].dtype
+        G = np.array(g_vecs, dtype=float)
+
+        if weights is None:
+            G_inv = np.linalg.pinv(G).astype(dtype)
+            return (
+                StrainCalculator.combine_phases(phases, G_inv[0]),
+                StrainCalculator.combine_phases(phases, G_inv[1])
+            )
+
+        gx, gy = G[:, 0].astype(dtype), G[:, 1].astype(dtype)
+        W = np.asarray(weights, dtype=dtype)
+        WP = W * np.asarray(phases, dtype=dtype)
+
+        Mxx = np.einsum('j...,j->...', W, gx*gx)
+        Mxy = np.einsum('j...,j->...', W, gx*gy)
+        Myy = np.einsum('j...,j->...', W, gy*gy)
+        bx = np.einsum('j...,j->...', WP, gx)
+        by = np.einsum('j...,j->...', WP, gy)
+
+        scale = (-1/(2*np.pi)) / (Mxx*Myy - Mxy*Mxy)
+        ux = (Myy*bx - Mxy*by) * scale
+        uy = (Mxx*by - Mxy*bx) * scale
+        return ux, uy
+
+    @staticmethod
+    def combine_phases(phases, coefficients):
+        """``-1/(2*pi) * sum_j coefficients[j] * phases[j]``, one row block at a time."""
+        shape = phases[0].shape
+        u = np.empty(shape, dtype=phases[0].dtype)
+        scratch = np.empty((min(KERNEL_BLOCK_ROWS, shape[0]),) + shape[1:], dtype=u.dtype)
+        for start in range(0, shape[0], KERNEL_BLOCK_ROWS):
+            rows = slice(start, min(start + KERNEL_BLOCK_ROWS, shape[0]))
+            block = u[rows]
+            np.multiply(phases[0][rows], coefficients[0], out=block)
+            for coefficient, P in zip(coefficients[1:], phases[1:]):
+                term = scratch[:block.shape[0]]
+                np.multiply(P[rows], coefficient, out=term)
+                block += term
+            block *= -1/(2*np.pi)
+        return u
+
+    @staticmethod
+    def amplitude_weights(complex_imgs):
+        """Per-pixel least-squares weights from the complex image amplitudes."""
+        weights = np.abs(np.asarray(complex_imgs))
+        floor = AMPLITUDE_WEIGHT_FLOOR * weights.max(axis=(-2, -1), keepdims=True)
+        return np.maximum(weights, floor)
+
+    @staticmethod
+    def displacements_from_phases(phase_image1, phase_image2, g1_vec, g2_vec, reference_area):
+        ux, uy = StrainCalculator.solve_displacements(
+            (phase_image1, phase_image2), (g1_vec, g2_vec)
+        )
+
+        ux -= np.mean(ux[reference_area])
+        uy -= np.mean(uy[reference_area])
+        return ux, uy
+
+    @staticmethod
+    def wrap_phase(phase):
+        return (phase + np.pi) % (2*np.pi) - np.pi
+
+    @staticmethod
+    def phase_gradient(complex_img, g_vec=(0.0, 0.0), spacing=(1.0, 1.0)):
+        """Gradient (dP/dy, dP/dx) of the geometric phase without unwrapping."""
+        gradients = []
+        for axis, g, step in ((0, g_vec[1], spacing[0]), (1, g_vec[0], spacing[1])):
+            z = np.moveaxis(complex_img, axis, 0)
+            carrier = 2*np.pi * g * step
+            grad = np.empty(z.shape, dtype=np.angle(z[:1]).dtype)
+            grad[1:-1] = StrainCalculator.wrap_phase(np.angle(z[2:] * np.conj(z[:-2])) - 2*carrier) / 2
+            grad[0] = StrainCalculator.wrap_phase(np.angle(z[1] * np.conj(z[0])) - carrier)
+            grad[-1] = StrainCalculator.wrap_phase(np.angle(z[-1] * np.conj(z[-2])) - carrier)
+            gradients.append(np.moveaxis(grad, 0, axis) / step)
+        return gradients[0], gradients[1]
+
+    @staticmethod
+    def displacement_gradients_from_phase_gradients(phase_grads1, phase_grads2, g1_vec, g2_vec):
+        """(dux/dy, dux/dx, duy/dy, duy/dx) from the two phase gradients."""
+        dP1_dy, dP1_dx = phase_grads1
+        dP2_dy, dP2_dx = phase_grads2
+
+        dux_dy, duy_dy = StrainCalculator.solve_displacements((dP1_dy, dP2_dy), (g1_vec, g2_vec))
+        dux_dx, duy_dx = StrainCalculator.solve_displacements((dP1_dx, dP2_dx), (g1_vec, g2_vec))
+        return dux_dy, dux_dx, duy_dy, duy_dx
+
+    @staticmethod
+    def strain_from_displacements(ux, uy, material_mask, sigma_smooth, spacing=(1.0, 1.0)):
+        """Strain (in %) and rotation maps; ``spacing`` is the grid step in pixels."""
+        dux_dy, dux_dx = np.gradient(ux, *spacing)
+        duy_dy, duy_dx = np.gradient(uy, *spacing)
+        return StrainCalculator.strain_from_gradients(
+            dux_dy, dux_dx, duy_dy, duy_dx, material_mask, sigma_smooth, spacing
+        )
+
+    @staticmethod
+    def strain_from_gradients(dux_dy, dux_dx, duy_dy, duy_dx, material_mask,
+                              sigma_smooth, spacing=(1.0, 1.0)):
+        from scipy.ndimage import gaussian_filter
+
+        exy = np.add(dux_dy, duy_dx)
+        exy *= 0.5
+        rotation_xy = np.subtract(duy_dx, dux_dy)
+        rotation_xy *= 0.5
+        if ROTATION_IN_DEGREES:
+            np.degrees(rotation_xy, out=rotation_xy)
+
+        # exy and rotation_xy are fresh buffers and are filtered in place;
+        # the gradients themselves may be cached by the caller.
+        sigma = (sigma_smooth / spacing[0], sigma_smooth / spacing[1])
+        return StrainCalculator.masked_strain(
+            gaussian_filter(dux_dx, sigma=sigma),
+            gaussian_filter(duy_dy, sigma=sigma),
+            gaussian_filter(exy, sigma=sigma, output=exy),
+            gaussian_filter(rotation_xy, sigma=sigma, output=rotation_xy),
+            material_mask
+        )
+
+    @staticmethod
+    def masked_strain(exx, eyy, exy, rotation_xy, material_mask):
+        """NaN outside the material, strains in %. Modifies the arrays in place."""
+        outside = ~material_mask
+        exx[outside] = np.nan
+        eyy[outside] = np.nan
+        exy[outside] = np.nan
+        rotation_xy[outside] = np.nan
+
+        exx *= 100
+        eyy *= 100
+        exy *= 100
+        return exx, eyy, exy, rotation_xy
+
+    @staticmethod
+    def remove_plane(u):
+        """``u`` minus its least-squares plane, and the plane's (d/dy, d/dx) slopes per sample."""
+        ny, nx = u.shape
+        y = np.arange(ny) - (ny - 1) / 2
+        x = np.arange(nx) - (nx - 1) / 2
+        slope_y = float(u.sum(axis=1) @ y) / (nx * float(y @ y)) if ny > 1 else 0.0
+        slope_x = float(u.sum(axis=0) @ x) / (ny * float(x @ x)) if nx > 1 else 0.0
+        residual = u - (slope_y * y).astype(u.dtype)[:, None]
+        residual -= (slope_x * x).astype(u.dtype)[None, :]
+        return residual, (slope_y, slope_x)
+
+    @staticmethod
+    def displacement_spectrum(ux, uy):
+        """DCT-II spectra of the plane-free displacements, with the plane slopes."""
+        spectrum = []
+        for u in (ux, uy):
+            residual, slopes = StrainCalculator.remove_plane(u)
+            spectrum.append((FFTBackend.dctn(residual), slopes))
+        return tuple(spectrum)
+
+    @staticmethod
+    def spectral_gradients(spectrum, sigma_smooth, spacing=(1.0, 1.0), step=1):
+        """Gaussian-smoothed (dux/dy, dux/dx, duy/dy, duy/dx) from ``displacement_spectrum``."""
+        ny, nx = spectrum[0][0].shape
+        my, mx = -(-ny // step), -(-nx // step)
+        dtype = spectrum[0][0].dtype
+        freq_y = (np.pi * np.arange(my) / ny).astype(dtype)
+        freq_x = (np.pi * np.arange(mx) / nx).astype(dtype)
+        sigma_y, sigma_x = sigma_smooth / spacing[0], sigma_smooth / spacing[1]
+        transfer = (
+            np.exp(-0.5 * (sigma_y * freq_y)**2)[:, None] * np.exp(-0.5 * (sigma_x * freq_x)**2)[None, :]
+        ).astype(dtype) * dtype.type(my * mx / (ny * nx))
+
+        gradients = []
+        for coeffs, (slope_y, slope_x) in spectrum:
+            smoothed = coeffs[:my, :mx] * transfer
+            # d/dn cos(pi*k*(2n+1)/2N) = -(pi*k/N) sin(...), the DST-II term k-1.
+            d_dy = np.zeros_like(smoothed)
+            np.multiply(smoothed[1:], -freq_y[1:, None], out=d_dy[:-1])
+            d_dx = np.zeros_like(smoothed)
+            np.multiply(smoothed[:, 1:], -freq_x[None, 1:], out=d_dx[:, :-1])
+            for derivative, axis, slope, space in ((d_dy, 0, slope_y, spacing[0]), (d_dx, 1, slope_x, spacing[1])):
+                grad = FFTBackend.idst_idct(derivative, axis)
+                grad += dtype.type(slope)
+                grad /= dtype.type(space)
+                gradients.append(grad)
+        return tuple(gradients)
+
+    @staticmethod
+    def strain_from_spectrum(spectrum, material_mask, sigma_smooth, spacing=(1.0, 1.0), step=1):
+        """``strain_from_gradients`` for the ``'spectral'`` engine."""
+        dux_dy, dux_dx, duy_dy, duy_dx = StrainCalculator.spectral_gradients(
+            spectrum, sigma_smooth, spacing, step
+        )
+        exy = duy_dx + dux_dy
+        exy *= 0.5
+        rotation_xy = duy_dx
+        rotation_xy -= dux_dy
+        rotation_xy *= 0.5
+        if ROTATION_IN_DEGREES:
+            np.degrees(rotation_xy, out=rotation_xy)
+        return StrainCalculator.masked_strain(dux_dx, duy_dy, exy, rotation_xy, material_mask)
+
+    @staticmethod
+    def strain_maps(gradients, material_mask, sigma_smooth, spacing=(1.0, 1.0), engine='unwrap',
+                    region=None):
+        """Smoothed strain maps from the output of ``displacement_gradients``."""
+        if region is not None:
+            maps = StrainCalculator.strain_maps(
+                gradients, material_mask[region], sigma_smooth, spacing, engine
+            )
+            return tuple(StrainCalculator.uncrop(m, region, material_mask.shape) for m in maps)
+        if engine == 'spectral':
+            return StrainCalculator.strain_from_spectrum(gradients, material_mask, sigma_smooth, spacing)
+        return StrainCalculator.strain_from_gradients(*gradients, material_mask, sigma_smooth, spacing)
+
+    @staticmethod
+    def material_region(material_mask):
+        """Bounding box ``(rows, cols)`` of the material; the whole frame if there is none."""
+        rows = np.flatnonzero(material_mask.any(axis=1))
+        cols = np.flatnonzero(material_mask.any(axis=0))
+        if rows.size == 0:
+            return (slice(0, material_mask.shape[0]), slice(0, material_mask.shape[1]))
+        return (slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1))
+
+    @staticmethod
+    def uncrop(values, region, shape):
+        full = np.full(shape, np.nan, dtype=values.dtype)
+        full[region] = values
+        return full
+
+    @staticmethod
+    def unwrap(phase_image, material_mask=None):
+        """Unwrapped phase; with a mask only the material inside its bounding box."""
+        from skimage.restoration import unwrap_phase
+
+        if material_mask is None:
+            return unwrap_phase(phase_image).astype(phase_image.dtype, copy=False)
+
+        unwrapped = phase_image.copy()
+        region = StrainCalculator.material_region(material_mask)
+        inside = material_mask[region]
+        if not inside.any():
+            return unwrapped
+        block = np.ma.getdata(unwrap_phase(np.ma.masked_array(phase_image[region], mask=~inside)))
+        if not inside.all():
+            from scipy.ndimage import distance_transform_edt
+
+            nearest = distance_transform_edt(~inside, return_distances=False, return_indices=True)
+            block = block[tuple(nearest)]
+        unwrapped[region] = block
+        return unwrapped
+
+    @staticmethod
+    def unwrap_mask(material_mask, demodulation, window_shape, fft_shape):
+        """``material_mask`` on the grid the phases are unwrapped on."""
+        if demodulation == 'full':
+            return material_mask
+        spacing = StrainCalculator.grid_spacing(window_shape, fft_shape)
+        return StrainCalculator.resample_mask(material_mask, window_shape, spacing)
+
+    @staticmethod
+    def check_modes(demodulation, engine):
+        if demodulation not in DEMODULATION_MODES:
+            raise ValueError(f"Unknown demodulation mode: {demodulation}")
+        if engine not in STRAIN_ENGINES:
+            raise ValueError(f"Unknown strain engine: {engine}")
+
+    @staticmethod
+    def is_coarse(demodulation, upsample):
+        """True when the maps stay on the cropped-window grid."""
+        return demodulation == 'cropped' and not upsample
+
+    @staticmethod
+    def grid_spacing(shape, fft_shape):
+        """Step in full-frame pixels of a map of ``shape`` computed from ``fft_shape``."""
+        return fft_shape[0] / shape[0], fft_shape[1] / shape[1]
+
+    @staticmethod
+    def demodulate(fft_data, center, r_inner, r_outer, demodulation='full', window_shape=None):
+        """Complex image of one reflection."""
+        if demodulation == 'full':
+            spectrum = StrainCalculator.shifted_masked_spectrum(fft_data, center, r_inner, r_outer)
+            return FFTBackend.ifft2(spectrum, overwrite_x=True)
+
+        if window_shape is None:
+            window_shape = StrainCalculator.crop_window_shape(fft_data.shape, (r_outer,))
+        return StrainCalculator.demodulate_window(fft_data, center, r_inner, r_outer, window_shape)
+
+    @staticmethod
+    def demodulate_stack(fft_data, reflections, demodulation='full', window_shape=None):
+        """Complex images of several reflections from one batched inverse FFT."""
+        stack_shape = fft_data.shape if demodulation == 'full' else tuple(window_shape)
+        stack = np.zeros((len(reflections),) + tuple(stack_shape), dtype=fft_data.dtype)
+
+        if demodulation == 'full':
+            for layer, (center, r_inner, r_outer) in zip(stack, reflections):
+                StrainCalculator.shifted_masked_spectrum(fft_data, center, r_inner, r_outer, out=layer)
+            return FFTBackend.ifft2(stack, overwrite_x=True)
+
+        for layer, (center, r_inner, r_outer) in zip(stack, reflections):
+            StrainCalculator.masked_window(fft_data, center, r_inner, r_outer, window_shape, out=layer)
+
+        hy, hx = window_shape
+        Ny, Nx = fft_data.shape
+        stack = FFTBackend.ifft2(FFTBackend.ifftshift(stack, axes=(-2, -1))) * (hy * hx / (Ny * Nx))
+        for layer, (center, _, _) in zip(stack, reflections):
+            carrier = StrainCalculator.residual_carrier(center, fft_data.shape, window_shape)
+            if carrier is not None:
+                layer *= carrier
+        return stack
+
+    @staticmethod
+    def geometric_phase(complex_img, g_vec, wrap=False):
+        """Raw phase of a full-frame complex image and its phase minus the carrier."""
+        Ny, Nx = complex_img.shape
+        gx, gy = g_vec
+        dtype = complex_img.real.dtype
+
+        # The carrier ramp is reduced modulo 2*pi in double precision before
+        # it is cast, so single-precision runs keep full phase resolution
+        # on large frames; this only changes the phase by multiples of 2*pi.
+        ramp_y = ((2*np.pi * gy * np.arange(Ny)) % (2*np.pi)).astype(dtype)
+        ramp_x = ((2*np.pi * gx * np.arange(Nx)) % (2*np.pi)).astype(dtype)
+
+        raw_phase = np.empty((Ny, Nx), dtype=dtype)
+        phase_image = np.empty((Ny, Nx), dtype=dtype)
+        for start in range(0, Ny, KERNEL_BLOCK_ROWS):
+            rows = slice(start, min(start + KERNEL_BLOCK_ROWS, Ny))
+            z, raw, phase = complex_img[rows], raw_phase[rows], phase_image[rows]
+            np.arctan2(z.imag, z.real, out=raw)
+            np.subtract(raw, ramp_x[None, :], out=phase)
+            phase -= ramp_y[rows, None]
+            if wrap:
+                phase += np.pi
+                np.remainder(phase, 2*np.pi, out=phase)
+                phase -= np.pi
+        return raw_phase, phase_image
+
+    @staticmethod
+    def phase_images(complex_img, g_vec, shape, demodulation='full', upsample=False,
+                     engine='unwrap', fft_shape=None, unwrap_mask=None):
+        """Raw and geometric phase of one demodulated reflection."""
+        unwrap = engine != 'gradient'
+        if fft_shape is None:
+            fft_shape = shape
+
+        if demodulation == 'full':
+            complex_img = complex_img[:shape[0], :shape[1]]
+            raw_phase, phase_image = StrainCalculator.geometric_phase(complex_img, g_vec, wrap=not unwrap)
+            if unwrap:
+                phase_image = StrainCalculator.unwrap(phase_image, unwrap_mask)
+            return complex_img, raw_phase, phase_image, g_vec
+
+        raw_phase = np.angle(complex_img)
+
+        # Unwrapping is done on the coarse grid, where it is cheap.
+        if unwrap:
+            phase_image = StrainCalculator.unwrap(raw_phase, unwrap_mask)
+        else:
+            phase_image = raw_phase
+
+        if upsample:
+            spacing = StrainCalculator.grid_spacing(complex_img.shape, fft_shape)
+            complex_img = StrainCalculator.upsample_complex(complex_img, shape, spacing)
+            raw_phase = np.angle(complex_img)
+            if unwrap:
+                phase_image = StrainCalculator.upsample_phase(phase_image, shape, spacing)
+            else:
+                phase_image = raw_phase
+        return complex_img, raw_phase, phase_image, (0.0, 0.0)
+
+    @staticmethod
+    def engine_gradients(ux, uy, complex_imgs, carriers, spacing, engine, region, solve):
+        """Engine dispatch of ``displacement_gradients``; ``solve`` maps the phase gradients to it."""
+        box = region if region is not None else (slice(None), slice(None))
+        if engine == 'spectral':
+            return StrainCalculator.displacement_spectrum(ux[box], uy[box])
+        if engine == 'unwrap':
+            dux_dy, dux_dx = np.gradient(ux[box], *spacing)
+            duy_dy, duy_dx = np.gradient(uy[box], *spacing)
+            return dux_dy, dux_dx, duy_dy, duy_dx
+        return solve([
+            StrainCalculator.phase_gradient(complex_img[box], carrier, spacing)
+            for complex_img, carrier in zip(complex_imgs, carriers)
+        ])
+
+    @staticmethod
+    def displacement_gradients(ux, uy, complex_img1, complex_img2, carrier1, carrier2,
+                               g1_vec, g2_vec, spacing=(1.0, 1.0), engine='unwrap', region=None):
+        """(dux/dy, dux/dx, duy/dy, duy/dx) for the selected strain engine."""
+        return StrainCalculator.engine_gradients(
+            ux, uy, (complex_img1, complex_img2), (carrier1, carrier2), spacing, engine, region,
+            lambda phase_grads: StrainCalculator.displacement_gradients_from_phase_gradients(
+                *phase_grads, g1_vec, g2_vec
+            )
+        )
+
+    @staticmethod
+    def strain_grid(material_mask, reference_area, demodulation, upsample, window_shape, fft_shape,
+                    crop_to_material=False):
+        """``(material_mask, reference_area, spacing, region)`` on the grid of the strain maps."""
+        spacing = (1.0, 1.0)
+        if StrainCalculator.is_coarse(demodulation, upsample):
+            spacing = StrainCalculator.grid_spacing(window_shape, fft_shape)
+            material_mask = StrainCalculator.resample_mask(material_mask, window_shape, spacing)
+            reference_area = StrainCalculator.resample_area(reference_area, spacing)
+        region = StrainCalculator.material_region(material_mask) if crop_to_material else None
+        return material_mask, reference_area, spacing, region
+
+    @staticmethod
+    def gradient_stage(complex_img1, complex_img2, g1_vec, g2_vec, material_mask, reference_area,
+                       demodulation='full', upsample=False, engine='unwrap', fft_shape=None,
+                       crop_to_material=False):
+        """Phases, displacements and their gradients from two demodulated reflections."""
+        shape = material_mask.shape
+        if fft_shape is None:
+            fft_shape = shape
+        window_shape = complex_img1.shape
+
+        unwrap_mask = None
+        if crop_to_material:
+            unwrap_mask = StrainCalculator.unwrap_mask(material_mask, demodulation, window_shape, fft_shape)
+        complex_img1, raw_phase_1, phase_image1, carrier1 = StrainCalculator.phase_images(
+            complex_img1, g1_vec, shape, demodulation, upsample, engine, fft_shape, unwrap_mask
+        )
+        complex_img2, raw_phase_2, phase_image2, carrier2 = StrainCalculator.phase_images(
+            complex_img2, g2_vec, shape, demodulation, upsample, engine, fft_shape, unwrap_mask
+        )
+
+        grid = StrainCalculator.strain_grid(
+            material_mask, reference_area, demodulation, upsample, window_shape, fft_shape, crop_to_material
+        )
+        _, reference_area, spacing, region = grid
+
+        ux, uy = StrainCalculator.displacements_from_phases(
+            phase_image1, phase_image2, g1_vec, g2_vec, reference_area
+        )
+        gradients = StrainCalculator.displacement_gradients(
+            ux, uy, complex_img1, complex_img2, carrier1, carrier2, g1_vec, g2_vec, spacing, engine,
+            region
+        )
+        results = {
+            'complex_image1': complex_img1,
+            'complex_image2': complex_img2,
+            'raw_phase_image1': raw_phase_1,
+            'raw_phase_image2': raw_phase_2,
+            'phase_image1': phase_image1,
+            'phase_image2': phase_image2,
+            'u1': ux,
+            'u2': uy,
+        }
+        return results, gradients, grid
+
+    @staticmethod
+    def calculate_displacements_and_strain(
+        fft_data, material_mask,
+        c1, g1, r1,
+        c2, g2, r2,
+        reference_area, sigma_smooth,
+        demodulation='full', upsample=False, engine='unwrap', precision=None,
+        crop_to_material=False
+    ):
+        """GPA displacement and strain maps from a centred FFT."""
+        StrainCalculator.check_modes(demodulation, engine)
+        if precision is not None:
+            fft_data = fft_data.astype(COMPLEX_PRECISIONS[precision], copy=False)
+
+        g1_vec = StrainCalculator.g_vector(c1, fft_data.shape)
+        g2_vec = StrainCalculator.g_vector(c2, fft_data.shape)
+        window_shape = StrainCalculator.crop_window_shape(fft_data.shape, (r1, r2))
+
+        complex_img1 = StrainCalculator.demodulate(fft_data, c1, g1, r1, demodulation, window_shape)
+        complex_img2 = StrainCalculator.demodulate(fft_data, c2, g2, r2, demodulation, window_shape)
+
+        results, gradients, (material_mask, _, spacing, region) = StrainCalculator.gradient_stage(
+            complex_img1, complex_img2, g1_vec, g2_vec, material_mask, reference_area,
+            demodulation, upsample, engine, fft_data.shape, crop_to_material
+        )
+        exx_smooth, eyy_smooth, exy_smooth, rotation_smooth = \
+            StrainCalculator.strain_maps(gradients, material_mask, sigma_smooth, spacing, engine, region)
+
+        results.update({
+            'strain_xx': exx_smooth,    
+            'strain_yy': eyy_smooth,    
+            'strain_xy': exy_smooth,    
+            'rotation_xy': rotation_smooth
+        })
+        return results
+
+    @staticmethod
+    def calculate_displacements_and_strain_multi(
+        fft_data, material_mask, reflections, reference_area, sigma_smooth,
+        demodulation='full', upsample=False, engine='unwrap', precision=None, weighted=True,
+        crop_to_material=False
+    ):
+        """GPA from any number (>= 2) of non-collinear reflections."""
+        StrainCalculator.check_modes(demodulation, engine)
+        if len(reflections) < 2:
+            raise ValueError("At least two reflections are needed.")
+        if precision is not None:
+            fft_data = fft_data.astype(COMPLEX_PRECISIONS[precision], copy=False)
+
+        g_vecs = [StrainCalculator.g_vector(center, fft_data.shape) for center, _, _ in reflections]
+        window_shape = StrainCalculator.crop_window_shape(
+            fft_data.shape, [r_outer for _, _, r_outer in reflections]
+        )
+        stack = StrainCalculator.demodulate_stack(fft_data, reflections, demodulation, window_shape)
+
+        shape = material_mask.shape
+        unwrap_mask = None
+        if crop_to_material:
+            unwrap_mask = StrainCalculator.unwrap_mask(material_mask, demodulation, window_shape, fft_data.shape)
+        complex_imgs, raw_phases, phase_imgs, carriers = zip(*(
+            StrainCalculator.phase_images(
+                complex_img, g_vec, shape, demodulation, upsample, engine, fft_data.shape, unwrap_mask
+            )
+            for complex_img, g_vec in zip(stack, g_vecs)
+        ))
+        del stack
+
+        material_mask, reference_area, spacing, region = StrainCalculator.strain_grid(
+            material_mask, reference_area, demodulation, upsample, window_shape, fft_data.shape,
+            crop_to_material
+        )
+
+        weights = StrainCalculator.amplitude_weights(complex_imgs) if weighted else None
+        referenced = [P - np.mean(P[reference_area]) for P in phase_imgs]
+        ux, uy = StrainCalculator.solve_displacements(referenced, g_vecs, weights)
+        ux -= np.mean(ux[reference_area])
+        uy -= np.mean(uy[reference_area])
+
+        box = region if region is not None else (slice(None), slice(None))
+        box_weights = None if weights is None else weights[(slice(None),) + box]
+
+        def solve(phase_grads):
+            dux_dy, duy_dy = StrainCalculator.solve_displacements(
+                [dP_dy for dP_dy, _ in phase_grads], g_vecs, box_weights
+            )
+            dux_dx, duy_dx = StrainCalculator.solve_displacements(
+                [dP_dx for _, dP_dx in phase_grads], g_vecs, box_weights
+            )
+            return dux_dy, dux_dx, duy_dy, duy_dx
+
+        gradients = StrainCalculator.engine_gradients(
+            ux, uy, complex_imgs, carriers, spacing, engine, region, solve
+        )
+
+        exx_smooth, eyy_smooth, exy_smooth, rotation_smooth = StrainCalculator.strain_maps(
+            gradients, material_mask, sigma_smooth, spacing, engine, region
+        )
+
+        results = {}
+        for index, (complex_img, raw_phase, phase_image) in enumerate(
+            zip(complex_imgs, raw_phases, phase_imgs), start=1
+        ):
+            results[f'complex_image{index}'] = complex_img
+            results[f'raw_phase_image{index}'] = raw_phase
+            results[f'phase_image{index}'] = phase_image
+        results.update({
+            'u1': ux,
+            'u2': uy,
+            'strain_xx': exx_smooth,
+            'strain_yy': eyy_smooth,
+            'strain_xy': exy_smooth,
+            'rotation_xy': rotation_smooth
+        })
+        return results
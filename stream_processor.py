@@ -0,0 +1,123 @@
+import time
+import numpy as np
+
+from data_processor import DataProcessor
+from peak_finder import PeakFinder
+from results_exporter import ResultsExporter
+from strain_calculator import StrainCalculator
+
+STREAM_OUTPUTS = ('strain_xx', 'strain_yy', 'strain_xy', 'rotation_xy')
+DEFAULT_DRIFT_SEARCH_RADIUS = 3
+PROGRESS_EVERY = 10
+
+class FrameWriter:
+    """Appends per-frame float32 maps to a chunked HDF5 file or Zarr store."""
+
+    def __init__(self, path, n_frames, frame_shape, fmt=None, compression=True):
+        shape = (n_frames,) + tuple(frame_shape)
+        chunks = (1,) + tuple(frame_shape)
+        self.store, self.fmt = ResultsExporter.open_store(path, fmt)
+
+        self.datasets = {
+            name: ResultsExporter.create_dataset(self.store, self.fmt, name, shape, np.float32, chunks, compression)
+            for name in STREAM_OUTPUTS
+        }
+        self.centers = ResultsExporter.create_dataset(
+            self.store, self.fmt, 'centers', (n_frames, 2, 2), np.float64, (n_frames, 2, 2), compression
+        )
+
+    def write(self, index, maps, centers):
+        for name, dataset in self.datasets.items():
+            dataset[index] = maps[name].astype(np.float32, copy=False)
+        self.centers[index] = centers
+
+    def close(self):
+        ResultsExporter.close_store(self.store, self.fmt)
+
+class StreamProcessor:
+    """Frame-by-frame GPA of in-situ movies without loading the whole stack."""
+
+
+    @staticmethod
+    def open_frame_stack(file_path, dataset=None):
+        """Lazy ``(n_frames, ny, nx)`` view of a movie; frames are read on indexing."""
+        stack = DataProcessor.open_lazy(file_path, dataset, min_ndim=3)
+        if stack.ndim != 3:
+            DataProcessor.close_lazy(stack)
+            raise ValueError(f"Expected a 3D frame stack, got shape {stack.shape}")
+        return stack
+
+    @staticmethod
+    def run(frames, c1, g1, r1, c2, g2, r2, reference_area, sigma_smooth, out_path,
+            threshold_percent=0, track_drift=False, search_radius=DEFAULT_DRIFT_SEARCH_RADIUS,
+            frame_range=None, fmt=None, engine='unwrap', precision='double', dataset=None,
+            crop_to_material=False, fft_shape=None):
+        """Strain maps for every frame of ``frames`` (path or 3D array-like)."""
+        # A stack opened here is closed again when the run finishes.
+        owned = isinstance(frames, str)
+        if owned:
+            frames = StreamProcessor.open_frame_stack(frames, dataset)
+
+        writer = None
+        try:
+            start, stop = frame_range if frame_range is not None else (0, frames.shape[0])
+            if not 0 <= start < stop <= frames.shape[0]:
+                raise ValueError(
+                    f"Frame range {start}:{stop} is empty or outside the {frames.shape[0]} frames of the stack."
+                )
+            n_frames = stop - start
+            centers = None if c1 is None or c2 is None else np.array([c1, c2], dtype=float)
+            dtype = DataProcessor.real_dtype(precision)
+            writer = FrameWriter(out_path, n_frames, frames.shape[1:], fmt=fmt)
+
+            began = time.perf_counter()
+            for index in range(n_frames):
+                data = np.asarray(frames[start + index], dtype=dtype)
+                smoothed_data, material_mask = DataProcessor.preprocess_data(
+                    data, threshold_percent=threshold_percent
+                )
+                fft_data, fft_magnitude = DataProcessor.compute_fft_and_contrast(smoothed_data)
+
+                if centers is None:
+                    centers = np.array(PeakFinder.detect_pair(fft_magnitude))
+                else:
+                    if index == 0:
+                        picked_shape = fft_shape or frames.shape[1:]
+                        (c1, g1, r1), (c2, g2, r2) = [
+                            StrainCalculator.rescale_reflection(
+                                tuple(center), r_inner, r_outer, picked_shape, fft_data.shape
+                            )
+                            for center, r_inner, r_outer in ((centers[0], g1, r1), (centers[1], g2, r2))
+                        ]
+                        centers = np.array([c1, c2], dtype=float)
+                    if track_drift:
+                        centers = np.array([
+                            PeakFinder.refine_peak(fft_magnitude, center, search_radius)
+                            for center in centers
+                        ])
+
+                results = StrainCalculator.calculate_displacements_and_strain(
+                    fft_data, material_mask,
+                    tuple(centers[0]), g1, r1,
+                    tuple(centers[1]), g2, r2,
+                    reference_area, sigma_smooth,
+                    engine=engine, crop_to_material=crop_to_material
+                )
+                writer.write(index, results, centers)
+
+                if (index + 1) % PROGRESS_EVERY == 0 or index + 1 == n_frames:
+                    elapsed = time.perf_counter() - began
+                    print(f"Frame {index + 1}/{n_frames}: {(index + 1) / elapsed:.2f} frames/s")
+
+            elapsed = time.perf_counter() - began
+            return {
+                'frames': n_frames,
+                'seconds': elapsed,
+                'fps': n_frames / elapsed if elapsed > 0 else float('inf'),
+                'output': out_path,
+            }
+        finally:
+            if writer is not None:
+                writer.close()
+            if owned:
+                DataProcessor.close_lazy(frames)
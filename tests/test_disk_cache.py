@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from disk_cache import DiskCache, META_NAME
+
+ARRAY_BYTES = 1000 * 8
+
+
+def make_cache(tmp_path, entries=2.5):
+    return DiskCache(str(tmp_path / 'cache'), max_bytes=int(entries * ARRAY_BYTES))
+
+
+def set_last_used(cache, key, when):
+    os.utime(os.path.join(cache.root, key, META_NAME), (when, when))
+
+
+def test_round_trip_of_arrays_and_small_values(tmp_path):
+    cache = make_cache(tmp_path)
+    array = np.arange(1000, dtype=float)
+
+    cache.put('a', (array, (1.5, 2.5), 3))
+    value = cache.get('a')
+
+    assert np.array_equal(value[0], array)
+    assert value[1:] == ((1.5, 2.5), 3)
+    assert cache.get('missing') is None
+    assert cache.counts() == {'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('a', np.zeros(1000))
+    cache.put('b', np.ones(1000))
+    set_last_used(cache, 'a', 1)
+    set_last_used(cache, 'b', 2)
+    cache.get('a')
+
+    cache.put('c', np.full(1000, 2.0))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.evictions == 1
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_entries_larger_than_the_cache_are_skipped(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('a', np.zeros(1000))
+
+    cache.put('big', np.zeros(3000))
+
+    assert cache.get('big') is None
+    assert cache.get('a') is not None
+    assert cache.writes == 1 and cache.evictions == 0
+
+
+def test_fingerprints_change_with_content_shape_and_dtype():
+    array = np.arange(12, dtype=np.float64)
+    changed = array.copy()
+    changed[5] += 1e-12
+
+    assert DiskCache.array_hash(array) == DiskCache.array_hash(array.copy())
+    assert DiskCache.array_hash(array) != DiskCache.array_hash(changed)
+    assert DiskCache.array_hash(array) != DiskCache.array_hash(array.reshape(3, 4))
+    assert DiskCache.array_hash(array) != DiskCache.array_hash(array.view(np.int64))
+    assert DiskCache.key('fft', 'abc', (1.0,)) == DiskCache.key('fft', 'abc', (1.0,))
+    assert DiskCache.key('fft', 'abc', (1.0,)) != DiskCache.key('fft', 'abc', (2.0,))
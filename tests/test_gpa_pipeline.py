@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_lattice, mask_radii
+from data_processor import DataProcessor
+from gpa_pipeline import GPAPipeline
+from strain_calculator import StrainCalculator
+
+SIZE = 256
+THRESHOLD = 20
+REFERENCE_AREA = (slice(0, 32), slice(0, 32))
+
+
+def run_pipeline(pipeline, c1, c2, sigma=2.0, reference_area=REFERENCE_AREA):
+    r_inner, r_outer = mask_radii(SIZE)
+    return pipeline.run(
+        c1, r_inner, r_outer, c2, r_inner, r_outer, reference_area, sigma,
+        threshold_percent=THRESHOLD
+    )
+
+
+def test_pipeline_matches_direct_calculation():
+    image, c1, c2 = make_lattice(SIZE, noise=0.1)
+    r_inner, r_outer = mask_radii(SIZE)
+    smoothed_data, material_mask = DataProcessor.preprocess_data(image, threshold_percent=THRESHOLD)
+    fft_data, _ = DataProcessor.compute_fft_and_contrast(smoothed_data)
+    expected = StrainCalculator.calculate_displacements_and_strain(
+        fft_data, material_mask, c1, r_inner, r_outer, c2, r_inner, r_outer, REFERENCE_AREA, 2.0
+    )
+
+    results = run_pipeline(GPAPipeline(image), c1, c2)
+
+    assert results.keys() == expected.keys()
+    for key in expected:
+        assert np.array_equal(results[key], expected[key], equal_nan=True), key
+
+
+def test_pipeline_reruns_only_downstream_stages():
+    image, c1, c2 = make_lattice(SIZE, noise=0.1)
+    pipeline = GPAPipeline(image)
+    run_pipeline(pipeline, c1, c2)
+
+    run_pipeline(pipeline, c1, c2)
+    assert pipeline.last_recomputed == []
+
+    run_pipeline(pipeline, c1, c2, sigma=3.0)
+    assert pipeline.last_recomputed == ['strain']
+
+    run_pipeline(pipeline, c1, c2, sigma=3.0, reference_area=(slice(32, 64), slice(32, 64)))
+    assert pipeline.last_recomputed == ['displacement', 'gradients', 'strain']
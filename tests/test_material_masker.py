@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from material_masker import MaterialMasker
+
+
+def test_cleanup_keeps_material_touching_the_border():
+    mask = np.zeros((200, 200), dtype=bool)
+    mask[:, :120] = True
+    mask[60, 60] = False
+    mask[50, 150] = True
+
+    cleaned = MaterialMasker.clean(mask, 3)
+
+    # The pinhole is filled and the speck removed, but no material along the
+    # image edges (corners included) is lost.
+    assert cleaned[:, :120].all()
+    assert not cleaned[:, 120:].any()
+
+
+def test_cleaned_mask_keeps_edge_rows():
+    image = np.tile(np.linspace(0, 1, 200), (200, 1))
+    masker = MaterialMasker(image)
+
+    uncleaned = masker.mask(50)
+    cleaned = masker.mask(50, cleanup=3)
+
+    assert np.array_equal(cleaned, uncleaned)
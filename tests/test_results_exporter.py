@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results_exporter import ResultsExporter
+
+
+def make_results():
+    rng = np.random.default_rng(0)
+    vacuum = np.zeros((300, 260), dtype=bool)
+    vacuum[:40] = True
+    vacuum[100:120, 200:] = True
+    results = {}
+    for name in ('strain_xx', 'strain_yy'):
+        values = rng.normal(size=vacuum.shape)
+        values[vacuum] = np.nan
+        results[name] = values
+    results['phase_image1'] = rng.normal(size=vacuum.shape)
+    results['complex_image1'] = np.exp(1j * results['phase_image1'])
+    return results
+
+
+@pytest.mark.parametrize('nan_aware', [False, True])
+def test_export_round_trip_keeps_nans(tmp_path, nan_aware):
+    pytest.importorskip('h5py')
+    path = str(tmp_path / 'results.h5')
+    results = make_results()
+
+    exported = ResultsExporter.export(path, results, {'sigma': 2.0}, nan_aware=nan_aware)
+
+    assert exported == list(results)
+    assert ResultsExporter.metadata(path) == {'sigma': 2.0}
+    for name, value in results.items():
+        dtype = np.complex64 if np.iscomplexobj(value) else np.float32
+        loaded = ResultsExporter.load(path, name)
+        assert loaded.dtype == dtype
+        assert np.array_equal(loaded, value.astype(dtype), equal_nan=True), name
+
+
+def test_nan_masks_are_stored_once(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    path = str(tmp_path / 'results.h5')
+
+    ResultsExporter.export(path, make_results(), nan_aware=True)
+
+    with h5py.File(path, 'r') as f:
+        assert list(f['masks']) == ['0']
+        assert f['maps/strain_xx'].attrs['nan_mask'] == 'masks/0'
+        assert f['maps/strain_yy'].attrs['nan_mask'] == 'masks/0'
+        assert 'nan_mask' not in f['maps/phase_image1'].attrs
+        assert not np.isnan(f['maps/strain_xx/0'][...]).any()
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_lattice, make_field, mask_radii, evaluation_mask
+from data_processor import DataProcessor
+from strain_calculator import StrainCalculator, STRAIN_ENGINES
+
+SIZE = 256
+REFERENCE_AREA = (slice(0, 32), slice(0, 32))
+# RMS errors of every engine on these fields are about 0.2 % (strain maps are in %).
+MAX_RMS_ERROR = 0.25
+
+
+def rms_errors(field, engine):
+    image, c1, c2, truth = make_field(field, SIZE)
+    fft_data, _ = DataProcessor.compute_fft_and_contrast(image)
+    r_inner, r_outer = mask_radii(SIZE)
+    results = StrainCalculator.calculate_displacements_and_strain(
+        fft_data, np.ones(image.shape, dtype=bool),
+        c1, r_inner, r_outer, c2, r_inner, r_outer,
+        REFERENCE_AREA, 2.0, engine=engine
+    )
+    inside = evaluation_mask(field, SIZE)
+    return {
+        key: float(np.sqrt(np.mean((results[key][inside] - truth[key][inside])**2)))
+        for key in truth
+    }
+
+
+@pytest.mark.parametrize('field', ['uniform', 'gradient'])
+def test_gradient_engine_matches_ground_truth(field):
+    errors = rms_errors(field, 'gradient')
+    reference = rms_errors(field, 'unwrap')
+
+    for key, error in errors.items():
+        assert error < MAX_RMS_ERROR, key
+        assert error == pytest.approx(reference[key], abs=1e-3), key
+
+
+@pytest.mark.parametrize('field', ['uniform', 'gradient'])
+def test_spectral_engine_matches_ground_truth(field):
+    errors = rms_errors(field, 'spectral')
+    reference = rms_errors(field, 'unwrap')
+
+    for key, error in errors.items():
+        assert error < MAX_RMS_ERROR, key
+        # Spectral smoothing treats the edges differently, so allow a little more.
+        assert error == pytest.approx(reference[key], abs=5e-3), key
+
+
+@pytest.mark.parametrize('engine', STRAIN_ENGINES)
+@pytest.mark.parametrize('demodulation', ['full', 'cropped'])
+@pytest.mark.parametrize('weighted', [True, False])
+def test_multi_with_two_reflections_matches_two_reflection_path(engine, demodulation, weighted):
+    image, c1, c2 = make_lattice(SIZE, noise=0.1)
+    r_inner, r_outer = mask_radii(SIZE)
+    smoothed_data, material_mask = DataProcessor.preprocess_data(image, threshold_percent=20)
+    fft_data, _ = DataProcessor.compute_fft_and_contrast(smoothed_data)
+
+    expected = StrainCalculator.calculate_displacements_and_strain(
+        fft_data, material_mask, c1, r_inner, r_outer, c2, r_inner, r_outer,
+        REFERENCE_AREA, 2.0, demodulation=demodulation, engine=engine
+    )
+    results = StrainCalculator.calculate_displacements_and_strain_multi(
+        fft_data, material_mask, [(c1, r_inner, r_outer), (c2, r_inner, r_outer)],
+        REFERENCE_AREA, 2.0, demodulation=demodulation, engine=engine, weighted=weighted
+    )
+
+    assert results.keys() == expected.keys()
+    for key in expected:
+        np.testing.assert_allclose(results[key], expected[key], rtol=0, atol=1e-10, err_msg=key)
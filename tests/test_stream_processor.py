@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_processor import BatchProcessor
+from benchmarks.synthetic import make_lattice, mask_radii
+from stream_processor import StreamProcessor
+
+SIZE = 128
+REFERENCE_AREA = (slice(0, 32), slice(0, 32))
+
+
+def run_stream(frames, out_path, frame_range=None):
+    _, c1, c2 = make_lattice(SIZE)
+    r_inner, r_outer = mask_radii(SIZE)
+    return StreamProcessor.run(
+        frames, c1, r_inner, r_outer, c2, r_inner, r_outer, REFERENCE_AREA, 1.0,
+        out_path, frame_range=frame_range, fmt='hdf5'
+    )
+
+
+def test_stream_writes_the_frame_range(tmp_path):
+    h5py = pytest.importorskip('h5py')
+    frames = np.stack([make_lattice(SIZE, noise=0.1, seed=seed)[0] for seed in range(4)])
+    out_path = str(tmp_path / 'movie_gpa.h5')
+
+    summary = run_stream(frames, out_path, frame_range=(1, 3))
+
+    assert summary['frames'] == 2
+    with h5py.File(out_path, 'r') as f:
+        assert f['strain_xx'].shape == (2, SIZE, SIZE)
+        assert np.isfinite(f['strain_xx'][1]).any()
+
+
+@pytest.mark.parametrize('frame_range', [(2, 2), (3, 1), (0, 5)])
+def test_stream_rejects_bad_frame_ranges(tmp_path, frame_range):
+    frames = np.zeros((4, SIZE, SIZE))
+    out_path = str(tmp_path / 'movie_gpa.h5')
+
+    with pytest.raises(ValueError, match='Frame range'):
+        run_stream(frames, out_path, frame_range=frame_range)
+    assert not os.path.exists(out_path)
+
+
+def test_stream_run_rejects_unsupported_recipe_keys(tmp_path):
+    with pytest.raises(ValueError, match='demodulation'):
+        BatchProcessor.run_stream(str(tmp_path), {'demodulation': 'cropped'}, str(tmp_path / 'out'))
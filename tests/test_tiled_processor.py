@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_processor import BatchProcessor
+from benchmarks.synthetic import make_field, mask_radii
+from data_processor import DataProcessor
+from strain_calculator import StrainCalculator
+from tiled_processor import TiledProcessor, TILED_OUTPUTS
+
+SIZE = 512
+TILE_SIZE = 256
+OVERLAP = 64
+# Maps are in %; the field's strains reach about 1 %.
+MAX_RMS_DIFFERENCE = 0.1
+
+
+def test_tiled_maps_match_full_frame():
+    image, c1, c2, _ = make_field('gradient', SIZE)
+    r_inner, r_outer = mask_radii(SIZE)
+    fft_data, _ = DataProcessor.compute_fft_and_contrast(image)
+    full = StrainCalculator.calculate_displacements_and_strain(
+        fft_data, DataProcessor.compute_material_mask(image),
+        c1, r_inner, r_outer, c2, r_inner, r_outer,
+        (slice(0, 32), slice(0, 32)), 2.0
+    )
+
+    tiled = TiledProcessor.run(
+        image, c1, r_inner, r_outer, c2, r_inner, r_outer, 2.0,
+        tile_size=TILE_SIZE, overlap=OVERLAP, workers=1
+    )
+
+    # The image edges are periodic for the full frame but not for the tiles.
+    inside = (slice(OVERLAP, -OVERLAP), slice(OVERLAP, -OVERLAP))
+    for key in TILED_OUTPUTS:
+        assert np.array_equal(np.isnan(tiled[key]), np.isnan(full[key])), key
+        difference = tiled[key][inside] - full[key][inside]
+        assert np.sqrt(np.nanmean(difference**2)) < MAX_RMS_DIFFERENCE, key
+
+
+def test_tiled_run_rejects_unsupported_recipe_keys(tmp_path):
+    with pytest.raises(ValueError, match='upsample'):
+        BatchProcessor.run_tiled(str(tmp_path), {'upsample': True}, str(tmp_path / 'out'), TILE_SIZE, OVERLAP)
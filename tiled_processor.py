@@ -0,0 +1,182 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from data_processor import DataProcessor
+from fft_backend import FFTBackend
+from strain_calculator import StrainCalculator
+
+DEFAULT_TILE_SIZE = 2048
+DEFAULT_TILE_OVERLAP = 256
+TILED_OUTPUTS = ('strain_xx', 'strain_yy', 'strain_xy', 'rotation_xy')
+THRESHOLD_SAMPLE_PIXELS = 4_000_000
+BLEND_BLOCK_ROWS = 1024
+BLEND_WEIGHTS_NAME = '_blend_weights'
+
+class TiledProcessor:
+    """GPA on overlapping tiles of images too large for a single FFT."""
+
+
+    @staticmethod
+    def tile_grid(shape, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP):
+        """(y0, y1, x0, x1) bounds of tiles that cover ``shape`` with ``overlap``."""
+        if overlap >= tile_size:
+            raise ValueError("Tile overlap must be smaller than the tile size.")
+
+        def starts(n):
+            if n <= tile_size:
+                return [0]
+            step = tile_size - overlap
+            positions = list(range(0, n - tile_size, step))
+            positions.append(n - tile_size)
+            return positions
+
+        ny, nx = shape
+        return [
+            (y0, min(y0 + tile_size, ny), x0, min(x0 + tile_size, nx))
+            for y0 in starts(ny) for x0 in starts(nx)
+        ]
+
+    @staticmethod
+    def blend_weights(bounds, shape, overlap):
+        """Separable sin^2 ramps over ``overlap`` on every side that has a neighbour."""
+        y0, y1, x0, x1 = bounds
+
+        def ramp(length, has_before, has_after):
+            w = np.ones(length, dtype=np.float32)
+            n = min(overlap, length // 2)
+            if n > 0:
+                edge = np.sin(0.5*np.pi * (np.arange(n) + 0.5) / n).astype(np.float32)**2
+                if has_before:
+                    w[:n] = edge
+                if has_after:
+                    w[-n:] = edge[::-1]
+            return w
+
+        wy = ramp(y1 - y0, y0 > 0, y1 < shape[0])
+        wx = ramp(x1 - x0, x0 > 0, x1 < shape[1])
+        return wy[:, None] * wx[None, :]
+
+    @staticmethod
+    def global_threshold(image, threshold_percent):
+        """Material threshold from a strided sample of the whole image."""
+        stride = max(1, int(np.sqrt(image.shape[0] * image.shape[1] / THRESHOLD_SAMPLE_PIXELS)))
+        return np.percentile(np.asarray(image[::stride, ::stride]), threshold_percent)
+
+    @staticmethod
+    def process_tile(tile, params):
+        """GPA on one tile; returns its strain and rotation maps as float32."""
+        tile = np.asarray(tile, dtype=DataProcessor.real_dtype(params['precision']))
+        material_mask = tile > params['threshold_value']
+        fft_data, _ = DataProcessor.compute_fft_and_contrast(tile)
+
+        c1, g1, r1 = StrainCalculator.rescale_reflection(*params['reflection1'], params['fft_shape'], fft_data.shape)
+        c2, g2, r2 = StrainCalculator.rescale_reflection(*params['reflection2'], params['fft_shape'], fft_data.shape)
+
+        results = StrainCalculator.calculate_displacements_and_strain(
+            fft_data, material_mask,
+            c1, g1, r1,
+            c2, g2, r2,
+            (slice(0, tile.shape[0]), slice(0, tile.shape[1])),
+            params['sigma'],
+            engine=params['engine']
+        )
+        return {key: results[key].astype(np.float32, copy=False) for key in TILED_OUTPUTS}
+
+    @staticmethod
+    def _process_tile_from_source(source, bounds, params):
+        y0, y1, x0, x1 = bounds
+        image = np.load(source, mmap_mode='r') if isinstance(source, str) else source
+        return TiledProcessor.process_tile(image[y0:y1, x0:x1], params)
+
+    @staticmethod
+    def _allocate(shape, out_dir, name):
+        if out_dir is None:
+            return np.zeros(shape, dtype=np.float32)
+        path = os.path.join(out_dir, name + '.npy')
+        return np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+
+    @staticmethod
+    def run(image, c1, g1, r1, c2, g2, r2, sigma_smooth,
+            threshold_percent=0, fft_shape=None, out_dir=None,
+            tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP,
+            workers=None, engine='unwrap', precision='double'):
+        """Tiled GPA over ``image`` (array, memmap or path to a ``.npy`` file)."""
+        source = image
+        if isinstance(image, str):
+            image = np.load(image, mmap_mode='r')
+        if image.ndim != 2:
+            raise ValueError("Tiled processing needs a 2D image.")
+
+        shape = image.shape
+        if fft_shape is None:
+            fft_shape = shape
+        params = {
+            'reflection1': ((float(c1[0]), float(c1[1])), float(g1), float(r1)),
+            'reflection2': ((float(c2[0]), float(c2[1])), float(g2), float(r2)),
+            'fft_shape': tuple(fft_shape),
+            'sigma': float(sigma_smooth),
+            'threshold_value': TiledProcessor.global_threshold(image, threshold_percent),
+            'engine': engine,
+            'precision': precision,
+        }
+
+        if out_dir is not None:
+            os.makedirs(out_dir, exist_ok=True)
+        outputs = {key: TiledProcessor._allocate(shape, out_dir, key) for key in TILED_OUTPUTS}
+        weight_sum = TiledProcessor._allocate(shape, out_dir, BLEND_WEIGHTS_NAME)
+
+        tiles = TiledProcessor.tile_grid(shape, tile_size, overlap)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(tiles)))
+        fft_workers = max(1, (os.cpu_count() or 1) // workers)
+        print(f"Processing {len(tiles)} tile(s) of {tile_size} px with {workers} worker(s)")
+
+        def accumulate(bounds, tile_results):
+            y0, y1, x0, x1 = bounds
+            # Pixels masked as vacuum are NaN in every map and get no weight.
+            weights = TiledProcessor.blend_weights(bounds, shape, overlap)
+            weights[np.isnan(tile_results['strain_xx'])] = 0
+            weight_sum[y0:y1, x0:x1] += weights
+            for key, values in tile_results.items():
+                outputs[key][y0:y1, x0:x1] += np.nan_to_num(values) * weights
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=FFTBackend.set_backend,
+            initargs=(FFTBackend.backend, fft_workers)
+        ) as pool:
+            pending = {}
+            for bounds in tiles:
+                # Keep a bounded number of tiles in flight so memory stays tile-sized.
+                while len(pending) >= 2 * workers:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        accumulate(pending.pop(future), future.result())
+
+                if isinstance(source, str):
+                    future = pool.submit(TiledProcessor._process_tile_from_source, source, bounds, params)
+                else:
+                    y0, y1, x0, x1 = bounds
+                    future = pool.submit(TiledProcessor.process_tile, np.array(image[y0:y1, x0:x1]), params)
+                pending[future] = bounds
+
+            for future in list(pending):
+                accumulate(pending.pop(future), future.result())
+
+        for start in range(0, shape[0], BLEND_BLOCK_ROWS):
+            rows = slice(start, min(start + BLEND_BLOCK_ROWS, shape[0]))
+            total = weight_sum[rows]
+            empty = total == 0
+            for key in TILED_OUTPUTS:
+                block = outputs[key][rows]
+                block /= np.where(empty, 1, total)
+                block[empty] = np.nan
+
+        if out_dir is not None:
+            for values in outputs.values():
+                values.flush()
+            del weight_sum
+            os.remove(os.path.join(out_dir, BLEND_WEIGHTS_NAME + '.npy'))
+        return outputs
@@ -0,0 +1,24 @@
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Memory-backed directory for arrays shared with the workers, where available.
+SHARED_DIR = '/dev/shm'
+
+class WorkerPool:
+    """Process pools for work started from the GUI, and the files they share."""
+
+
+    @staticmethod
+    def shared_dir(prefix):
+        """New temporary directory in ``SHARED_DIR``, or the default temp dir without it."""
+        return tempfile.mkdtemp(prefix=prefix, dir=SHARED_DIR if os.path.isdir(SHARED_DIR) else None)
+
+    @staticmethod
+    def spawn(workers, initializer=None, initargs=()):
+        # Spawned workers start clean instead of forking the GUI process and its threads.
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=initializer, initargs=initargs
+        )